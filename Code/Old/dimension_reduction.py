@@ -1,9 +1,15 @@
+import os
+import sys
 import pandas as pd
 import numpy as np
-from umap import UMAP
 import matplotlib.pyplot as plt
 from sklearn.preprocessing import StandardScaler, LabelEncoder
 
+# Shared UMAP embedding store lives in Code/
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from embedding_store import fit_embedding
+from scatter_rendering import scatter_categories, scatter_values
+
 # Read the Stata exported data
 data = pd.read_csv("Results/temp_data_for_umap.csv")
 
@@ -41,9 +47,9 @@ X = X.fillna(X.mean())
 scaler = StandardScaler()
 X_scaled = scaler.fit_transform(X)
 
-# Perform UMAP dimension reduction
-reducer = UMAP(n_components=2, random_state=42, n_neighbors=15, min_dist=0.1)
-embedding = reducer.fit_transform(X_scaled)
+# Perform UMAP dimension reduction (reloaded from the embedding store when unchanged)
+stored = fit_embedding(X_scaled, params={'n_components': 2, 'random_state': 42, 'n_neighbors': 15, 'min_dist': 0.1})
+embedding = stored.embedding
 
 # Create DataFrame with UMAP coordinates
 umap_df = pd.DataFrame(embedding, columns=['UMAP1', 'UMAP2'])
@@ -63,12 +69,8 @@ umap_df.to_csv("Results/umap_coordinates.csv", index=False)
 
 # Program Type visualization
 plt.figure(figsize=(12, 8))
-scatter = plt.scatter(embedding[:, 0], embedding[:, 1], 
-                     c=data['program_type'],
-                     cmap='coolwarm',
-                     alpha=0.7,
-                     s=100)
-colorbar = plt.colorbar(scatter)
+scatter = scatter_values(plt.gca(), embedding, data['program_type'], cmap='coolwarm', alpha=0.7, s=100)
+colorbar = plt.colorbar(scatter, ax=plt.gca())
 colorbar.set_label('Program Type (0=Upskilling, 1=Reskilling)', fontsize=10)
 plt.title('UMAP Projection by Program Type', fontsize=14, pad=20)
 plt.xlabel('UMAP Dimension 1', fontsize=12)
@@ -87,14 +89,9 @@ for k in [2, 3, 4]:
         unique_labels = sorted(data[column_name].unique())
         colors = plt.cm.viridis(np.linspace(0, 1, len(unique_labels)))
         
-        # Create scatter plot
-        for i, label in enumerate(unique_labels):
-            mask = data[column_name] == label
-            plt.scatter(embedding[mask, 0], embedding[mask, 1],
-                       label=label,
-                       color=colors[i],
-                       alpha=0.7,
-                       s=100)
+        # Create scatter plot (one collection, colors by lookup)
+        scatter_categories(plt.gca(), embedding, data[column_name],
+                           dict(zip(unique_labels, colors)), alpha=0.7, s=100)
         
         plt.title(f'UMAP Projection with {k} Clusters', fontsize=14, pad=20)
         plt.xlabel('UMAP Dimension 1', fontsize=12)
@@ -4,14 +4,12 @@ import json
 import csv
 import time
 import logging
-import glob
 
 import numpy as np
 import pandas as pd
 import matplotlib.pyplot as plt
 
 from dotenv import load_dotenv
-import openai
 
 from fpdf import FPDF
 from PIL import Image
@@ -30,6 +28,13 @@ from reportlab.platypus import (
 )
 from reportlab.pdfgen import canvas
 
+from caching import hash_bytes
+import llm_client
+from llm_client import DEFAULT_MODEL, LLMWorkerPool, create_backend, is_error_response
+from response_cache import ResponseCache
+from project_index import ProjectIndex
+from report_manifest import ReportManifest, SectionRecord
+
 
 # Configure logging
 logging.basicConfig(
@@ -40,20 +45,48 @@ logging.basicConfig(
 logger = logging.getLogger()
 
 class ProjectReportGenerator:
-    def __init__(self, project_root='.'):
+    def __init__(self, project_root='.', max_concurrency=8, cache_mode='read_write', cache_ttl=None,
+                 backend=None, model=None, incremental=True):
         """
         Initialize the report generator with the project root directory and improved context awareness
+        
+        Args:
+            project_root: Project directory (containing Code/, Data/ and Output/)
+            max_concurrency: ChatGPT requests in flight at once
+            cache_mode: Response cache mode ('read_write', 'read_only', 'refresh' or
+                'offline'; see response_cache.CACHE_MODES)
+            cache_ttl: Maximum age of a cached response in seconds (None for no limit)
+            backend: llm_client.ChatBackend to use; by default one is created from the
+                LLM_BACKEND / LLM_BASE_URL environment variables and the API key
+            model: Chat model (defaults to LLM_MODEL or gpt-3.5-turbo)
+            incremental: Reuse the sections of files unchanged since the last run
+                (ignored in 'refresh' cache mode)
         """
         self.project_root = project_root
+        self.backend = backend
+        self.model = model or os.getenv('LLM_MODEL', DEFAULT_MODEL)
+        self.max_concurrency = max_concurrency
+        self.response_cache = ResponseCache(mode=cache_mode, ttl=cache_ttl)
         self.output_pdf = os.path.join(project_root, "Project_Summary_Report.pdf")
         self.temp_dir = os.path.join(project_root, "temp_report_assets")
         self.api_key = None
-        self.client = None
+        self.llm_pool = None
+        self._index = None
         self.doc = None
         self.styles = None
         self.elements = []
+        
+        # Prompts collected while exploring the project; answered together at the end
+        self.pending_queries = []
         self.image_counter = 0
         
+        # Per-file sections: the one being recorded and those recorded in this run
+        self.reuse_sections = incremental and cache_mode != 'refresh'
+        self._recording = None
+        self.recorded_sections = []
+        self.sections_reused = 0
+        self.sections_processed = 0
+        
         # Initialize project context information
         self.project_context = {
             "data_files": [],
@@ -68,48 +101,53 @@ class ProjectReportGenerator:
         if not os.path.exists(self.temp_dir):
             os.makedirs(self.temp_dir)
             
-        # Load OpenAI API key
+        # Load OpenAI API key and choose the LLM backend
         self._setup_openai()
+        
+        # Stored sections are only valid for this generator and client code, the
+        # model, its prompt settings and the backend
+        sources = []
+        for module_file in (__file__, llm_client.__file__):
+            with open(os.path.abspath(module_file), 'rb') as f:
+                sources.append(f.read())
+        self.report_manifest = ReportManifest(version=hash_bytes(
+            *sources, self.model, self.llm_pool.system_prompt, str(self.llm_pool.max_tokens),
+            getattr(self.backend, 'cache_namespace', '')))
 
     def build_project_context(self):
         """Build context about the project by scanning files before detailed analysis"""
         logger.info("Building project context...")
         
-        # Scan the project structure to gather context
-        for root, dirs, files in os.walk(self.project_root):
-            # Skip hidden directories and __pycache__
-            dirs[:] = [d for d in dirs if not d.startswith('.') and d != '__pycache__']
-            
-            for file in files:
-                file_path = os.path.join(root, file)
-                file_ext = os.path.splitext(file)[1].lower()
-                
-                # Categorize files
-                if file_ext in ['.csv', '.xlsx', '.xls']:
-                    self.project_context["data_files"].append(file_path)
-                elif file_ext in ['.png', '.jpg', '.jpeg', '.gif']:
-                    self.project_context["visualization_files"].append(file_path)
-                elif file_ext == '.py' and any(term in file.lower() for term in ['model', 'train', 'predict', 'cluster']):
-                    self.project_context["model_files"].append(file_path)
-                elif file_ext == '.ipynb':
-                    # Try to determine the notebook's purpose
-                    try:
-                        with open(file_path, 'r', encoding='utf-8') as f:
-                            content = f.read().lower()
-                            if 'cluster' in content:
-                                self.project_context["key_analyses"].append("clustering")
-                                self.project_context["identified_topics"].add("clustering")
-                            if 'feature_importance' in content or 'feature importance' in content:
-                                self.project_context["key_analyses"].append("feature importance")
-                                self.project_context["identified_topics"].add("feature importance")
-                            if 'regression' in content:
-                                self.project_context["key_analyses"].append("regression")
-                                self.project_context["identified_topics"].add("regression")
-                            if 'classification' in content:
-                                self.project_context["key_analyses"].append("classification")
-                                self.project_context["identified_topics"].add("classification")
-                    except Exception as e:
-                        logger.warning(f"Could not scan notebook {file_path}: {str(e)}")
+        # Scan the project catalog to gather context
+        for entry in self.index.files():
+            file_path = entry.path
+            file_ext = entry.ext
+            
+            # Categorize files
+            if file_ext in ['.csv', '.xlsx', '.xls']:
+                self.project_context["data_files"].append(file_path)
+            elif file_ext in ['.png', '.jpg', '.jpeg', '.gif']:
+                self.project_context["visualization_files"].append(file_path)
+            elif file_ext == '.py' and any(term in entry.name.lower() for term in ['model', 'train', 'predict', 'cluster']):
+                self.project_context["model_files"].append(file_path)
+            elif file_ext == '.ipynb':
+                # Try to determine the notebook's purpose (the text is kept for process_notebook)
+                try:
+                    content = entry.read_text().lower()
+                    if 'cluster' in content:
+                        self.project_context["key_analyses"].append("clustering")
+                        self.project_context["identified_topics"].add("clustering")
+                    if 'feature_importance' in content or 'feature importance' in content:
+                        self.project_context["key_analyses"].append("feature importance")
+                        self.project_context["identified_topics"].add("feature importance")
+                    if 'regression' in content:
+                        self.project_context["key_analyses"].append("regression")
+                        self.project_context["identified_topics"].add("regression")
+                    if 'classification' in content:
+                        self.project_context["key_analyses"].append("classification")
+                        self.project_context["identified_topics"].add("classification")
+                except Exception as e:
+                    logger.warning(f"Could not scan notebook {file_path}: {str(e)}")
         
         # Extract key terms from filenames
         for file_path in self.project_context["data_files"] + self.project_context["model_files"]:
@@ -121,12 +159,20 @@ class ProjectReportGenerator:
                     self.project_context["key_terms"].add(term)
         
         # Remove duplicates
-        self.project_context["key_analyses"] = list(set(self.project_context["key_analyses"]))
+        self.project_context["key_analyses"] = sorted(set(self.project_context["key_analyses"]))
         
-        logger.info(f"Project context built. Identified topics: {', '.join(self.project_context['identified_topics'])}")
+        logger.info(f"Project context built. Identified topics: {', '.join(sorted(self.project_context['identified_topics']))}")
+
+    @property
+    def index(self):
+        """Catalog of the project tree, built on first use with a single scandir pass"""
+        if self._index is None:
+            self._index = ProjectIndex(self.project_root)
+            logger.info(f"Indexed {len(self._index.entries)} files and directories")
+        return self._index
 
     def _setup_openai(self):
-        """Set up OpenAI API client"""
+        """Load the OpenAI API key and set up the LLM backend and worker pool"""
         try:
             # Try to load from .env file first
             load_dotenv(os.path.join(self.project_root, 'Code', 'OPENAI_API_KEY.env'))
@@ -143,41 +189,121 @@ class ProjectReportGenerator:
                         else:
                             self.api_key = content
             
-            if self.api_key:
-                openai.api_key = self.api_key
-                self.client = openai.OpenAI(api_key=self.api_key)
-                logger.info("OpenAI API client initialized successfully")
+            if self.backend is None:
+                self.backend = create_backend(api_key=self.api_key)
+            if self.backend is not None:
+                logger.info(f"LLM backend initialized: {type(self.backend).__name__}, model {self.model}")
             else:
-                logger.warning("OpenAI API key not found. ChatGPT features will be disabled.")
+                logger.warning("OpenAI API key not found. Only cached ChatGPT responses will be used.")
         except Exception as e:
-            logger.error(f"Error setting up OpenAI client: {str(e)}")
-            self.client = None
+            logger.error(f"Error setting up the LLM backend: {str(e)}")
+            self.backend = None
+        
+        # Without a backend the pool still serves responses from the cache
+        self.llm_pool = LLMWorkerPool(self.backend, model=self.model, max_concurrency=self.max_concurrency,
+                                      cache=self.response_cache)
 
-    def _query_chatgpt(self, prompt, max_retries=3, retry_delay=5):
+    def _query_chatgpt(self, prompt):
+        """
+        Query ChatGPT with error handling and retries (a single blocking request)
         """
-        Query ChatGPT with error handling and retries
+        return self.llm_pool.run([prompt])[0]
+    
+    def _defer_query(self, prompt, render):
         """
-        if not self.client:
-            return "ChatGPT integration not available (API key not found)."
+        Queue a ChatGPT prompt and reserve its place in the report
         
-        for attempt in range(max_retries):
+        render(response) is called by _resolve_queries once every queued prompt has
+        been answered; the elements it adds are placed where the prompt was queued.
+        """
+        query = _PendingQuery(prompt, render)
+        if self._recording is not None:
+            query.record = self._recording
+            query.slot = self._recording.reserve_query()
+        self.pending_queries.append(query)
+        self.elements.append(query)
+    
+    def _resolve_queries(self):
+        """Answer all queued prompts concurrently and fill in their report elements in order"""
+        if not self.pending_queries:
+            return
+        
+        logger.info(f"Answering {len(self.pending_queries)} queued ChatGPT prompts...")
+        responses = self.llm_pool.run([query.prompt for query in self.pending_queries])
+        for query, response in zip(self.pending_queries, responses):
+            query.response = response
+        
+        # Render each response into its reserved slot
+        elements = self.elements
+        self.elements = []
+        for element in elements:
+            if not isinstance(element, _PendingQuery):
+                self.elements.append(element)
+                continue
+            # Responses that belong to a file section are recorded into it
+            collector = SectionRecord() if element.record is not None else None
+            self._recording = collector
             try:
-                response = self.client.chat.completions.create(
-                    model="gpt-3.5-turbo",
-                    messages=[
-                        {"role": "system", "content": "You are a helpful data science assistant. Provide clear, concise explanations of code and analytical results."},
-                        {"role": "user", "content": prompt}
-                    ],
-                    max_tokens=1000
-                )
-                return response.choices[0].message.content
+                element.render(element.response)
             except Exception as e:
-                logger.warning(f"ChatGPT query failed (attempt {attempt+1}/{max_retries}): {str(e)}")
-                if attempt < max_retries - 1:
-                    time.sleep(retry_delay)
-                else:
-                    logger.error("All ChatGPT query attempts failed")
-                    return f"Error querying ChatGPT: {str(e)}"
+                logger.error(f"Error adding ChatGPT response: {str(e)}")
+                self.add_paragraph(f"Error adding this summary: {str(e)}")
+                if collector is not None:
+                    collector.complete = False
+            finally:
+                self._recording = None
+            if collector is not None:
+                element.record.fill_query(element.slot, collector.ops,
+                                          ok=collector.complete and not is_error_response(element.response))
+        self.pending_queries = []
+    
+    def _record(self, op, *args):
+        """Note an element-building call in the section being recorded"""
+        if self._recording is not None:
+            self._recording.add(op, args)
+    
+    def _record_failure(self):
+        """Keep the section being recorded out of the manifest (it hit an error)"""
+        if self._recording is not None:
+            self._recording.complete = False
+    
+    def _process_file(self, method, file_path):
+        """
+        Process a file with one of the process_* methods, or reuse its section
+        
+        The elements a file produces are recorded as the add_* calls that built
+        them. If the report manifest holds a section for the same method and file
+        and the file is unchanged, those calls are replayed instead.
+        
+        Args:
+            method: Bound process_* method
+            file_path: File to process
+        """
+        key = f"{method.__name__}:{os.path.relpath(file_path, self.project_root)}"
+        entry = self.index.get(file_path)
+        
+        ops = self.report_manifest.lookup(key, entry) if self.reuse_sections else None
+        if ops is not None:
+            for op, args in ops:
+                getattr(self, op)(*args)
+            self.sections_reused += 1
+            return
+        
+        record = SectionRecord(key, entry)
+        self._recording = record
+        try:
+            method(file_path)
+        finally:
+            self._recording = None
+        self.recorded_sections.append(record)
+        self.sections_processed += 1
+    
+    def _save_report_manifest(self):
+        """Store the sections recorded in this run (once their responses are rendered)"""
+        for record in self.recorded_sections:
+            self.report_manifest.store(record)
+        self.report_manifest.save()
+        logger.info(f"Report sections reused: {self.sections_reused}, processed: {self.sections_processed}")
     
     def initialize_document(self):
         """Initialize the PDF document with improved styling"""
@@ -294,6 +420,7 @@ class ProjectReportGenerator:
         
         # Clear elements list
         self.elements = []
+        self.pending_queries = []
         
         # Add cover page
         self.add_cover_page()
@@ -369,6 +496,7 @@ class ProjectReportGenerator:
 
     def add_heading(self, text, level=1):
         """Add a heading to the document with improved formatting"""
+        self._record('add_heading', text, level)
         style_name = f"Heading{level}"
         
         # Add additional space before level 1 headings
@@ -391,15 +519,18 @@ class ProjectReportGenerator:
     
     def add_paragraph(self, text, style_name='Normal'):
         """Add a paragraph to the document with specified style"""
+        self._record('add_paragraph', text, style_name)
         self.elements.append(Paragraph(text, self.styles[style_name]))
                      
     def add_bullet_point(self, text):
         """Add a bullet point with proper formatting"""
+        self._record('add_bullet_point', text)
         bullet_text = f"• {text}"
         self.elements.append(Paragraph(bullet_text, self.styles['ListItem']))                         
                          
     def add_code(self, code):
         """Add code with improved formatting"""
+        self._record('add_code', code)
         # Encapsulate in a single paragraph for better appearance
         formatted_code = code.replace('\n', '<br/>')
         formatted_code = formatted_code.replace(' ', '&nbsp;')  # Preserve spaces
@@ -438,31 +569,40 @@ class ProjectReportGenerator:
                     width = height / aspect_ratio
             except Exception as e:
                 logger.warning(f"Could not determine image dimensions for {image_path}: {str(e)}")
+                self._record_failure()
                 # Default safe values
                 width = 4 * inch
                 height = None
             
-            # Center the image on the page
-            img_container = Table([[ReportLabImage(image_path, width=width, height=height)]], 
-                                colWidths=[self.doc.width])
-            img_container.setStyle(TableStyle([('ALIGN', (0, 0), (-1, -1), 'CENTER'),
-                                            ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
-                                            ('LEFTPADDING', (0, 0), (-1, -1), 0),
-                                            ('RIGHTPADDING', (0, 0), (-1, -1), 0)]))
-            self.elements.append(img_container)
-            
-            # Add caption if provided
-            if caption:
-                self.elements.append(Paragraph(caption, self.styles['Caption']))
-            
-            self.elements.append(Spacer(1, 0.2*inch))
+            self._add_image_flowables(image_path, width, height, caption)
             return True
         except Exception as e:
             logger.error(f"Failed to add image {image_path}: {str(e)}")
+            self._record_failure()
             return False
+    
+    def _add_image_flowables(self, image_path, width, height, caption=None):
+        """Add an already sized image (recorded, so reused sections skip opening it)"""
+        self._record('_add_image_flowables', image_path, width, height, caption)
+        
+        # Center the image on the page
+        img_container = Table([[ReportLabImage(image_path, width=width, height=height)]], 
+                            colWidths=[self.doc.width])
+        img_container.setStyle(TableStyle([('ALIGN', (0, 0), (-1, -1), 'CENTER'),
+                                        ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
+                                        ('LEFTPADDING', (0, 0), (-1, -1), 0),
+                                        ('RIGHTPADDING', (0, 0), (-1, -1), 0)]))
+        self.elements.append(img_container)
+        
+        # Add caption if provided
+        if caption:
+            self.elements.append(Paragraph(caption, self.styles['Caption']))
+        
+        self.elements.append(Spacer(1, 0.2*inch))
 
     def add_table(self, data, col_widths=None, highlight_header=True, alternating_colors=True):
         """Add a table with improved formatting"""
+        self._record('add_table', data, col_widths, highlight_header, alternating_colors)
         try:
             if not data:
                 return
@@ -503,6 +643,7 @@ class ProjectReportGenerator:
             self.elements.append(Spacer(1, 0.25*inch))
         except Exception as e:
             logger.error(f"Failed to add table: {str(e)}")
+            self._record_failure()
     
     def process_code_file(self, file_path):
         """Process a single code file and extract insights"""
@@ -527,9 +668,11 @@ class ProjectReportGenerator:
                 {code_content[:4000]}  # Limit to avoid token limits
                 """
                 
-                summary = self._query_chatgpt(prompt)
-                self.add_paragraph("Code Summary:")
-                self.add_paragraph(summary)
+                def render(summary):
+                    self.add_paragraph("Code Summary:")
+                    self.add_paragraph(summary)
+                
+                self._defer_query(prompt, render)
                 
                 # Add shortened code sample (first 30 lines)
                 code_lines = code_content.split('\n')
@@ -551,13 +694,13 @@ class ProjectReportGenerator:
                 
         except Exception as e:
             logger.error(f"Error processing file {file_path}: {str(e)}")
+            self._record_failure()
             self.add_paragraph(f"Error processing this file: {str(e)}")
 
     def process_notebook(self, notebook_path):
         """Process a Jupyter notebook with improved content summarization"""
         try:
-            with open(notebook_path, 'r', encoding='utf-8') as f:
-                notebook_content = json.load(f)
+            notebook_content = json.loads(self.index.read_text(notebook_path))
             
             # Check basic structure
             if "cells" not in notebook_content:
@@ -635,7 +778,7 @@ class ProjectReportGenerator:
             
             # Remove duplicates and limit entries
             for key in notebook_info:
-                notebook_info[key] = list(set(notebook_info[key]))[:5]  # Take only the first 5 unique items
+                notebook_info[key] = sorted(set(notebook_info[key]))[:5]  # Sorted, so prompts are the same on every run
             
             # Extract headings from markdown for better structure understanding
             headings = []
@@ -673,15 +816,15 @@ class ProjectReportGenerator:
                     self.add_paragraph(f"Custom functions: {functions}")
                 
                 if notebook_info["visualizations"]:
-                    visualizations = ", ".join(set(notebook_info["visualizations"]))
+                    visualizations = ", ".join(notebook_info["visualizations"])
                     self.add_paragraph(f"Visualization methods: {visualizations}")
                     
                 if notebook_info["model_types"]:
-                    models = ", ".join(set(notebook_info["model_types"]))
+                    models = ", ".join(notebook_info["model_types"])
                     self.add_paragraph(f"Analysis techniques: {models}")
                     
                 if notebook_info["data_operations"]:
-                    operations = ", ".join(set(notebook_info["data_operations"]))
+                    operations = ", ".join(notebook_info["data_operations"])
                     self.add_paragraph(f"Data operations: {operations}")
                     
             # Combine markdown text and code snippets for better context
@@ -719,20 +862,22 @@ class ProjectReportGenerator:
             {code_sample[:1500]}
             """
             
-            summary = self._query_chatgpt(prompt)
+            def render(summary):
+                # Clean and display the summary
+                self.add_heading("Notebook Summary:", level=3)
+                # Split into paragraphs for better readability
+                summary_paragraphs = summary.split('\n\n')
+                for paragraph in summary_paragraphs:
+                    if paragraph.strip():
+                        # Clean any remaining markdown
+                        clean_para = self._clean_markdown(paragraph)
+                        self.add_paragraph(clean_para)
             
-            # Clean and display the summary
-            self.add_heading("Notebook Summary:", level=3)
-            # Split into paragraphs for better readability
-            summary_paragraphs = summary.split('\n\n')
-            for paragraph in summary_paragraphs:
-                if paragraph.strip():
-                    # Clean any remaining markdown
-                    clean_para = self._clean_markdown(paragraph)
-                    self.add_paragraph(clean_para)
+            self._defer_query(prompt, render)
             
         except Exception as e:
             logger.error(f"Error processing notebook {notebook_path}: {str(e)}")
+            self._record_failure()
             self.add_paragraph(f"Error processing this notebook: {str(e)}")
 
     def _clean_markdown(self, text):
@@ -791,12 +936,15 @@ class ProjectReportGenerator:
                 Provide a brief, educated guess (2-3 sentences) about what information this plot might be visualizing.
                 """
                 
-                interpretation = self._query_chatgpt(prompt)
-                self.add_paragraph("Possible interpretation:")
-                self.add_paragraph(interpretation)
+                def render(interpretation):
+                    self.add_paragraph("Possible interpretation:")
+                    self.add_paragraph(interpretation)
+                
+                self._defer_query(prompt, render)
                 
         except Exception as e:
             logger.error(f"Error processing image {image_path}: {str(e)}")
+            self._record_failure()
             self.add_paragraph(f"Error processing this image: {str(e)}")
     
     def process_excel_file(self, excel_path):
@@ -864,12 +1012,15 @@ class ProjectReportGenerator:
             Please provide a brief hypothesis (3-4 sentences).
             """
             
-            interpretation = self._query_chatgpt(prompt)
-            self.add_paragraph("Possible content interpretation:")
-            self.add_paragraph(interpretation)
+            def render(interpretation):
+                self.add_paragraph("Possible content interpretation:")
+                self.add_paragraph(interpretation)
+            
+            self._defer_query(prompt, render)
             
         except Exception as e:
             logger.error(f"Error processing Excel file {excel_path}: {str(e)}")
+            self._record_failure()
             self.add_paragraph(f"Error processing this Excel file: {str(e)}")
     
     def process_csv_file(self, csv_path):
@@ -911,6 +1062,7 @@ class ProjectReportGenerator:
             except Exception as e:
                 # Fallback to basic CSV reading if pandas fails
                 logger.warning(f"Pandas reading failed for {csv_path}, falling back to CSV reader: {str(e)}")
+                self._record_failure()
                 
                 with open(csv_path, 'r', encoding='utf-8', errors='ignore') as f:
                     csv_reader = csv.reader(f)
@@ -931,12 +1083,15 @@ class ProjectReportGenerator:
             Please provide a brief hypothesis (3-4 sentences).
             """
             
-            interpretation = self._query_chatgpt(prompt)
-            self.add_paragraph("Possible data interpretation:")
-            self.add_paragraph(interpretation)
+            def render(interpretation):
+                self.add_paragraph("Possible data interpretation:")
+                self.add_paragraph(interpretation)
+            
+            self._defer_query(prompt, render)
             
         except Exception as e:
             logger.error(f"Error processing CSV file {csv_path}: {str(e)}")
+            self._record_failure()
             self.add_paragraph(f"Error processing this CSV file: {str(e)}")
     
     def process_docx_file(self, docx_path):
@@ -991,12 +1146,15 @@ class ProjectReportGenerator:
             Based on this information, provide a concise summary (maximum 200 words) of what this document appears to contain and its significance to the project.
             """
             
-            summary = self._query_chatgpt(prompt)
-            self.add_paragraph("Document Summary:")
-            self.add_paragraph(summary)
+            def render(summary):
+                self.add_paragraph("Document Summary:")
+                self.add_paragraph(summary)
+            
+            self._defer_query(prompt, render)
             
         except Exception as e:
             logger.error(f"Error processing Word document {docx_path}: {str(e)}")
+            self._record_failure()
             self.add_paragraph(f"Error processing this Word document: {str(e)}")
     
     def process_markdown_file(self, md_path):
@@ -1048,12 +1206,15 @@ class ProjectReportGenerator:
             Please provide a concise summary (maximum 150 words) of what this document contains and its purpose in the project.
             """
             
-            summary = self._query_chatgpt(prompt)
-            self.add_paragraph("Document Summary:")
-            self.add_paragraph(summary)
+            def render(summary):
+                self.add_paragraph("Document Summary:")
+                self.add_paragraph(summary)
+            
+            self._defer_query(prompt, render)
             
         except Exception as e:
             logger.error(f"Error processing Markdown file {md_path}: {str(e)}")
+            self._record_failure()
             self.add_paragraph(f"Error processing this Markdown file: {str(e)}")
     
     def explore_directory(self, directory_path, section_title=None):
@@ -1063,15 +1224,11 @@ class ProjectReportGenerator:
         if section_title:
             self.add_heading(section_title, level=1)
         
-        # Get all files and dirs, sorted alphabetically
+        # Get all files and dirs from the catalog (sorted, hidden items and __pycache__ skipped)
         try:
-            all_items = sorted(os.listdir(directory_path))
-            files = [f for f in all_items if os.path.isfile(os.path.join(directory_path, f))]
-            dirs = [d for d in all_items if os.path.isdir(os.path.join(directory_path, d))]
-            
-            # Skip hidden files and certain directories
-            files = [f for f in files if not f.startswith('.') and f != '__pycache__']
-            dirs = [d for d in dirs if not d.startswith('.') and d != '__pycache__']
+            file_entries, dir_entries = self.index.listdir(directory_path)
+            files = [entry.name for entry in file_entries]
+            dirs = [entry.name for entry in dir_entries]
             
             # Add directory summary
             if files or dirs:
@@ -1088,8 +1245,9 @@ class ProjectReportGenerator:
                     self.add_paragraph(dir_list)
             
             # Process individual files
-            for file in files:
-                file_path = os.path.join(directory_path, file)
+            for entry in file_entries:
+                file = entry.name
+                file_path = entry.path
                 
                 # Skip already processed files to avoid repetition
                 if file_path in self.processed_files:
@@ -1097,34 +1255,33 @@ class ProjectReportGenerator:
                     
                 self.processed_files.add(file_path)
                 
-                file_ext = os.path.splitext(file)[1].lower()
+                file_ext = entry.ext
                 
                 # Process different file types
                 if file_ext in ['.py']:
-                    self.process_code_file(file_path)
+                    self._process_file(self.process_code_file, file_path)
                 elif file_ext == '.ipynb':
-                    self.process_notebook(file_path)
+                    self._process_file(self.process_notebook, file_path)
                 elif file_ext in ['.png', '.jpg', '.jpeg', '.gif', '.bmp']:
-                    self.process_image_file(file_path)
+                    self._process_file(self.process_image_file, file_path)
                 elif file_ext in ['.xlsx', '.xls']:
-                    self.process_excel_file(file_path)
+                    self._process_file(self.process_excel_file, file_path)
                 elif file_ext == '.csv':
-                    self.process_csv_file(file_path)
+                    self._process_file(self.process_csv_file, file_path)
                 elif file_ext == '.docx':
-                    self.process_docx_file(file_path)
+                    self._process_file(self.process_docx_file, file_path)
                 elif file_ext in ['.md', '.markdown']:
-                    self.process_markdown_file(file_path)
+                    self._process_file(self.process_markdown_file, file_path)
                 else:
                     # Other file types, just add a brief entry
-                    file_size = os.path.getsize(file_path) / 1024  # Size in KB
+                    file_size = entry.size / 1024  # Size in KB
                     self.add_heading(f"File: {file}", level=3)
                     self.add_paragraph(f"Type: {file_ext}, Size: {file_size:.2f} KB")
             
             # Process subdirectories recursively
-            for subdir in dirs:
-                subdir_path = os.path.join(directory_path, subdir)
-                self.add_heading(f"Subdirectory: {subdir}", level=2)
-                self.explore_directory(subdir_path)
+            for subdir in dir_entries:
+                self.add_heading(f"Subdirectory: {subdir.name}", level=2)
+                self.explore_directory(subdir.path)
                 
         except Exception as e:
             logger.error(f"Error exploring directory {directory_path}: {str(e)}")
@@ -1158,8 +1315,7 @@ class ProjectReportGenerator:
             Make it concise (200-250 words) but informative, written in a professional and executive tone.
             """
             
-            executive_summary = self._query_chatgpt(prompt)
-            self.add_paragraph(executive_summary)
+            self._defer_query(prompt, self.add_paragraph)
             
             # Add page break after executive summary
             self.elements.append(PageBreak())
@@ -1182,8 +1338,7 @@ class ProjectReportGenerator:
             Make it detailed and insightful (250-300 words), with a professional and technical focus.
             """
             
-            overview = self._query_chatgpt(prompt)
-            self.add_paragraph(overview)
+            self._defer_query(prompt, self.add_paragraph)
             
             # Process important files first to avoid duplicating in directory exploration
             self.process_key_files()
@@ -1218,6 +1373,10 @@ class ProjectReportGenerator:
             # Generate conclusion and insights
             self.generate_conclusion()
             
+            # Answer every collected prompt concurrently and fill in the summaries
+            self._resolve_queries()
+            self._save_report_manifest()
+            
             # Save the document
             self.doc.build(self.elements, canvasmaker=PageNumCanvas)
             logger.info(f"Report successfully saved to {self.output_pdf}")
@@ -1228,6 +1387,7 @@ class ProjectReportGenerator:
             # Try to save what we have so far
             if self.elements:
                 try:
+                    self._resolve_queries()
                     self.doc.build(self.elements, canvasmaker=PageNumCanvas)
                     logger.info(f"Partial report saved to {self.output_pdf}")
                 except Exception as inner_e:
@@ -1253,13 +1413,12 @@ class ProjectReportGenerator:
         key_files_found = False
         for pattern_info in key_patterns:
             pattern = pattern_info["pattern"]
-            for root, dirs, files in os.walk(self.project_root):
-                for file in glob.glob(os.path.join(root, os.path.basename(pattern))):
-                    if file not in self.processed_files:
-                        key_files_found = True
-                        self.add_heading(f"{pattern_info['title']}: {os.path.basename(file)}", level=2)
-                        pattern_info["method"](file)
-                        self.processed_files.add(file)
+            for entry in self.index.find(os.path.basename(pattern)):
+                if entry.path not in self.processed_files:
+                    key_files_found = True
+                    self.add_heading(f"{pattern_info['title']}: {entry.name}", level=2)
+                    self._process_file(pattern_info["method"], entry.path)
+                    self.processed_files.add(entry.path)
         
         if not key_files_found:
             self.add_paragraph("No key analysis files were found in the project.")    
@@ -1272,20 +1431,16 @@ class ProjectReportGenerator:
         def explore(dir_path, indent=0):
             """Helper function to explore directory structure"""
             try:
-                items = sorted(os.listdir(dir_path))
-                
-                # Skip hidden items and __pycache__
-                items = [item for item in items if not item.startswith('.') and item != '__pycache__']
+                file_entries, dir_entries = self.index.listdir(dir_path)
                 
-                for item in items:
-                    item_path = os.path.join(dir_path, item)
-                    rel_path = os.path.relpath(item_path, self.project_root)
+                for entry in sorted(file_entries + dir_entries, key=lambda entry: entry.name):
+                    rel_path = os.path.relpath(entry.path, self.project_root)
                     
-                    if os.path.isdir(item_path):
+                    if entry.is_dir:
                         structure.append("  " * indent + f"Directory: {rel_path}/")
                         # Limit recursion depth to avoid too much detail
                         if indent < 3:
-                            explore(item_path, indent + 1)
+                            explore(entry.path, indent + 1)
                     else:
                         structure.append("  " * indent + f"File: {rel_path}")
             except Exception as e:
@@ -1300,43 +1455,44 @@ class ProjectReportGenerator:
         
         # Look for key files
         plot_file = os.path.join(self.project_root, "Code", "Plots.do")
-        if os.path.exists(plot_file):
+        if plot_file in self.index:
             self.add_heading("Plots.do Analysis", level=2)
-            self.process_code_file(plot_file)
+            self._process_file(self.process_code_file, plot_file)
         
         # Check for specific notebooks
         cluster_nb = os.path.join(self.project_root, "Code", "Cluster_Analysis.ipynb")
-        if os.path.exists(cluster_nb):
+        if cluster_nb in self.index:
             self.add_heading("Cluster Analysis Notebook", level=2)
-            self.process_notebook(cluster_nb)
+            self._process_file(self.process_notebook, cluster_nb)
         
         feature_nb = os.path.join(self.project_root, "Code", "Feature_Importance.ipynb")
-        if os.path.exists(feature_nb):
+        if feature_nb in self.index:
             self.add_heading("Feature Importance Notebook", level=2)
-            self.process_notebook(feature_nb)
+            self._process_file(self.process_notebook, feature_nb)
         
         # Check for important results files
-        for root, dirs, files in os.walk(os.path.join(self.project_root, "Output")):
-            for file in files:
-                if "model_performance" in file.lower() or "confusion_matrix" in file.lower() or "feature_importance" in file.lower():
-                    file_path = os.path.join(root, file)
-                    self.add_heading(f"Key Result: {file}", level=2)
-                    
-                    file_ext = os.path.splitext(file)[1].lower()
-                    if file_ext == '.csv':
-                        self.process_csv_file(file_path)
-                    elif file_ext in ['.xlsx', '.xls']:
-                        self.process_excel_file(file_path)
-                    elif file_ext in ['.png', '.jpg', '.jpeg', '.gif']:
-                        self.process_image_file(file_path)
+        for entry in self.index.files(under=os.path.join(self.project_root, "Output")):
+            file = entry.name
+            if "model_performance" in file.lower() or "confusion_matrix" in file.lower() or "feature_importance" in file.lower():
+                file_path = entry.path
+                self.add_heading(f"Key Result: {file}", level=2)
+                
+                file_ext = entry.ext
+                if file_ext == '.csv':
+                    self._process_file(self.process_csv_file, file_path)
+                elif file_ext in ['.xlsx', '.xls']:
+                    self._process_file(self.process_excel_file, file_path)
+                elif file_ext in ['.png', '.jpg', '.jpeg', '.gif']:
+                    self._process_file(self.process_image_file, file_path)
     
     def generate_conclusion(self):
         """Generate a professional conclusion with context-aware insights"""
         self.add_heading("Conclusions and Recommendations", level=1)
         
         # Use the built project context for more meaningful conclusions
-        analysis_types = list(self.project_context["identified_topics"])
-        key_terms = list(self.project_context["key_terms"])
+        # Sorted: set order changes between runs, which would defeat the response cache
+        analysis_types = sorted(self.project_context["identified_topics"])
+        key_terms = sorted(self.project_context["key_terms"])
         
         # Create a more focused prompt based on what we've learned about the project
         if analysis_types:
@@ -1365,13 +1521,14 @@ class ProjectReportGenerator:
         Focus particularly on insights related to {', '.join(analysis_types) if analysis_types else 'data analysis'}.
         """
         
-        conclusion = self._query_chatgpt(prompt)
+        def render_conclusion(conclusion):
+            # Split into paragraphs for better readability
+            paragraphs = conclusion.split('\n\n')
+            for paragraph in paragraphs:
+                if paragraph.strip():
+                    self.add_paragraph(paragraph)
         
-        # Split into paragraphs for better readability
-        paragraphs = conclusion.split('\n\n')
-        for paragraph in paragraphs:
-            if paragraph.strip():
-                self.add_paragraph(paragraph)
+        self._defer_query(prompt, render_conclusion)
         
         # Add recommendations section with context awareness
         self.add_heading("Recommendations for Next Steps", level=2)
@@ -1386,16 +1543,28 @@ class ProjectReportGenerator:
         Make each recommendation 2-3 sentences, starting with an action verb.
         """
         
-        recommendations = self._query_chatgpt(prompt)
-        
-        # Split and format as bullet points
-        rec_list = recommendations.split('\n')
-        for rec in rec_list:
-            rec = rec.strip()
-            if rec and not rec.isspace():
-                # Remove numbers or dashes at the beginning if they exist
-                rec = re.sub(r'^[\d\-\.\s]+', '', rec).strip()
-                self.add_bullet_point(rec)
+        def render_recommendations(recommendations):
+            # Split and format as bullet points
+            rec_list = recommendations.split('\n')
+            for rec in rec_list:
+                rec = rec.strip()
+                if rec and not rec.isspace():
+                    # Remove numbers or dashes at the beginning if they exist
+                    rec = re.sub(r'^[\d\-\.\s]+', '', rec).strip()
+                    self.add_bullet_point(rec)
+        
+        self._defer_query(prompt, render_recommendations)
+
+
+class _PendingQuery:
+    """Placeholder in the element list for a ChatGPT response that is not yet available"""
+    def __init__(self, prompt, render):
+        self.prompt = prompt
+        self.render = render
+        self.response = None
+        # Section (and its query slot) the response belongs to, if any
+        self.record = None
+        self.slot = None
 
 
 class PageNumCanvas(canvas.Canvas):
@@ -1446,8 +1615,10 @@ def main():
         print("Starting Project Report Generator...")
         print(f"Analyzing project in: {project_root}")
         
-        # Initialize the report generator
-        generator = ProjectReportGenerator(project_root)
+        # Initialize the report generator (REPORT_CACHE_MODE=offline, read_only or refresh
+        # changes how stored ChatGPT responses are used; LLM_BACKEND=stub or LLM_BASE_URL
+        # pointing at llm_stub_server.py runs without network access)
+        generator = ProjectReportGenerator(project_root, cache_mode=os.getenv('REPORT_CACHE_MODE', 'read_write'))
         
         # Build project context first for better analysis
         print("Building project context...")
@@ -1456,8 +1627,13 @@ def main():
         # Process the project with progress updates
         print("Generating report...")
         output_pdf = generator.process_project()
+        generator.llm_pool.close()
         
         print(f"Report generation complete! PDF saved to: {output_pdf}")
+        print(f"ChatGPT responses from cache: {generator.response_cache.hits}, "
+              f"not cached: {generator.response_cache.misses}")
+        print(f"Report sections reused from the last run: {generator.sections_reused}, "
+              f"processed: {generator.sections_processed}")
         print("You can now view the comprehensive project analysis.")
         return 0
         
@@ -0,0 +1,75 @@
+# caching.py
+
+import os
+import json
+import hashlib
+
+import numpy as np
+import pandas as pd
+
+# Project root (the directory containing Code/, Data/ and Output/)
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# All derived caches live under one hidden directory so they are never mistaken
+# for analysis outputs
+CACHE_ROOT = os.path.join(PROJECT_ROOT, '.cache')
+
+
+def cache_dir(name):
+    """
+    Return (and create) a named cache subdirectory
+    """
+    path = os.path.join(CACHE_ROOT, name)
+    os.makedirs(path, exist_ok=True)
+    return path
+
+
+def hash_bytes(*parts):
+    """
+    SHA-256 hex digest of a sequence of bytes/str parts
+    """
+    digest = hashlib.sha256()
+    for part in parts:
+        if isinstance(part, str):
+            part = part.encode('utf-8')
+        digest.update(part)
+        # Separator so that ('ab', 'c') and ('a', 'bc') hash differently
+        digest.update(b'\x00')
+    return digest.hexdigest()
+
+
+def hash_params(params):
+    """
+    Stable hash of a parameter dictionary
+    """
+    return hash_bytes(json.dumps(params, sort_keys=True, default=str))
+
+
+def hash_array(array):
+    """
+    Content hash of a numpy array (shape, dtype and values)
+    """
+    array = np.ascontiguousarray(array)
+    return hash_bytes(str(array.shape), str(array.dtype), array.tobytes())
+
+
+def hash_frame(df):
+    """
+    Content hash of a DataFrame (column names, dtypes, index and values)
+    """
+    row_hashes = pd.util.hash_pandas_object(df, index=True).to_numpy()
+    return hash_bytes(
+        json.dumps([str(col) for col in df.columns]),
+        json.dumps([str(dtype) for dtype in df.dtypes]),
+        row_hashes.tobytes()
+    )
+
+
+def atomic_write_bytes(path, payload):
+    """
+    Write bytes to a file via a temporary file so readers never see partial output
+    """
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'wb') as f:
+        f.write(payload)
+    os.replace(tmp_path, path)
@@ -0,0 +1,215 @@
+# cluster_selection.py
+
+import os
+import json
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+from sklearn.cluster import KMeans
+from sklearn.metrics import calinski_harabasz_score, davies_bouldin_score
+
+from caching import cache_dir, hash_array, hash_bytes, hash_params
+from silhouette_scoring import get_silhouette_scorer
+
+# Range of cluster counts examined by default (matches the old Cluster.do loop)
+DEFAULT_K_VALUES = range(2, 9)
+
+# Bootstrap reference datasets for the gap statistic
+DEFAULT_N_REFS = 20
+
+# Label columns produced by the sweep and the rule used to pick k for each
+LABEL_COLUMN_RULES = OrderedDict([
+    ('cluster_ch', 'ch'),
+    ('cluster_elbow', 'elbow'),
+    ('cluster_gap', 'gap')
+])
+
+
+def reference_datasets(X, n_refs=DEFAULT_N_REFS, random_state=42):
+    """
+    Draw uniform reference datasets for the gap statistic
+
+    Points are drawn uniformly over the bounding box of the data's principal
+    components (Tibshirani et al., 2001) and rotated back, all references in a
+    single vectorized draw.
+
+    Returns:
+        Array of shape (n_refs, n_samples, n_features)
+    """
+    X = np.asarray(X, dtype=np.float64)
+    mean = X.mean(axis=0)
+    _, _, vt = np.linalg.svd(X - mean, full_matrices=False)
+    rotated = (X - mean) @ vt.T
+
+    rng = np.random.default_rng(random_state)
+    draws = rng.uniform(rotated.min(axis=0), rotated.max(axis=0),
+                        size=(n_refs, X.shape[0], rotated.shape[1]))
+    return draws @ vt + mean
+
+
+def evaluate_k(X, k, n_refs=DEFAULT_N_REFS, n_init=10, random_state=42, compute_silhouette=True):
+    """
+    Fit K-Means for one k and compute the selection criteria
+
+    Returns:
+        dict with k, labels, wss, ch, davies_bouldin, silhouette, gap and gap_se
+        (silhouette is None when compute_silhouette is False)
+    """
+    X = np.asarray(X, dtype=np.float64)
+    kmeans = KMeans(n_clusters=k, n_init=n_init, random_state=random_state)
+    labels = kmeans.fit_predict(X)
+
+    # Same reference draws for every k (common random numbers) keep the gap curve smooth
+    ref_log_wss = np.array([
+        np.log(KMeans(n_clusters=k, n_init=1, random_state=random_state).fit(ref).inertia_)
+        for ref in reference_datasets(X, n_refs, random_state)
+    ])
+    log_wss = np.log(kmeans.inertia_)
+
+    return {
+        'k': k,
+        'labels': labels,
+        'wss': float(kmeans.inertia_),
+        'ch': float(calinski_harabasz_score(X, labels)),
+        'davies_bouldin': float(davies_bouldin_score(X, labels)),
+        'silhouette': get_silhouette_scorer(X).score(labels) if compute_silhouette else None,
+        'gap': float(ref_log_wss.mean() - log_wss),
+        'gap_se': float(ref_log_wss.std() * np.sqrt(1 + 1 / n_refs))
+    }
+
+
+def _cache_path(X_hash, k, params):
+    key = hash_bytes(X_hash, hash_params({**params, 'k': k}))
+    return os.path.join(cache_dir('k_sweep'), f"k{k}-{key[:24]}.npz")
+
+
+def _load_cached(path):
+    cached = np.load(path, allow_pickle=False)
+    result = json.loads(str(cached['metrics']))
+    result['labels'] = cached['labels']
+    return result
+
+
+def _save_cached(path, result):
+    metrics = {key: value for key, value in result.items() if key != 'labels'}
+    tmp_path = path + '.tmp.npz'
+    np.savez_compressed(tmp_path, labels=result['labels'], metrics=np.asarray(json.dumps(metrics)))
+    os.replace(tmp_path, path)
+
+
+class KSweepResults:
+    """
+    Selection criteria and labels for every k of a sweep
+    """
+
+    def __init__(self, runs):
+        self.runs = OrderedDict(sorted(runs.items()))
+
+    def __getitem__(self, k):
+        return self.runs[k]
+
+    def __iter__(self):
+        return iter(self.runs.values())
+
+    def __len__(self):
+        return len(self.runs)
+
+    @property
+    def metrics(self):
+        """DataFrame of the criteria indexed by k"""
+        return pd.DataFrame(
+            [{key: value for key, value in run.items() if key != 'labels'} for run in self.runs.values()]
+        ).set_index('k')
+
+    def optimal_k(self, rule):
+        """
+        Pick k by one of the rules:
+            'ch': highest Calinski-Harabasz index
+            'silhouette': highest mean silhouette
+            'davies_bouldin': lowest Davies-Bouldin index
+            'elbow': largest absolute second difference of the WSS curve
+            'gap': smallest k with gap(k) >= gap(k+1) - se(k+1), else the highest gap
+        """
+        metrics = self.metrics
+        if rule == 'ch':
+            return int(metrics['ch'].idxmax())
+        if rule == 'silhouette':
+            return int(metrics['silhouette'].idxmax())
+        if rule == 'davies_bouldin':
+            return int(metrics['davies_bouldin'].idxmin())
+        if rule == 'elbow':
+            second_diff = metrics['wss'].diff().diff().abs()
+            return int(second_diff.idxmax()) if second_diff.notna().any() else int(metrics.index[0])
+        if rule == 'gap':
+            gap, se = metrics['gap'], metrics['gap_se']
+            for k, next_k in zip(metrics.index[:-1], metrics.index[1:]):
+                if gap[k] >= gap[next_k] - se[next_k]:
+                    return int(k)
+            return int(gap.idxmax())
+        raise ValueError(f"Unknown selection rule: {rule}")
+
+    def label_columns(self, index=None, rules=LABEL_COLUMN_RULES):
+        """
+        Cluster assignments at the selected k for each rule, 1-based like the
+        columns Cluster.do used to write
+
+        Returns:
+            DataFrame with one column per rule (e.g. cluster_ch, cluster_elbow, cluster_gap)
+        """
+        return pd.DataFrame(
+            {column: self.runs[self.optimal_k(rule)]['labels'] + 1 for column, rule in rules.items()},
+            index=index
+        )
+
+
+def sweep_k(X, k_values=DEFAULT_K_VALUES, n_refs=DEFAULT_N_REFS, n_init=10, random_state=42,
+            n_jobs=None, use_cache=True):
+    """
+    Fit K-Means for every k in parallel and compute CH, Davies-Bouldin, silhouette,
+    WSS and the bootstrapped gap statistic
+
+    Args:
+        X: Scaled data matrix
+        k_values: Cluster counts to evaluate
+        n_refs: Number of uniform reference datasets for the gap statistic
+        n_init: K-Means restarts per k
+        random_state: Seed for K-Means and the reference draws
+        n_jobs: Worker processes (defaults to one per k, capped at the core count)
+        use_cache: Reuse results stored under .cache/k_sweep for unchanged data and settings
+
+    Returns:
+        KSweepResults
+    """
+    X = np.ascontiguousarray(X, dtype=np.float64)
+    params = {'n_refs': n_refs, 'n_init': n_init, 'random_state': random_state}
+    X_hash = hash_array(X)
+
+    runs = {}
+    pending = []
+    for k in k_values:
+        path = _cache_path(X_hash, k, params)
+        if use_cache and os.path.exists(path):
+            runs[k] = _load_cached(path)
+        else:
+            pending.append(k)
+
+    if pending:
+        n_jobs = max(1, min(len(pending), n_jobs or os.cpu_count() or 1))
+        print(f"Evaluating k = {pending} with {n_jobs} processes "
+              f"({len(runs)} cached)")
+        with ProcessPoolExecutor(max_workers=n_jobs) as executor:
+            futures = {k: executor.submit(evaluate_k, X, k, n_refs, n_init, random_state, False)
+                       for k in pending}
+            for k, future in futures.items():
+                runs[k] = future.result()
+
+        # Silhouettes for all new k share one distance structure in this process
+        scores = get_silhouette_scorer(X).score_many({k: runs[k]['labels'] for k in pending})
+        for k in pending:
+            runs[k]['silhouette'] = scores[k]['score']
+            if use_cache:
+                _save_cached(_cache_path(X_hash, k, params), runs[k])
+
+    return KSweepResults(runs)
@@ -0,0 +1,187 @@
+# cluster_stability.py
+
+import os
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+
+import numpy as np
+import pandas as pd
+
+from method_comparison import build_kmeans
+
+
+def contingency_table(labels_a, labels_b, n_a=None, n_b=None):
+    """
+    Contingency table of two integer labelings (0..n-1) in a single bincount
+
+    Returns:
+        Array of shape (n_a, n_b) with co-occurrence counts
+    """
+    labels_a = np.asarray(labels_a, dtype=np.int64)
+    labels_b = np.asarray(labels_b, dtype=np.int64)
+    n_a = n_a or int(labels_a.max()) + 1
+    n_b = n_b or int(labels_b.max()) + 1
+    return np.bincount(labels_a * n_b + labels_b, minlength=n_a * n_b).reshape(n_a, n_b)
+
+
+def _pairs(counts):
+    counts = np.asarray(counts, dtype=np.float64)
+    return (counts * (counts - 1) / 2).sum()
+
+
+def ari_from_table(table):
+    """Adjusted Rand index from a contingency table"""
+    n = table.sum()
+    index = _pairs(table)
+    rows = _pairs(table.sum(axis=1))
+    cols = _pairs(table.sum(axis=0))
+    expected = rows * cols / _pairs(n) if n > 1 else 0.0
+    max_index = (rows + cols) / 2
+    if max_index == expected:
+        return 1.0
+    return float((index - expected) / (max_index - expected))
+
+
+def jaccard_from_table(table):
+    """
+    Best-match Jaccard similarity of every row cluster against the column clusters
+    (clusterwise stability in the sense of Hennig, 2007)
+    """
+    row_sums = table.sum(axis=1)
+    union = row_sums[:, None] + table.sum(axis=0)[None, :] - table
+    with np.errstate(invalid='ignore', divide='ignore'):
+        jaccard = np.where(union > 0, table / union, 0.0)
+    best = jaccard.max(axis=1) if table.shape[1] else np.zeros(len(row_sums))
+    # Clusters absent from the draw have no defined similarity
+    return np.where(row_sums > 0, best, np.nan)
+
+
+def _draw_indices(n_samples, method, fraction, rng):
+    if method == 'bootstrap':
+        return np.unique(rng.integers(0, n_samples, n_samples))
+    if method == 'subsample':
+        size = max(2, int(round(fraction * n_samples)))
+        return np.sort(rng.choice(n_samples, size, replace=False))
+    raise ValueError(f"Unknown resampling method: {method}")
+
+
+def _fit_draw(X, k, build, method, fraction, seed):
+    """Refit the clustering on one resample (runs inside a worker process)"""
+    rng = np.random.default_rng(seed)
+    indices = _draw_indices(X.shape[0], method, fraction, rng)
+    estimator = build(k, int(rng.integers(0, 2 ** 31 - 1)), {})
+    labels = estimator.fit_predict(X[indices])
+    return indices, np.asarray(labels)
+
+
+class StabilityResults:
+    """
+    Streaming summary of a stability analysis
+
+    Attributes:
+        ari: ARI between the reference labels and each draw (on the resampled rows)
+        jaccard: Best-match Jaccard per reference cluster and draw (n_draws x k)
+        coassignment: Per respondent, the share of its reference cluster-mates
+            (in the same draw) that the refit placed in the same cluster, averaged
+            over the draws that included it
+        n_included: Number of draws that included each respondent
+        reference: Reference cluster index (0..k-1) of each respondent
+    """
+
+    def __init__(self, clusters, reference, ari, jaccard, coassignment, n_included):
+        self.clusters = clusters
+        self.reference = reference
+        self.ari = ari
+        self.jaccard = jaccard
+        self.coassignment = coassignment
+        self.n_included = n_included
+
+    def cluster_summary(self, stable_threshold=0.75):
+        """Mean Jaccard per cluster and the share of draws above the stability threshold"""
+        return pd.DataFrame({
+            'cluster': self.clusters,
+            'mean_jaccard': np.nanmean(self.jaccard, axis=0),
+            'share_stable': np.nanmean(self.jaccard > stable_threshold, axis=0),
+            'mean_coassignment': [np.nanmean(self.coassignment[self.reference == i])
+                                  for i in range(len(self.clusters))]
+        })
+
+    def summary(self):
+        return {
+            'n_draws': len(self.ari),
+            'ari_mean': float(np.mean(self.ari)),
+            'ari_std': float(np.std(self.ari)),
+            'jaccard_mean': float(np.nanmean(self.jaccard))
+        }
+
+
+def cluster_stability(X, reference_labels, n_draws=100, method='subsample', fraction=0.8,
+                      build=build_kmeans, random_state=42, n_jobs=None):
+    """
+    Refit a clustering on bootstrap or subsample draws and measure how well the
+    reference solution is recovered
+
+    Draws run in a process pool. Each result is folded into running totals as it
+    arrives (a few arrays of length n and k), so memory does not grow with the
+    number of draws and no n x n co-assignment matrix is ever built.
+
+    Args:
+        X: Scaled data matrix
+        reference_labels: Labels of the solution being assessed
+        n_draws: Number of resamples (B)
+        method: 'subsample' (without replacement) or 'bootstrap' (unique rows of a
+            bootstrap sample)
+        fraction: Subsample size as a share of the rows
+        build: Estimator builder (k, seed, context) -> estimator, see method_comparison.py
+        random_state: Seed; every draw gets its own child seed
+        n_jobs: Worker processes (defaults to the core count)
+
+    Returns:
+        StabilityResults
+    """
+    X = np.ascontiguousarray(X, dtype=np.float64)
+    clusters, reference = np.unique(np.asarray(reference_labels), return_inverse=True)
+    k = len(clusters)
+    n_samples = X.shape[0]
+
+    ari = np.empty(n_draws)
+    jaccard = np.empty((n_draws, k))
+    coassign_sum = np.zeros(n_samples)
+    n_included = np.zeros(n_samples, dtype=np.int64)
+
+    seeds = np.random.SeedSequence(random_state).generate_state(n_draws)
+    n_jobs = max(1, min(n_draws, n_jobs or os.cpu_count() or 1))
+    print(f"Stability: {n_draws} {method} draws for k={k} with {n_jobs} processes")
+
+    def accumulate(draw, indices, labels):
+        ref = reference[indices]
+        _, draw_labels = np.unique(labels, return_inverse=True)
+        table = contingency_table(ref, draw_labels, n_a=k)
+        ari[draw] = ari_from_table(table)
+        jaccard[draw] = jaccard_from_table(table)
+
+        # Cluster-mates sharing the draw cluster, looked up from the table per respondent
+        mates = table.sum(axis=1)[ref] - 1
+        together = table[ref, draw_labels] - 1
+        with np.errstate(invalid='ignore', divide='ignore'):
+            share = np.where(mates > 0, together / mates, np.nan)
+        valid = ~np.isnan(share)
+        coassign_sum[indices[valid]] += share[valid]
+        n_included[indices[valid]] += 1
+
+    # Keep only a bounded window of draws in flight
+    with ProcessPoolExecutor(max_workers=n_jobs) as executor:
+        pending = {}
+        next_draw = 0
+        while next_draw < n_draws or pending:
+            while next_draw < n_draws and len(pending) < 2 * n_jobs:
+                future = executor.submit(_fit_draw, X, k, build, method, fraction, int(seeds[next_draw]))
+                pending[future] = next_draw
+                next_draw += 1
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                accumulate(pending.pop(future), *future.result())
+
+    with np.errstate(invalid='ignore', divide='ignore'):
+        coassignment = np.where(n_included > 0, coassign_sum / n_included, np.nan)
+
+    return StabilityResults(clusters, reference, ari, jaccard, coassignment, n_included)
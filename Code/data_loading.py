@@ -0,0 +1,208 @@
+# data_loading.py
+
+import os
+import json
+import hashlib
+
+import pandas as pd
+
+from caching import CACHE_ROOT
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
+    pq = None
+
+# Default location of the columnar cache
+DEFAULT_CACHE_DIR = os.path.join(CACHE_ROOT, 'survey_data')
+
+# Key under which survey metadata is stored in the Parquet schema
+METADATA_KEY = b'hbs_survey'
+
+# Bump when the layout of the cached files changes
+CACHE_VERSION = 1
+
+
+def file_hash(path, chunk_size=1 << 20):
+    """
+    Return the SHA-256 hex digest of a file's contents
+    """
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _cached_file_hash(path, cache_dir):
+    """
+    Hash a source file, reusing the previous digest when size and mtime are unchanged
+    """
+    stat = os.stat(path)
+    index_path = os.path.join(cache_dir, 'hash_index.json')
+    index = {}
+    if os.path.exists(index_path):
+        try:
+            with open(index_path, 'r') as f:
+                index = json.load(f)
+        except (OSError, ValueError):
+            index = {}
+
+    key = os.path.abspath(path)
+    entry = index.get(key)
+    if entry and entry['size'] == stat.st_size and entry['mtime_ns'] == stat.st_mtime_ns:
+        return entry['sha256']
+
+    digest = file_hash(path)
+    index[key] = {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns, 'sha256': digest}
+    tmp_path = index_path + '.tmp'
+    with open(tmp_path, 'w') as f:
+        json.dump(index, f, indent=1)
+    os.replace(tmp_path, index_path)
+    return digest
+
+
+def read_stata_with_metadata(path):
+    """
+    Parse a .dta file once, returning the data together with its variable labels,
+    value labels and categorical metadata
+    """
+    with pd.read_stata(path, iterator=True) as reader:
+        data = reader.read()
+        variable_labels = reader.variable_labels()
+        value_labels = reader.value_labels()
+
+    metadata = {
+        'version': CACHE_VERSION,
+        'source': os.path.basename(path),
+        'variable_labels': {col: variable_labels.get(col, '') for col in data.columns},
+        # JSON keys must be strings, so value codes are stored as text
+        'value_labels': {
+            name: {str(code): label for code, label in labels.items()}
+            for name, labels in value_labels.items()
+        },
+        'categorical': {
+            col: {
+                'categories': data[col].cat.categories.tolist(),
+                'ordered': bool(data[col].cat.ordered)
+            }
+            for col in data.columns if isinstance(data[col].dtype, pd.CategoricalDtype)
+        }
+    }
+    return data, metadata
+
+
+def _cache_path(path, digest, cache_dir):
+    stem = os.path.splitext(os.path.basename(path))[0]
+    return os.path.join(cache_dir, f"{stem}-{digest[:16]}.parquet")
+
+
+def _write_cache(data, metadata, cache_path):
+    """
+    Write the data and its metadata to a Parquet file atomically
+    """
+    table = pa.Table.from_pandas(data, preserve_index=False)
+    schema_metadata = dict(table.schema.metadata or {})
+    schema_metadata[METADATA_KEY] = json.dumps(metadata).encode('utf-8')
+    table = table.replace_schema_metadata(schema_metadata)
+
+    tmp_path = cache_path + '.tmp'
+    pq.write_table(table, tmp_path)
+    os.replace(tmp_path, cache_path)
+
+
+def _read_cache_metadata(cache_path):
+    schema = pq.read_schema(cache_path, memory_map=True)
+    return json.loads(schema.metadata[METADATA_KEY].decode('utf-8'))
+
+
+def _resolve_columns(columns, available):
+    """
+    Turn a column list or predicate into an ordered list of existing column names
+    """
+    if columns is None:
+        return None
+    if callable(columns):
+        return [col for col in available if columns(col)]
+    missing = [col for col in columns if col not in available]
+    if missing:
+        raise KeyError(f"Columns not found in survey data: {missing}")
+    return list(columns)
+
+
+def _restore_categoricals(data, metadata):
+    """
+    Re-apply the Stata category order, which Parquet dictionaries do not guarantee
+    """
+    for col, info in metadata['categorical'].items():
+        if col in data.columns:
+            data[col] = pd.Categorical(
+                data[col], categories=info['categories'], ordered=info['ordered']
+            )
+    return data
+
+
+def ensure_cache(path, cache_dir=None, refresh=False):
+    """
+    Convert a .dta file into its content-hashed Parquet cache if needed and
+    return the cache path
+    """
+    cache_dir = cache_dir or DEFAULT_CACHE_DIR
+    os.makedirs(cache_dir, exist_ok=True)
+
+    digest = _cached_file_hash(path, cache_dir)
+    cache_path = _cache_path(path, digest, cache_dir)
+
+    if refresh or not os.path.exists(cache_path):
+        print(f"Building columnar cache for {os.path.basename(path)}")
+        data, metadata = read_stata_with_metadata(path)
+        metadata['sha256'] = digest
+        _write_cache(data, metadata, cache_path)
+
+    return cache_path
+
+
+def load_survey_data(path, columns=None, cache_dir=None, refresh=False, use_cache=True):
+    """
+    Load a Stata survey file through the columnar cache
+
+    Args:
+        path: Path to the .dta file
+        columns: Optional list of column names, or a predicate called with each
+            column name, selecting the columns to read
+        cache_dir: Directory holding the Parquet cache (defaults to .cache/survey_data)
+        refresh: Rebuild the cache even if an up-to-date copy exists
+        use_cache: Set to False to parse the .dta file directly
+
+    Returns:
+        (data, metadata) where metadata holds 'variable_labels', 'value_labels'
+        and 'categorical' entries for the loaded columns
+    """
+    if not use_cache or pq is None:
+        if use_cache:
+            print("Warning: pyarrow not available, reading Stata file without cache")
+        data, metadata = read_stata_with_metadata(path)
+        selected = _resolve_columns(columns, data.columns.tolist())
+        if selected is not None:
+            data = data[selected]
+    else:
+        cache_path = ensure_cache(path, cache_dir=cache_dir, refresh=refresh)
+        metadata = _read_cache_metadata(cache_path)
+        selected = _resolve_columns(columns, list(metadata['variable_labels']))
+
+        # Memory-map the file and read only the requested columns in one pass
+        table = pq.read_table(cache_path, columns=selected, memory_map=True)
+        data = _restore_categoricals(table.to_pandas(), metadata)
+
+    # Restrict the metadata to the columns that were actually loaded
+    loaded = set(data.columns)
+    metadata = dict(metadata)
+    metadata['variable_labels'] = {
+        col: label for col, label in metadata['variable_labels'].items() if col in loaded
+    }
+    metadata['categorical'] = {
+        col: info for col, info in metadata['categorical'].items() if col in loaded
+    }
+    return data, metadata
@@ -0,0 +1,120 @@
+# embedding_store.py
+
+import os
+import json
+
+import joblib
+import numpy as np
+
+from caching import cache_dir, hash_array, hash_bytes, hash_params
+
+# UMAP settings used for the cluster visualizations
+DEFAULT_UMAP_PARAMS = {
+    'n_neighbors': 15,
+    'min_dist': 0.1,
+    'n_components': 2,
+    'random_state': 42
+}
+
+
+def embedding_key(X, params):
+    """Content hash of the input matrix and the reducer parameters"""
+    return hash_bytes(hash_array(np.asarray(X, dtype=np.float64)), hash_params(params))
+
+
+class StoredEmbedding:
+    """
+    A fitted UMAP reducer together with the coordinates of the data it was fitted on
+
+    New survey responses are placed in the same space with transform(), so existing
+    points keep their coordinates.
+    """
+
+    def __init__(self, key, params, embedding, reducer, directory):
+        self.key = key
+        self.params = params
+        self.embedding = embedding
+        self.reducer = reducer
+        self.directory = directory
+
+    def transform(self, X_new):
+        """Embed new rows (scaled like the fitted matrix) without refitting"""
+        return self.reducer.transform(np.asarray(X_new, dtype=np.float64))
+
+    @staticmethod
+    def _paths(key, directory):
+        stem = os.path.join(directory, key[:24])
+        return {'reducer': stem + '.joblib', 'embedding': stem + '.npy', 'meta': stem + '.json'}
+
+    def save(self):
+        paths = self._paths(self.key, self.directory)
+        # Write the reducer and coordinates first; the metadata file marks a complete entry
+        joblib.dump(self.reducer, paths['reducer'] + '.tmp')
+        os.replace(paths['reducer'] + '.tmp', paths['reducer'])
+        with open(paths['embedding'] + '.tmp', 'wb') as f:
+            np.save(f, self.embedding)
+        os.replace(paths['embedding'] + '.tmp', paths['embedding'])
+        with open(paths['meta'] + '.tmp', 'w') as f:
+            json.dump({'key': self.key, 'params': self.params, 'shape': list(self.embedding.shape)}, f, indent=1)
+        os.replace(paths['meta'] + '.tmp', paths['meta'])
+
+    @classmethod
+    def load(cls, key, directory=None):
+        """Load a stored embedding by key, returning None if it is not in the store"""
+        directory = directory or cache_dir('umap')
+        paths = cls._paths(key, directory)
+        if not os.path.exists(paths['meta']):
+            return None
+        with open(paths['meta'], 'r') as f:
+            meta = json.load(f)
+        return cls(
+            key=meta['key'],
+            params=meta['params'],
+            embedding=np.load(paths['embedding']),
+            reducer=joblib.load(paths['reducer']),
+            directory=directory
+        )
+
+
+def fit_embedding(X, params=None, knn_graph=None, use_cache=True, refresh=False, directory=None):
+    """
+    Fit UMAP on a scaled matrix, or reload the stored fit for the same data and parameters
+
+    Args:
+        X: Scaled data matrix
+        params: UMAP parameters (defaults to DEFAULT_UMAP_PARAMS)
+        knn_graph: Optional knn_graph.KNNGraph of X passed to UMAP as precomputed_knn,
+            so UMAP skips its own neighbour search. Only NN-descent graphs are used:
+            the reducer needs their search index to transform() new rows, so for an
+            exact graph UMAP builds its own index instead. The stored fit is keyed on
+            the graph's key (data and graph parameters).
+        use_cache: Look up and store the fit under .cache/umap
+        refresh: Refit even if a stored fit exists
+        directory: Override the store location
+
+    Returns:
+        StoredEmbedding
+    """
+    import umap.umap_ as umap
+
+    params = {**DEFAULT_UMAP_PARAMS, **(params or {})}
+    if knn_graph is not None and knn_graph.method != 'nndescent':
+        knn_graph = None
+    directory = directory or cache_dir('umap')
+    key = embedding_key(X, {**params, 'knn': knn_graph.key if knn_graph is not None else None})
+
+    if use_cache and not refresh:
+        stored = StoredEmbedding.load(key, directory)
+        if stored is not None:
+            print(f"Loaded stored UMAP embedding {key[:12]}")
+            return stored
+
+    umap_params = dict(params)
+    if knn_graph is not None:
+        umap_params['precomputed_knn'] = knn_graph.umap_knn(params['n_neighbors'])
+    reducer = umap.UMAP(**umap_params)
+    embedding = reducer.fit_transform(np.asarray(X, dtype=np.float64))
+    stored = StoredEmbedding(key, params, embedding, reducer, directory)
+    if use_cache:
+        stored.save()
+    return stored
@@ -0,0 +1,189 @@
+# excel_export.py
+
+import os
+import re
+from concurrent.futures import ProcessPoolExecutor
+
+import pandas as pd
+
+# Default number format for numeric columns without a specific rule
+DEFAULT_NUMBER_FORMAT = '#,##0.00'
+
+# Column-name substrings -> number format, checked in order
+CLUSTER_NUMBER_FORMATS = [
+    (('p_value', 'pvalue', 'p value'), '0.0000'),
+    (('cohen', 'effect'), '0.00')
+]
+FEATURE_NUMBER_FORMATS = [
+    (('auc', 'accuracy', 'precision', 'recall', 'f1', 'importance'), '0.0000')
+]
+
+# Widest column, in characters
+MAX_COLUMN_WIDTH = 50
+
+HEADER_COLOR = "4F81BD"
+STRIPE_COLOR = "E6F2FF"
+
+
+def column_number_format(name, rules=(), default=DEFAULT_NUMBER_FORMAT):
+    """Number format for a column, from the first rule whose substring occurs in its name"""
+    lowered = str(name).lower()
+    for substrings, number_format in rules:
+        if any(substring in lowered for substring in substrings):
+            return number_format
+    return default
+
+
+def column_widths(df, max_width=MAX_COLUMN_WIDTH):
+    """Column widths from the longest header or value, using vectorized string lengths"""
+    widths = []
+    for col in df.columns:
+        longest = max(len(str(col)), int(df[col].astype(str).str.len().max()) if len(df) else 0)
+        widths.append(longest + 2 if longest < max_width else max_width)
+    return widths
+
+
+def _header_style():
+    from openpyxl.styles import Alignment, Border, Font, PatternFill, Side
+
+    thin = Side(style="thin")
+    return {
+        'fill': PatternFill(start_color=HEADER_COLOR, end_color=HEADER_COLOR, fill_type="solid"),
+        'font': Font(bold=True, color="FFFFFF", size=11),
+        'alignment': Alignment(horizontal="center", vertical="center", wrap_text=True),
+        'border': Border(left=thin, right=thin, top=thin, bottom=thin)
+    }
+
+
+def write_sheet(workbook, name, df, number_formats=(), default_format=DEFAULT_NUMBER_FORMAT):
+    """
+    Stream a DataFrame into a new sheet of a write-only workbook
+
+    Number formats are resolved once per column and widths are computed before
+    any row is written. Alternating row shading is a single conditional format
+    rather than a fill on every cell.
+    """
+    from openpyxl.cell import WriteOnlyCell
+    from openpyxl.formatting.rule import FormulaRule
+    from openpyxl.styles import PatternFill
+    from openpyxl.utils import get_column_letter
+
+    ws = workbook.create_sheet(name)
+    n_rows, n_cols = df.shape
+
+    # Widths and per-column formats first: write-only sheets need them before the rows
+    for col_num, width in enumerate(column_widths(df), 1):
+        ws.column_dimensions[get_column_letter(col_num)].width = width
+    formats = [
+        column_number_format(col, number_formats, default_format)
+        if pd.api.types.is_numeric_dtype(df[col]) and not pd.api.types.is_bool_dtype(df[col]) else None
+        for col in df.columns
+    ]
+    ws.freeze_panes = "A2"
+
+    header_style = _header_style()
+    header = []
+    for column_title in df.columns:
+        cell = WriteOnlyCell(ws, value=str(column_title))
+        for attribute, style in header_style.items():
+            setattr(cell, attribute, style)
+        header.append(cell)
+    ws.append(header)
+
+    # Missing values become empty cells
+    values = df.astype(object).where(df.notna(), None)
+    for row in values.itertuples(index=False, name=None):
+        cells = []
+        for value, number_format in zip(row, formats):
+            if number_format is not None and value is not None:
+                cell = WriteOnlyCell(ws, value=value)
+                cell.number_format = number_format
+                cells.append(cell)
+            else:
+                cells.append(value)
+        ws.append(cells)
+
+    last_cell = f"{get_column_letter(max(n_cols, 1))}{n_rows + 1}"
+    ws.auto_filter.ref = f"A1:{last_cell}"
+    if n_rows:
+        stripe = PatternFill(start_color=STRIPE_COLOR, end_color=STRIPE_COLOR, fill_type="solid")
+        ws.conditional_formatting.add(f"A2:{last_cell}", FormulaRule(formula=['MOD(ROW(),2)=0'], fill=stripe))
+    return ws
+
+
+def _write_part(path, sheets, number_formats, default_format):
+    """Write one workbook (runs inside a worker process for split output)"""
+    import openpyxl
+
+    workbook = openpyxl.Workbook(write_only=True)
+    for name, df in sheets:
+        write_sheet(workbook, name, df, number_formats, default_format)
+    workbook.save(path)
+    return path
+
+
+def _safe_filename(name):
+    return re.sub(r'[^\w\-]+', '_', name).strip('_')
+
+
+class WorkbookBuilder:
+    """
+    Collects DataFrames as sheets and writes them as a formatted workbook
+
+    Args:
+        number_formats: Rules of (column-name substrings, number format), e.g.
+            CLUSTER_NUMBER_FORMATS
+        default_format: Format of numeric columns matching no rule
+    """
+
+    def __init__(self, number_formats=(), default_format=DEFAULT_NUMBER_FORMAT):
+        self.number_formats = list(number_formats)
+        self.default_format = default_format
+        self.sheets = []
+
+    def __contains__(self, name):
+        return any(sheet_name == name for sheet_name, _ in self.sheets)
+
+    def add_sheet(self, name, df, position=None):
+        """
+        Queue a sheet, making the name unique and at most 31 characters (Excel limit)
+
+        Returns:
+            The sheet name used
+        """
+        name = str(name)[:31]
+        original_name = name
+        counter = 1
+        while name in self:
+            suffix = f"_{counter}"
+            name = f"{original_name[:31 - len(suffix)]}{suffix}"
+            counter += 1
+        entry = (name, df.reset_index(drop=True))
+        if position is None:
+            self.sheets.append(entry)
+        else:
+            self.sheets.insert(position, entry)
+        return name
+
+    def save(self, path):
+        """Write all sheets to one workbook in write-only (streaming) mode"""
+        return _write_part(path, self.sheets, self.number_formats, self.default_format)
+
+    def save_parts(self, directory, n_jobs=None):
+        """
+        Write every sheet to its own workbook, in parallel
+
+        Returns:
+            dict of sheet name -> file path
+        """
+        os.makedirs(directory, exist_ok=True)
+        n_jobs = max(1, min(len(self.sheets), n_jobs or os.cpu_count() or 1))
+        paths = {name: os.path.join(directory, f"{_safe_filename(name)}.xlsx") for name, _ in self.sheets}
+        with ProcessPoolExecutor(max_workers=n_jobs) as executor:
+            futures = [
+                executor.submit(_write_part, paths[name], [(name, df)], self.number_formats, self.default_format)
+                for name, df in self.sheets
+            ]
+            for future in futures:
+                future.result()
+        return paths
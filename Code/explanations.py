@@ -0,0 +1,139 @@
+# explanations.py
+
+import os
+import json
+
+import numpy as np
+import pandas as pd
+import xgboost as xgb
+
+from caching import cache_dir, hash_bytes, hash_frame, hash_params
+
+# Rows per batch when computing contributions
+DEFAULT_BATCH_SIZE = 2048
+
+# Default background size for interventional TreeSHAP
+DEFAULT_BACKGROUND_SIZE = 100
+
+
+def model_hash(model):
+    """
+    Content hash of a fitted XGBoost model (sklearn wrapper or Booster)
+    """
+    booster = model.get_booster() if hasattr(model, 'get_booster') else model
+    return hash_bytes(bytes(booster.save_raw()))
+
+
+def select_background(X, size=DEFAULT_BACKGROUND_SIZE, method='sample', random_state=42):
+    """
+    Summarize a background dataset for interventional SHAP
+
+    Args:
+        X: Background candidates (usually the training set)
+        size: Number of background rows (or k-means centers)
+        method: 'sample' for a random subsample, 'kmeans' for cluster centers
+        random_state: Seed for sampling / k-means
+
+    Returns:
+        DataFrame with at most `size` rows and the columns of X
+    """
+    if len(X) <= size:
+        return X
+    if method == 'sample':
+        return X.sample(n=size, random_state=random_state)
+    if method == 'kmeans':
+        from sklearn.cluster import MiniBatchKMeans
+        kmeans = MiniBatchKMeans(n_clusters=size, random_state=random_state, n_init=3)
+        kmeans.fit(X.to_numpy(dtype=np.float64))
+        return pd.DataFrame(kmeans.cluster_centers_, columns=X.columns)
+    raise ValueError(f"Unknown background method: {method}")
+
+
+def _native_contributions(model, X, batch_size):
+    """Path-dependent TreeSHAP via XGBoost's pred_contribs, computed in row batches"""
+    booster = model.get_booster()
+    values = []
+    for start in range(0, len(X), batch_size):
+        batch = X.iloc[start:start + batch_size]
+        contribs = booster.predict(xgb.DMatrix(batch), pred_contribs=True)
+        values.append(contribs)
+    contribs = np.vstack(values) if values else np.empty((0, X.shape[1] + 1))
+    # The last column holds the bias term (expected model output)
+    return contribs[:, :-1], contribs[:, -1]
+
+
+def _interventional_contributions(model, X, background, batch_size):
+    """Interventional TreeSHAP against a small background set, computed in row batches"""
+    import shap
+    explainer = shap.TreeExplainer(model, data=background, feature_perturbation='interventional')
+    values = []
+    for start in range(0, len(X), batch_size):
+        values.append(explainer.shap_values(X.iloc[start:start + batch_size], check_additivity=False))
+    values = np.vstack(values) if values else np.empty((0, X.shape[1]))
+    base_values = np.full(len(X), np.ravel(explainer.expected_value)[-1])
+    return values, base_values
+
+
+def explain_model(model, X, X_background=None, method='interventional', background_size=DEFAULT_BACKGROUND_SIZE,
+                  background_method='sample', batch_size=DEFAULT_BATCH_SIZE, use_cache=True,
+                  cache_directory=None, random_state=42):
+    """
+    Compute SHAP values for an XGBoost model, reusing cached results when the model
+    and data are unchanged
+
+    Args:
+        model: Fitted XGBClassifier
+        X: Rows to explain (DataFrame)
+        X_background: Background data for method='interventional' (usually X_train)
+        method: 'interventional' (default) for shap.TreeExplainer with a subsampled
+            background, matching shap.Explainer(model, X_train); or 'native' for
+            XGBoost pred_contribs (path-dependent TreeSHAP, faster, ignores
+            X_background, and the values have a different meaning)
+        background_size: Number of background rows / k-means centers
+        background_method: 'sample' or 'kmeans'
+        batch_size: Rows per batch
+        use_cache: Load and store SHAP matrices under .cache/shap
+        cache_directory: Override the cache location
+        random_state: Seed for background selection
+
+    Returns:
+        shap.Explanation with one row per row of X
+    """
+    import shap
+
+    params = {'method': method, 'background_size': background_size,
+              'background_method': background_method, 'random_state': random_state}
+    if method == 'interventional':
+        if X_background is None:
+            raise ValueError("X_background is required for interventional SHAP")
+        params['background_hash'] = hash_frame(X_background)
+    key = hash_bytes(model_hash(model), hash_frame(X), hash_params(params))
+
+    cache_directory = cache_directory or cache_dir('shap')
+    cache_path = os.path.join(cache_directory, f"{key}.npz")
+
+    if use_cache and os.path.exists(cache_path):
+        cached = np.load(cache_path, allow_pickle=False)
+        values, base_values = cached['values'], cached['base_values']
+    else:
+        if method == 'native':
+            values, base_values = _native_contributions(model, X, batch_size)
+        elif method == 'interventional':
+            background = select_background(X_background, background_size, background_method, random_state)
+            values, base_values = _interventional_contributions(model, X, background, batch_size)
+        else:
+            raise ValueError(f"Unknown SHAP method: {method}")
+
+        if use_cache:
+            tmp_path = cache_path + '.tmp.npz'
+            np.savez_compressed(tmp_path, values=values, base_values=base_values,
+                                feature_names=np.asarray([str(col) for col in X.columns]),
+                                params=np.asarray(json.dumps(params)))
+            os.replace(tmp_path, cache_path)
+
+    return shap.Explanation(
+        values=values,
+        base_values=base_values,
+        data=X.to_numpy(),
+        feature_names=list(X.columns)
+    )
@@ -0,0 +1,636 @@
+# figure_rendering.py
+
+import io
+import os
+import json
+import pickle
+import shutil
+import hashlib
+from concurrent.futures import ProcessPoolExecutor
+
+from caching import atomic_write_bytes, cache_dir, hash_bytes, hash_params
+from pipeline import code_hash, file_hash
+from scatter_rendering import scatter_categories, scatter_values
+
+# Program type colors shared by the UMAP figures
+PROGRAM_COLORS = {'Reskilling': '#FF6B6B', 'Upskilling': '#4ECDC4', 'General': '#95A5A6'}
+
+# Source of the rendering modules, part of every figure key: the drawing helpers
+# called by a drawing function shape the image as much as the function itself
+_RENDERING_SOURCE_HASH = hash_bytes(*[
+    file_hash(os.path.join(os.path.dirname(os.path.abspath(__file__)), name)) or ''
+    for name in ('figure_rendering.py', 'scatter_rendering.py')
+])
+
+
+# Drawing functions. Each takes a dict of precomputed plot data, draws a new
+# figure with pyplot and returns it. They live at module level so worker
+# processes can import them.
+
+def draw_umap_clusters(data):
+    """Clusters and program types side by side on the UMAP embedding"""
+    import matplotlib.pyplot as plt
+
+    embedding = data['embedding']
+    fig, (ax1, ax2) = plt.subplots(1, 2, figsize=(20, 8))
+
+    # Plot 1: K-means clusters
+    scatter1 = scatter_values(ax1, embedding, data['cluster_labels'], cmap='viridis', alpha=0.7, s=40)
+    ax1.set_title(f"UMAP Projection with K-means Clusters (k={data['n_clusters']})")
+    ax1.set_xlabel('UMAP1')
+    ax1.set_ylabel('UMAP2')
+    plt.colorbar(scatter1, ax=ax1, label='Cluster')
+
+    # Plot 2: Program types (if provided)
+    if data.get('program_types') is not None:
+        scatter_categories(ax2, embedding, data['program_types'], PROGRAM_COLORS, alpha=0.7, s=40)
+
+        ax2.set_title('UMAP Projection by Program Type')
+        ax2.set_xlabel('UMAP1')
+        ax2.set_ylabel('UMAP2')
+        ax2.legend(title='Program Type')
+
+    fig.tight_layout()
+    return fig
+
+
+def draw_shap_summary(data):
+    """SHAP summary plot ('bar' or beeswarm) for a subset of features"""
+    import matplotlib.pyplot as plt
+    import shap
+
+    fig = plt.figure(figsize=data.get('figsize', (14, 8)))
+    shap.summary_plot(
+        data['values'],
+        data['features'],
+        feature_names=data['feature_names'],
+        plot_type=data.get('plot_type'),
+        max_display=data.get('max_display', 20),
+        show=False
+    )
+    plt.title(data['title'], fontsize=16)
+    plt.xticks(fontsize=12)
+    plt.yticks(fontsize=12)
+    plt.tight_layout(pad=3.0)
+    _add_footnote(data.get('footnote'))
+    return fig
+
+
+# Feature importance figures (Feature_Importance.ipynb)
+
+def draw_top_features(data):
+    """
+    Feature importances as horizontal bars, most important on top
+
+    Font sizes default to the rcParams; layout holds the tight_layout options
+    and footnote_y the height of the footnote.
+    """
+    import matplotlib.pyplot as plt
+
+    fig, ax = plt.subplots(figsize=data.get('figsize', (10, 6)))
+    ax.barh(list(reversed(data['labels'])), list(reversed(data['values'])), color=data.get('color', 'skyblue'))
+    ax.set_xlabel(data.get('xlabel', 'Importance'), fontsize=data.get('label_size'))
+    ax.set_ylabel(data.get('ylabel', 'Feature'), fontsize=data.get('label_size'))
+    ax.set_title(data['title'], fontsize=data.get('title_size'))
+    if data.get('tick_size'):
+        ax.tick_params(labelsize=data['tick_size'])
+    fig.tight_layout(**data.get('layout', {}))
+    _add_footnote(data.get('footnote'), y=data.get('footnote_y', 0.01))
+    return fig
+
+
+def draw_metrics_comparison(data):
+    """One panel of bars per metric, with the value above every model's bar"""
+    import matplotlib.pyplot as plt
+
+    metrics = data['metrics']
+    n_models = len(metrics)
+    fig = plt.figure(figsize=(15, 10))
+    for i, (metric, color) in enumerate(zip(data['columns'], data['colors'])):
+        ax = fig.add_subplot(2, 3, i + 1)
+        bars = ax.bar(range(n_models), metrics[metric], color=color)
+        ax.set_title(metric.capitalize(), fontsize=14)
+        ax.set_xticks(range(n_models))
+        ax.set_xticklabels([f'Model {j+1}' for j in range(n_models)], rotation=45)
+        ax.set_ylim([0, 1])
+        for bar in bars:
+            height = bar.get_height()
+            ax.text(bar.get_x() + bar.get_width() / 2., height + 0.01, f'{height:.3f}', ha='center', fontsize=9)
+    fig.text(0.5, 0.01, data['footnote'], ha='center', fontsize=14,
+             bbox={"facecolor": "lightgray", "alpha": 0.5, "pad": 5})
+    fig.tight_layout(rect=[0, 0.05, 1, 0.95])
+    return fig
+
+
+def draw_roc_curves(data):
+    """ROC curve of every model; curves are (label, fpr, tpr)"""
+    import matplotlib.pyplot as plt
+
+    fig, ax = plt.subplots(figsize=(10, 8))
+    for label, fpr, tpr in data['curves']:
+        ax.plot(fpr, tpr, linewidth=2, label=label)
+    ax.plot([0, 1], [0, 1], 'k--', linewidth=1)
+    ax.set_xlim([0, 1])
+    ax.set_ylim([0, 1.05])
+    ax.set_xlabel('False Positive Rate', fontsize=12)
+    ax.set_ylabel('True Positive Rate', fontsize=12)
+    ax.set_title(data['title'], fontsize=14)
+    ax.legend(loc='lower right', fontsize=10)
+    ax.grid(True, alpha=0.3)
+    return fig
+
+
+def draw_confusion_matrices(data):
+    """Annotated confusion matrices side by side, one per model"""
+    import matplotlib.pyplot as plt
+    import seaborn as sns
+
+    matrices = data['matrices']
+    fig, axes = plt.subplots(1, len(matrices), figsize=(18, 5), squeeze=False)
+    for ax, cm, title in zip(axes[0], matrices, data['titles']):
+        sns.heatmap(cm, annot=True, fmt='d', cmap='Blues', cbar=False, ax=ax)
+        ax.set_title(title, fontsize=11)
+        ax.set_xlabel('Prediction')
+        ax.set_ylabel('Actual')
+    fig.tight_layout()
+    return fig
+
+
+def draw_probability_histogram(data):
+    """Histogram of predicted probabilities with the 0.5 decision threshold"""
+    import matplotlib.pyplot as plt
+
+    fig, ax = plt.subplots(figsize=(10, 6))
+    ax.hist(data['values'], bins=20, alpha=0.7, color='crimson')
+    ax.axvline(x=0.5, color='black', linestyle='--', linewidth=1)
+    ax.set_xlabel(data['xlabel'], fontsize=12)
+    ax.set_ylabel('Frequency', fontsize=12)
+    ax.set_title(data['title'], fontsize=14)
+    ax.grid(True, alpha=0.3)
+    fig.tight_layout()
+    return fig
+
+
+# Cluster analysis figures (Cluster_Analysis.ipynb). Labels are shortened and
+# values selected in the notebook; these functions only lay them out.
+
+def _grouped_bars(ax, labels, series, width):
+    """Series of (name, values, color) side by side at each label (color None uses the cycle)"""
+    import numpy as np
+
+    x = np.arange(len(labels))
+    for i, (name, values, color) in enumerate(series):
+        ax.bar(x + i * width - width * len(series) / 2 + width / 2, values, width, label=name, color=color)
+    ax.set_xticks(x)
+    ax.set_xticklabels(labels, rotation=45, ha='right')
+
+
+def _stacked_proportions(ax, proportions, colors=None):
+    """Stacked bars of a row-normalized crosstab"""
+    kwargs = {'color': colors} if colors else {}
+    proportions.plot(kind='bar', stacked=True, ax=ax, **kwargs)
+
+
+def _importance_bars(ax, labels, values):
+    """Horizontal bars with the first label on top"""
+    ax.barh(list(reversed(labels)), list(reversed(values)), color='#5D87E1')
+
+
+def draw_stacked_proportions(data):
+    """Share of each program type within every cluster"""
+    import matplotlib.pyplot as plt
+
+    fig, ax = plt.subplots(figsize=data.get('figsize', (10, 6)))
+    _stacked_proportions(ax, data['proportions'], data.get('colors'))
+    ax.set_title(data['title'])
+    ax.set_xlabel('Cluster')
+    ax.set_ylabel('Proportion')
+    if data.get('rotation') is not None:
+        ax.tick_params(axis='x', labelrotation=data['rotation'])
+    ax.legend(title='Program Type')
+    fig.tight_layout()
+    return fig
+
+
+def draw_cluster_profiles(data):
+    """Mean of the top features per cluster, one line per cluster"""
+    import matplotlib.pyplot as plt
+
+    fig, ax = plt.subplots(figsize=(12, 8))
+    for cluster, values in data['profiles'].items():
+        ax.plot(range(len(values)), values, marker='o', linestyle='-', label=f'Cluster {cluster}')
+    ax.set_xticks(range(len(data['labels'])))
+    ax.set_xticklabels(data['labels'], rotation=45, ha='right')
+    ax.set_title(data['title'])
+    ax.set_ylabel('Mean Value')
+    ax.legend()
+    ax.grid(True, linestyle='--', alpha=0.7)
+    fig.tight_layout()
+    return fig
+
+
+def draw_category_scatter(data):
+    """UMAP points colored by a category (e.g. classification outcome)"""
+    import matplotlib.pyplot as plt
+
+    fig, ax = plt.subplots(figsize=(14, 10))
+    scatter_categories(ax, data['embedding'], data['categories'], data['colors'], labels=data.get('labels'),
+                       alpha=0.7, s=60, edgecolors='white', linewidth=0.5)
+    ax.set_title(data['title'], fontsize=16)
+    ax.set_xlabel('UMAP Dimension 1', fontsize=14)
+    ax.set_ylabel('UMAP Dimension 2', fontsize=14)
+    ax.legend(title=data['legend_title'], fontsize=12, title_fontsize=14)
+    ax.grid(True, linestyle='--', alpha=0.3)
+    fig.tight_layout()
+    return fig
+
+
+def draw_program_clusters(data):
+    """Program types on the UMAP embedding with one marker per cluster"""
+    import numpy as np
+    import matplotlib.pyplot as plt
+
+    program_colors = {'Reskilling': '#e74c3c', 'Upskilling': '#3498db'}
+    # Markers and sizes are cycled when k exceeds the lists
+    cluster_markers = ['o', 's', '^', 'D', 'v']
+    cluster_sizes = [80, 70, 60, 90, 80]
+
+    fig, ax = plt.subplots(figsize=(14, 10))
+    cluster_labels = np.asarray(data['cluster_labels'])
+    program_types = np.asarray(data['program_types'])
+    for cluster in range(data['n_clusters']):
+        mask = cluster_labels == cluster
+        if np.any(mask):
+            scatter_categories(
+                ax, data['embedding'][mask], program_types[mask], program_colors,
+                labels={program: f'{program} in Cluster {cluster}' for program in program_colors},
+                marker=cluster_markers[cluster % len(cluster_markers)],
+                s=cluster_sizes[cluster % len(cluster_sizes)],
+                alpha=0.7, edgecolors='white', linewidth=0.5
+            )
+
+    ax.set_title(f"Distribution of Program Types in {data['n_clusters']} Clusters", fontsize=16)
+    ax.set_xlabel('UMAP Dimension 1', fontsize=14)
+    ax.set_ylabel('UMAP Dimension 2', fontsize=14)
+    ax.legend(title='Program and Cluster', fontsize=12, title_fontsize=14, loc='center left', bbox_to_anchor=(1, 0.5))
+    ax.grid(True, linestyle='--', alpha=0.3)
+    fig.tight_layout()
+    return fig
+
+
+def draw_method_comparison(data):
+    """One UMAP panel per clustering method"""
+    import matplotlib.pyplot as plt
+
+    fig = plt.figure(figsize=(20, 15))
+    for i, (method_name, labels) in enumerate(data['methods'].items()):
+        ax = fig.add_subplot(2, 2, i + 1)
+        scatter = scatter_values(ax, data['embedding'], labels, cmap='viridis', alpha=0.7, s=40)
+        fig.colorbar(scatter, ax=ax, label='Cluster')
+        ax.set_title(f'{method_name} Clustering')
+        ax.set_xlabel('UMAP1')
+        ax.set_ylabel('UMAP2')
+        ax.grid(True, linestyle='--', alpha=0.3)
+    fig.tight_layout()
+    return fig
+
+
+def draw_grouped_bars(data):
+    """Bars per variable for several groups, with optional text annotations (x, y, text)"""
+    import matplotlib.pyplot as plt
+
+    fig, ax = plt.subplots(figsize=(12, 10))
+    _grouped_bars(ax, data['labels'], data['series'], data['width'])
+    for x, y, text in data.get('annotations', []):
+        ax.text(x, y, text, ha='center')
+    ax.set_xlabel('Variables')
+    ax.set_ylabel(data['ylabel'])
+    ax.set_title(data['title'])
+    ax.legend()
+    fig.tight_layout()
+    return fig
+
+
+def draw_heatmap(data):
+    """Annotated diverging heatmap of a DataFrame (e.g. z-scores per cluster)"""
+    import matplotlib.pyplot as plt
+    import seaborn as sns
+
+    fig, ax = plt.subplots(figsize=data.get('figsize', (14, 10)))
+    sns.heatmap(data['frame'], cmap='coolwarm', center=0, annot=True, fmt='.2f', linewidths=.5, ax=ax)
+    ax.set_title(data['title'])
+    fig.tight_layout()
+    return fig
+
+
+def draw_effect_sizes(data):
+    """Cohen's d per variable with the small / medium / large thresholds"""
+    import matplotlib.pyplot as plt
+
+    fig, ax = plt.subplots(figsize=(12, 10))
+    ax.barh(data['labels'], data['values'], color='#5D87E1')
+    for threshold in (0.2, 0.5, 0.8):
+        ax.axvline(x=threshold, color='gray', linestyle='--', alpha=0.7)
+    n_labels = len(data['labels'])
+    ax.text(0.1, n_labels + 0.5, 'Small', ha='center')
+    ax.text(0.35, n_labels + 0.5, 'Medium', ha='center')
+    ax.text(0.65, n_labels + 0.5, 'Large', ha='center')
+    ax.set_xlabel("Cohen's d (Effect Size)")
+    ax.set_title("Effect Size of Program Type Differences")
+    fig.tight_layout()
+    return fig
+
+
+def draw_importance_bars(data):
+    """Variable importance as horizontal bars, most important on top"""
+    import matplotlib.pyplot as plt
+
+    fig, ax = plt.subplots(figsize=(12, 10))
+    _importance_bars(ax, data['labels'], data['values'])
+    ax.set_xlabel('Importance')
+    ax.set_title(data['title'])
+    fig.tight_layout()
+    return fig
+
+
+def draw_category_boxplots(data):
+    """
+    Grid of boxplots, one panel per variable; each panel is a dict with a title
+    and groups of (label, values, color)
+    """
+    import matplotlib.pyplot as plt
+
+    fig = plt.figure(figsize=(14, 10))
+    panels = data['panels']
+    n_cols = min(3, len(panels))
+    n_rows = (len(panels) + n_cols - 1) // n_cols
+    for i, panel in enumerate(panels):
+        ax = fig.add_subplot(n_rows, n_cols, i + 1)
+        groups = panel['groups']
+        bp = ax.boxplot([values for _, values, _ in groups], patch_artist=True,
+                        tick_labels=[label for label, _, _ in groups])
+        for patch, (_, _, color) in zip(bp['boxes'], groups):
+            patch.set_facecolor(color)
+            patch.set_alpha(0.7)
+        ax.set_title(panel['title'])
+        ax.set_ylabel('Value')
+        plt.setp(ax.get_xticklabels(), rotation=45, ha='right')
+    fig.suptitle(data['title'], fontsize=16)
+    fig.tight_layout(rect=[0, 0, 1, 0.96])
+    return fig
+
+
+def draw_3d_scatter(data):
+    """3D scatter of three variables; groups are (label, marker, x, y, z)"""
+    import matplotlib.pyplot as plt
+
+    fig = plt.figure(figsize=(12, 10))
+    ax = fig.add_subplot(111, projection='3d')
+    for label, marker, xs, ys, zs in data['groups']:
+        ax.scatter(xs, ys, zs, label=label, marker=marker, alpha=0.7)
+    ax.set_xlabel(data['axis_labels'][0])
+    ax.set_ylabel(data['axis_labels'][1])
+    ax.set_zlabel(data['axis_labels'][2])
+    ax.set_title(data['title'])
+    ax.legend()
+    fig.tight_layout()
+    return fig
+
+
+def draw_summary_dashboard(data):
+    """Program shares, top cluster and program variables and variable importance on one page"""
+    import matplotlib.pyplot as plt
+
+    fig = plt.figure(figsize=(16, 12))
+    gs = fig.add_gridspec(2, 2)
+
+    # 1. Program distribution within clusters
+    ax1 = fig.add_subplot(gs[0, 0])
+    _stacked_proportions(ax1, data['proportions'], ['#4ECDC4', '#FF6B6B'])
+    ax1.set_title('Program Types by Cluster')
+    ax1.set_xlabel('Cluster')
+    ax1.set_ylabel('Proportion')
+    ax1.set_xticks(range(len(data['proportions'].index)))
+    ax1.set_xticklabels([f'Cluster {c}' for c in data['proportions'].index])
+    ax1.legend(title='Program Type')
+
+    # 2. Variables differentiating clusters, 3. variables differentiating program types
+    for position, key, ylabel, title in [
+        (gs[0, 1], 'cluster_bars', 'Z-Score', 'Top Variables Differentiating Clusters'),
+        (gs[1, 0], 'program_bars', 'Mean Value', 'Top Variables Differentiating Program Types')
+    ]:
+        ax = fig.add_subplot(position)
+        bars = data.get(key)
+        if bars:
+            _grouped_bars(ax, bars['labels'], bars['series'], bars['width'])
+            ax.set_xlabel('Variables')
+            ax.set_ylabel(ylabel)
+            ax.set_title(title)
+            ax.legend()
+
+    # 4. Variable importance
+    ax4 = fig.add_subplot(gs[1, 1])
+    _importance_bars(ax4, data['importance']['labels'], data['importance']['values'])
+    ax4.set_xlabel('Importance')
+    ax4.set_title('Most Important Variables for Predicting Program Type')
+
+    fig.suptitle('Statistical Analysis Summary Dashboard', fontsize=16)
+    fig.tight_layout(rect=[0, 0, 1, 0.96])
+    return fig
+
+
+def _add_footnote(text, y=0.01):
+    import matplotlib.pyplot as plt
+
+    if text:
+        plt.figtext(0.5, y, text, ha='center', fontsize=12,
+                    bbox={"facecolor": "lightgray", "alpha": 0.5, "pad": 5})
+
+
+def _render(draw, data, savefig_kwargs, rc_params, style=None, use_agg=True):
+    """Draw one figure (on the Agg backend in worker processes) and return the encoded bytes"""
+    import matplotlib
+    if use_agg:
+        matplotlib.use('Agg')
+    import matplotlib.pyplot as plt
+
+    with plt.style.context(style or []), plt.rc_context(rc_params):
+        fig = draw(data)
+        buffer = io.BytesIO()
+        fig.savefig(buffer, **savefig_kwargs)
+    plt.close(fig)
+    return buffer.getvalue()
+
+
+def _store_path(store_dir, digest, extension):
+    return os.path.join(store_dir, f"{digest}{extension}")
+
+
+def publish(blob_path, dest_path):
+    """
+    Make dest_path refer to a stored file: a hard link where the filesystem allows
+    it, otherwise a copy
+    """
+    os.makedirs(os.path.dirname(os.path.abspath(dest_path)), exist_ok=True)
+    if os.path.exists(dest_path):
+        if os.path.samefile(blob_path, dest_path):
+            return dest_path
+        os.remove(dest_path)
+    try:
+        os.link(blob_path, dest_path)
+    except OSError:
+        shutil.copyfile(blob_path, dest_path)
+    return dest_path
+
+
+def store_file(path, store_dir=None):
+    """
+    Add a copy of an existing file to the content-addressed store
+
+    The source is copied rather than linked: it may be rewritten in place later
+    (e.g. by the next savefig), which must not change the stored file.
+
+    Returns:
+        Path of the stored copy
+    """
+    store_dir = store_dir or cache_dir('figures')
+    with open(path, 'rb') as f:
+        payload = f.read()
+    blob_path = _store_path(store_dir, hashlib.sha256(payload).hexdigest(), os.path.splitext(path)[1].lower())
+    if not os.path.exists(blob_path):
+        atomic_write_bytes(blob_path, payload)
+    return blob_path
+
+
+def link_output(src_path, dest_path, store_dir=None):
+    """
+    Place a copy of an existing output at dest_path without duplicating its bytes
+
+    Used when organizing reports: byte-identical images share one stored file.
+    """
+    return publish(store_file(src_path, store_dir), dest_path)
+
+
+class RenderQueue:
+    """
+    Collects figures while the analysis runs and draws them together
+
+    Each submitted figure is a drawing function plus the data it needs. flush()
+    renders all pending figures in a process pool on the Agg backend. Encoded
+    images are stored once under .cache/figures by content hash and every output
+    path is hard-linked to its stored file. A figure whose function, data and
+    save options are unchanged since an earlier run is not redrawn; the key
+    covers the drawing function's code and the rendering modules' source.
+
+    Drawing functions defined in a notebook cannot be imported by worker
+    processes, so they are drawn in this process instead.
+
+    Args:
+        n_jobs: Worker processes (defaults to the core count)
+        store_dir: Override the store location
+        rc_params: matplotlib settings applied to every figure (worker processes
+            do not inherit the notebook's rcParams)
+    """
+
+    def __init__(self, n_jobs=None, store_dir=None, rc_params=None):
+        self.n_jobs = n_jobs
+        self.rc_params = rc_params or {}
+        self.store_dir = store_dir or cache_dir('figures')
+        self.index_path = os.path.join(self.store_dir, 'index.json')
+        self.pending = []
+        if os.path.exists(self.index_path):
+            with open(self.index_path, 'r') as f:
+                self.index = json.load(f)
+        else:
+            self.index = {}
+
+    def submit(self, draw, data, path, dpi=300, style=None, **savefig_kwargs):
+        """
+        Queue a figure
+
+        Args:
+            draw: Drawing function taking the data dict and returning a figure
+            data: Precomputed plot data (must be picklable)
+            path: Output file; the extension selects the format
+            dpi: Resolution
+            style: Optional matplotlib style applied while drawing, e.g. 'seaborn-v0_8-whitegrid'
+            **savefig_kwargs: Extra options for savefig (bbox_inches defaults to 'tight')
+        """
+        extension = os.path.splitext(path)[1].lower() or '.png'
+        savefig_kwargs = {'dpi': dpi, 'bbox_inches': 'tight', 'format': extension[1:], **savefig_kwargs}
+        key = hash_bytes(
+            draw.__module__, draw.__qualname__, code_hash(draw), _RENDERING_SOURCE_HASH,
+            hashlib.sha256(pickle.dumps(data, protocol=4)).hexdigest(),
+            hash_params(savefig_kwargs), hash_params(self.rc_params), style or ''
+        )
+        self.pending.append({'key': key, 'draw': draw, 'data': data, 'path': path, 'style': style,
+                             'extension': extension, 'savefig_kwargs': savefig_kwargs})
+
+    def _cached_blob(self, item):
+        digest = self.index.get(item['key'])
+        if digest is None:
+            return None
+        blob_path = _store_path(self.store_dir, digest, item['extension'])
+        return blob_path if os.path.exists(blob_path) else None
+
+    def _store(self, item, payload):
+        digest = hashlib.sha256(payload).hexdigest()
+        blob_path = _store_path(self.store_dir, digest, item['extension'])
+        if not os.path.exists(blob_path):
+            atomic_write_bytes(blob_path, payload)
+        self.index[item['key']] = digest
+        return blob_path
+
+    def flush(self, show=False):
+        """
+        Render every pending figure and link it to its output path
+
+        Args:
+            show: Display the rendered images inline (in Jupyter)
+
+        Returns:
+            dict of output path -> stored file
+        """
+        items, self.pending = self.pending, []
+        published = {}
+        to_draw = []
+        for item in items:
+            blob_path = self._cached_blob(item)
+            if blob_path is not None:
+                publish(blob_path, item['path'])
+                published[item['path']] = blob_path
+            else:
+                to_draw.append(item)
+
+        # Deduplicate identical specs within the batch
+        unique = {item['key']: item for item in to_draw}
+        importable = [item for item in unique.values() if item['draw'].__module__ != '__main__']
+        local = [item for item in unique.values() if item['draw'].__module__ == '__main__']
+        print(f"Rendering {len(unique)} figures ({len(items) - len(to_draw)} unchanged)")
+
+        blobs = {}
+        if importable:
+            n_jobs = max(1, min(len(importable), self.n_jobs or os.cpu_count() or 1))
+            with ProcessPoolExecutor(max_workers=n_jobs) as executor:
+                futures = {item['key']: executor.submit(_render, item['draw'], item['data'],
+                                                         item['savefig_kwargs'], self.rc_params, item['style'])
+                           for item in importable}
+                for item in importable:
+                    blobs[item['key']] = self._store(item, futures[item['key']].result())
+        # Drawn here without switching the notebook's backend
+        for item in local:
+            blobs[item['key']] = self._store(item, _render(item['draw'], item['data'], item['savefig_kwargs'],
+                                                          self.rc_params, item['style'], use_agg=False))
+
+        for item in to_draw:
+            publish(blobs[item['key']], item['path'])
+            published[item['path']] = blobs[item['key']]
+
+        atomic_write_bytes(self.index_path, json.dumps(self.index, indent=1).encode('utf-8'))
+
+        if show:
+            from IPython.display import Image, display
+            for item in items:
+                if item['extension'] == '.png':
+                    display(Image(filename=item['path']))
+        return published
@@ -0,0 +1,366 @@
+# group_statistics.py
+
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+from scipy import stats
+
+# Multiple-testing corrections supported by adjust_p_values
+P_ADJUST_METHODS = ('fdr_bh', 'holm')
+
+
+def group_moments(df, by, columns):
+    """
+    Per-group counts, means and sample variances for many columns in one groupby pass
+
+    Columns are centered on their overall mean before summing, which keeps the
+    sum-of-squares variance numerically stable.
+
+    Args:
+        df: DataFrame holding the grouping column(s) and the variables
+        by: Grouping column name or list of names
+        columns: Variables to summarize
+
+    Returns:
+        dict with 'count', 'mean' and 'var' DataFrames (groups x variables)
+    """
+    values = df[columns].astype(np.float64)
+    center = values.mean()
+    centered = values - center
+    keys = [df[col] for col in (by if isinstance(by, list) else [by])]
+
+    # One pass: counts, sums and sums of squares of the centered values
+    grouped = pd.concat(
+        {'count': centered.notna().astype(np.int64), 'sum': centered, 'sumsq': centered ** 2},
+        axis=1
+    ).groupby(keys, sort=True, observed=True).sum()
+
+    count = grouped['count']
+    centered_sum = grouped['sum']
+    with np.errstate(invalid='ignore', divide='ignore'):
+        centered_mean = centered_sum / count
+        var = (grouped['sumsq'] - count * centered_mean ** 2) / (count - 1)
+    var = var.where(count > 1).clip(lower=0)
+
+    return {'count': count, 'mean': centered_mean + center, 'var': var}
+
+
+def significance_stars(p_values):
+    """'***', '**', '*' or '' for each p-value"""
+    p_values = np.asarray(p_values, dtype=np.float64)
+    return np.select(
+        [p_values < 0.001, p_values < 0.01, p_values < 0.05],
+        ['***', '**', '*'],
+        default=''
+    )
+
+
+def adjust_p_values(p_values, method='fdr_bh'):
+    """
+    Multiple-testing corrected p-values, ignoring NaNs
+
+    Args:
+        p_values: Array of raw p-values
+        method: 'fdr_bh' (Benjamini-Hochberg false discovery rate) or 'holm'
+            (Holm step-down family-wise error rate)
+
+    Returns:
+        Array of adjusted p-values in the original order
+    """
+    p_values = np.asarray(p_values, dtype=np.float64)
+    adjusted = np.full_like(p_values, np.nan)
+    valid = ~np.isnan(p_values)
+    m = int(valid.sum())
+    if m == 0:
+        return adjusted
+
+    order = np.argsort(p_values[valid])
+    ranked = p_values[valid][order]
+    if method == 'fdr_bh':
+        scaled = ranked * m / np.arange(1, m + 1)
+        scaled = np.minimum.accumulate(scaled[::-1])[::-1]
+    elif method == 'holm':
+        scaled = np.maximum.accumulate(ranked * (m - np.arange(m)))
+    else:
+        raise ValueError(f"Unknown p-value adjustment: {method}")
+
+    result = np.empty(m)
+    result[order] = np.minimum(scaled, 1.0)
+    adjusted[valid] = result
+    return adjusted
+
+
+def welch_ttest(mean_a, var_a, n_a, mean_b, var_b, n_b):
+    """
+    Welch's t-test from summary statistics, for arrays of variables at once
+
+    Returns:
+        (t_statistic, p_value) arrays, two-sided, with the sign of mean_a - mean_b
+    """
+    with np.errstate(invalid='ignore', divide='ignore'):
+        se_a = var_a / n_a
+        se_b = var_b / n_b
+        t_stat = (mean_a - mean_b) / np.sqrt(se_a + se_b)
+        df = (se_a + se_b) ** 2 / (se_a ** 2 / (n_a - 1) + se_b ** 2 / (n_b - 1))
+    p_value = 2 * stats.t.sf(np.abs(t_stat), df)
+    return np.asarray(t_stat, dtype=np.float64), np.asarray(p_value, dtype=np.float64)
+
+
+def one_way_anova(counts, means, variances):
+    """
+    One-way ANOVA from summary statistics
+
+    Args:
+        counts, means, variances: DataFrames of groups x variables
+
+    Returns:
+        (f_statistic, p_value) arrays with one entry per variable
+    """
+    counts = counts.to_numpy(dtype=np.float64)
+    means = means.to_numpy(dtype=np.float64)
+    variances = np.nan_to_num(variances.to_numpy(dtype=np.float64))
+
+    n_groups = (counts > 0).sum(axis=0)
+    n_total = counts.sum(axis=0)
+    grand_mean = np.nansum(counts * means, axis=0) / n_total
+
+    ss_between = np.nansum(counts * (means - grand_mean) ** 2, axis=0)
+    ss_within = np.nansum((counts - 1).clip(min=0) * variances, axis=0)
+    df_between = n_groups - 1
+    df_within = n_total - n_groups
+
+    with np.errstate(invalid='ignore', divide='ignore'):
+        f_stat = (ss_between / df_between) / (ss_within / df_within)
+    p_value = stats.f.sf(f_stat, df_between, df_within)
+    return f_stat, p_value
+
+
+def cohens_d(mean_a, var_a, n_a, mean_b, var_b, n_b):
+    """Cohen's d of b relative to a using the pooled standard deviation (0 when it is 0)"""
+    with np.errstate(invalid='ignore', divide='ignore'):
+        pooled_std = np.sqrt(((n_a - 1) * var_a + (n_b - 1) * var_b) / (n_a + n_b - 2))
+        d = (mean_b - mean_a) / pooled_std
+    return np.where(pooled_std == 0, 0.0, d)
+
+
+# Permutations per label-permutation matrix and per worker task
+PERMUTATION_BATCH_SIZE = 100
+PERMUTATION_CHUNK_SIZE = 500
+
+
+def _cluster_statistic(sums, sumsq, counts):
+    """
+    Welch |t| (two groups) or ANOVA F (more groups) from per-group sums
+
+    Args:
+        sums, sumsq: Arrays of shape (n_permutations, n_groups, n_variables)
+        counts: Array of group sizes
+
+    Returns:
+        Array of shape (n_permutations, n_variables)
+    """
+    counts = counts[None, :, None].astype(np.float64)
+    n_groups = counts.shape[1]
+    n_total = counts.sum()
+    with np.errstate(invalid='ignore', divide='ignore'):
+        means = sums / counts
+        ss = sumsq - counts * means ** 2
+        if n_groups == 2:
+            se = (ss / (counts - 1)) / counts
+            return np.abs(means[:, 0] - means[:, 1]) / np.sqrt(se[:, 0] + se[:, 1])
+        grand_mean = sums.sum(axis=1, keepdims=True) / n_total
+        ss_between = (counts * (means - grand_mean) ** 2).sum(axis=1)
+        ss_within = ss.sum(axis=1)
+        return (ss_between / (n_groups - 1)) / (ss_within / (n_total - n_groups))
+
+
+def _label_sums(values, squares, codes, n_groups):
+    """Per-group sums for a batch of label vectors via one-hot label matrices"""
+    n_perm, n_rows = codes.shape
+    onehot = np.zeros((n_perm, n_groups, n_rows))
+    onehot[np.arange(n_perm)[:, None], codes, np.arange(n_rows)[None, :]] = 1.0
+    onehot = onehot.reshape(n_perm * n_groups, n_rows)
+    shape = (n_perm, n_groups, values.shape[1])
+    return (onehot @ values).reshape(shape), (onehot @ squares).reshape(shape)
+
+
+def _permutation_chunk(values, squares, codes, counts, observed, n_permutations, seed):
+    """Count permutations whose statistic reaches the observed one (runs in a worker thread)"""
+    rng = np.random.default_rng(seed)
+    n_groups = len(counts)
+    exceed = np.zeros(values.shape[1], dtype=np.int64)
+    # Relative tolerance so ties with the observed statistic count as exceedances
+    threshold = observed - 1e-12 * np.abs(observed)
+    for start in range(0, n_permutations, PERMUTATION_BATCH_SIZE):
+        n_batch = min(PERMUTATION_BATCH_SIZE, n_permutations - start)
+        permuted = rng.permuted(np.tile(codes, (n_batch, 1)), axis=1)
+        sums, sumsq = _label_sums(values, squares, permuted, n_groups)
+        with np.errstate(invalid='ignore'):
+            exceed += (_cluster_statistic(sums, sumsq, counts) >= threshold).sum(axis=0)
+    return exceed
+
+
+def permutation_test_clusters(df, columns, cluster_col='cluster', n_permutations=2000,
+                              random_state=42, n_jobs=None):
+    """
+    Permutation p-values for differences between clusters, for all variables at once
+
+    Cluster labels are shuffled n_permutations times. Each batch of shuffles is a
+    one-hot label-permutation matrix, so one matrix product gives the group sums of
+    every variable under every shuffle. Batches are spread over threads (numpy
+    releases the GIL in the products); each chunk has its own seed derived from
+    random_state, so results do not depend on n_jobs. Missing values are replaced
+    by the variable mean.
+
+    Returns:
+        Series of p-values indexed by variable, using Welch |t| for two clusters
+        and the ANOVA F statistic otherwise
+    """
+    values = df[columns].astype(np.float64)
+    values = (values - values.mean()).fillna(0.0).to_numpy()
+    squares = values ** 2
+    labels, codes = np.unique(df[cluster_col].to_numpy(), return_inverse=True)
+    counts = np.bincount(codes, minlength=len(labels))
+
+    sums, sumsq = _label_sums(values, squares, codes[None, :], len(labels))
+    observed = _cluster_statistic(sums, sumsq, counts)[0]
+
+    n_chunks = max(1, -(-n_permutations // PERMUTATION_CHUNK_SIZE))
+    seeds = np.random.SeedSequence(random_state).spawn(n_chunks)
+    chunk_sizes = [min(PERMUTATION_CHUNK_SIZE, n_permutations - i * PERMUTATION_CHUNK_SIZE)
+                   for i in range(n_chunks)]
+
+    n_jobs = n_jobs or os.cpu_count() or 1
+    with ThreadPoolExecutor(max_workers=min(n_jobs, n_chunks)) as executor:
+        exceed = sum(executor.map(
+            lambda args: _permutation_chunk(values, squares, codes, counts, observed, *args),
+            zip(chunk_sizes, seeds)
+        ))
+
+    p_values = (exceed + 1) / (n_permutations + 1)
+    p_values = np.where(np.isnan(observed), np.nan, p_values)
+    return pd.Series(p_values, index=pd.Index(columns, name='variable'), name='p_value_permutation')
+
+
+def compare_clusters(df, columns, cluster_col='cluster', p_adjust=P_ADJUST_METHODS,
+                     n_permutations=0, random_state=42, n_jobs=None):
+    """
+    Compare every variable across clusters at once
+
+    Uses Welch's t-test for two clusters and one-way ANOVA otherwise, and reports
+    per-cluster means, standard deviations and z-scores of the cluster means.
+
+    Args:
+        df: DataFrame with the variables and the cluster column
+        columns: Variables to compare
+        cluster_col: Name of the cluster label column
+        p_adjust: Corrections to report as p_value_<method> columns; the first one
+            drives the significance stars. Empty to use raw p-values.
+        n_permutations: When positive, also run a permutation test and apply the
+            corrections to the permutation p-values
+        random_state: Seed for the permutation test
+        n_jobs: Worker threads for the permutation test (defaults to all cores)
+
+    Returns:
+        DataFrame indexed by variable with columns test, test_statistic, p_value,
+        [p_value_permutation], p_value_<method>..., significance and
+        mean_/std_/z_score_cluster<k> for each cluster
+    """
+    moments = group_moments(df, cluster_col, columns)
+    count, mean, var = moments['count'], moments['mean'], moments['var']
+    clusters = list(mean.index)
+
+    if len(clusters) == 2:
+        test_name = 't-test'
+        c0, c1 = clusters
+        test_stat, p_value = welch_ttest(
+            mean.loc[c0], var.loc[c0], count.loc[c0], mean.loc[c1], var.loc[c1], count.loc[c1]
+        )
+    else:
+        test_name = 'ANOVA'
+        test_stat, p_value = one_way_anova(count, mean, var)
+
+    overall_mean = df[columns].mean()
+    overall_std = df[columns].std()
+    with np.errstate(invalid='ignore', divide='ignore'):
+        z_scores = (mean - overall_mean) / overall_std
+    z_scores.loc[:, overall_std == 0] = 0
+
+    result = pd.DataFrame({
+        'test': test_name,
+        'test_statistic': np.asarray(test_stat, dtype=np.float64),
+        'p_value': np.asarray(p_value, dtype=np.float64)
+    }, index=pd.Index(columns, name='variable'))
+
+    # Corrections are applied over the unique variables tested
+    tested_p = result['p_value']
+    if n_permutations:
+        result['p_value_permutation'] = permutation_test_clusters(
+            df, columns, cluster_col, n_permutations, random_state, n_jobs
+        )
+        tested_p = result['p_value_permutation']
+    for method in p_adjust:
+        result[f'p_value_{method}'] = adjust_p_values(tested_p, method)
+    significance_p = result[f'p_value_{p_adjust[0]}'] if p_adjust else tested_p
+    result['significance'] = significance_stars(significance_p)
+
+    for cluster in clusters:
+        result[f'mean_cluster{cluster}'] = mean.loc[cluster]
+        result[f'std_cluster{cluster}'] = np.sqrt(var.loc[cluster])
+        result[f'z_score_cluster{cluster}'] = z_scores.loc[cluster]
+    return result
+
+
+def _compare_two_moment_rows(count, mean, var, group_a, group_b, columns):
+    n_a, n_b = count.loc[group_a], count.loc[group_b]
+    mean_a, mean_b = mean.loc[group_a], mean.loc[group_b]
+    var_a, var_b = var.loc[group_a], var.loc[group_b]
+
+    t_stat, p_value = welch_ttest(mean_a, var_a, n_a, mean_b, var_b, n_b)
+    result = pd.DataFrame({
+        'n_a': n_a, 'n_b': n_b,
+        'mean_a': mean_a, 'std_a': np.sqrt(var_a),
+        'mean_b': mean_b, 'std_b': np.sqrt(var_b),
+        'cohens_d': cohens_d(mean_a, var_a, n_a, mean_b, var_b, n_b),
+        't_statistic': t_stat,
+        'p_value': p_value
+    }, index=pd.Index(columns, name='variable'))
+    result['significance'] = significance_stars(result['p_value'])
+    return result
+
+
+def compare_two_groups(df, columns, group_col, group_a, group_b):
+    """
+    Welch's t-test and Cohen's d (b relative to a) for every variable at once
+
+    Returns:
+        DataFrame indexed by variable with n_a, n_b, mean_a, std_a, mean_b, std_b,
+        cohens_d, t_statistic, p_value and significance
+    """
+    moments = group_moments(df, group_col, columns)
+    return _compare_two_moment_rows(
+        moments['count'], moments['mean'], moments['var'], group_a, group_b, columns
+    )
+
+
+def compare_two_groups_within(df, columns, strata_col, group_col, group_a, group_b):
+    """
+    compare_two_groups for every stratum (e.g. cluster) from a single groupby pass
+
+    Returns:
+        dict of stratum -> comparison DataFrame, for strata containing both groups
+    """
+    moments = group_moments(df, [strata_col, group_col], columns)
+    count, mean, var = moments['count'], moments['mean'], moments['var']
+
+    results = {}
+    for stratum in count.index.get_level_values(0).unique():
+        groups = count.loc[stratum].index
+        if group_a not in groups or group_b not in groups:
+            continue
+        results[stratum] = _compare_two_moment_rows(
+            count.loc[stratum], mean.loc[stratum], var.loc[stratum], group_a, group_b, columns
+        )
+    return results
@@ -0,0 +1,204 @@
+# incremental_clustering.py
+
+import json
+
+import numpy as np
+import pandas as pd
+
+
+def merge_moments(n_a, mean_a, var_a, n_b, mean_b, var_b):
+    """
+    Combine the counts, means and (population) variances of two samples
+    (Chan et al. parallel update)
+    """
+    n = n_a + n_b
+    delta = mean_b - mean_a
+    mean = mean_a + delta * n_b / n
+    m2 = var_a * n_a + var_b * n_b + delta ** 2 * n_a * n_b / n
+    return n, mean, m2 / n
+
+
+class IncrementalClusterer:
+    """
+    Mini-batch K-Means that can be updated with new survey waves
+
+    Centroids are kept in the units of the unscaled dummy matrix, together with
+    the running scaler statistics (count, mean, variance per feature). A new wave
+    updates the scaler statistics, is standardized with them and then moves each
+    centroid towards the wave's members with a per-centroid learning rate of
+    1 / (respondents assigned so far), as in MiniBatchKMeans.partial_fit. Each
+    update costs O(batch size x k x features).
+
+    Attributes:
+        feature_names: Columns of the dummy matrix, in order
+        clusters: Cluster label of each centroid
+        centroids: Centroids in unscaled units (k x features)
+        counts: Respondents assigned to each centroid so far
+        n_seen, mean, var: Running scaler statistics
+        history: One drift record per update
+    """
+
+    def __init__(self, feature_names, clusters, centroids, counts, n_seen, mean, var, history=None):
+        self.feature_names = list(feature_names)
+        self.clusters = np.asarray(clusters)
+        self.centroids = np.asarray(centroids, dtype=np.float64)
+        self.counts = np.asarray(counts, dtype=np.float64)
+        self.n_seen = int(n_seen)
+        self.mean = np.asarray(mean, dtype=np.float64)
+        self.var = np.asarray(var, dtype=np.float64)
+        self.history = history or []
+
+    @classmethod
+    def from_labels(cls, X, labels):
+        """
+        Start from an existing solution (e.g. the stored Stata clusters)
+
+        Args:
+            X: Unscaled dummy DataFrame (data_dummies)
+            labels: Cluster label per row
+        """
+        values = np.asarray(X, dtype=np.float64)
+        clusters, codes = np.unique(np.asarray(labels), return_inverse=True)
+        counts = np.bincount(codes, minlength=len(clusters)).astype(np.float64)
+
+        # Cluster means in one pass: sum rows by cluster code
+        sums = np.zeros((len(clusters), values.shape[1]))
+        np.add.at(sums, codes, values)
+        return cls(X.columns, clusters, sums / counts[:, None], counts,
+                   values.shape[0], values.mean(axis=0), values.var(axis=0))
+
+    @classmethod
+    def fit(cls, X, n_clusters, n_init=10, random_state=42):
+        """Start from a K-Means fit on the standardized matrix"""
+        from sklearn.cluster import KMeans
+
+        values = np.asarray(X, dtype=np.float64)
+        mean, scale = values.mean(axis=0), cls._scale(values.var(axis=0))
+        labels = KMeans(n_clusters=n_clusters, n_init=n_init, random_state=random_state).fit_predict(
+            (values - mean) / scale
+        )
+        return cls.from_labels(X, labels)
+
+    @staticmethod
+    def _scale(var):
+        # Constant features keep unit scale, as in StandardScaler
+        scale = np.sqrt(var)
+        return np.where(scale > 0, scale, 1.0)
+
+    def _values(self, X):
+        """Align a dummy DataFrame with the fitted features (absent dummies are 0)"""
+        if isinstance(X, pd.DataFrame):
+            unknown = [col for col in X.columns if col not in set(self.feature_names)]
+            if unknown:
+                print(f"Warning: ignoring {len(unknown)} columns not seen in the initial fit")
+            X = X.reindex(columns=self.feature_names, fill_value=0)
+        return np.asarray(X, dtype=np.float64)
+
+    def transform(self, X):
+        """Standardize with the current scaler statistics"""
+        return (self._values(X) - self.mean) / self._scale(self.var)
+
+    def _nearest(self, scaled):
+        scaled_centroids = (self.centroids - self.mean) / self._scale(self.var)
+        # Squared distances via the expansion |x|^2 - 2 x.c + |c|^2
+        distances = (
+            (scaled ** 2).sum(axis=1)[:, None]
+            - 2 * scaled @ scaled_centroids.T
+            + (scaled_centroids ** 2).sum(axis=1)[None, :]
+        )
+        codes = distances.argmin(axis=1)
+        return codes, np.maximum(distances[np.arange(len(codes)), codes], 0)
+
+    def predict(self, X):
+        """Assign respondents to the nearest centroid without updating anything"""
+        codes, _ = self._nearest(self.transform(X))
+        return self.clusters[codes]
+
+    def partial_fit(self, X, wave=None):
+        """
+        Assign a new wave of respondents and update the scaler statistics and centroids
+
+        Args:
+            X: Unscaled dummy DataFrame of the new wave (preprocessed with the saved
+                SurveyPreprocessor)
+            wave: Optional name recorded in the drift history
+
+        Returns:
+            Cluster label per respondent of the wave
+        """
+        values = self._values(X)
+        # An empty wave would turn the merged moments into NaN; leave the state untouched
+        if values.shape[0] == 0:
+            return self.clusters[np.zeros(0, dtype=int)]
+        previous = {'centroids': self.centroids.copy(), 'mean': self.mean.copy(),
+                    'scale': self._scale(self.var)}
+
+        # Update the scaler statistics, then assign in the updated standardized space
+        self.n_seen, self.mean, self.var = merge_moments(
+            self.n_seen, self.mean, self.var, values.shape[0], values.mean(axis=0), values.var(axis=0)
+        )
+        codes, sq_distances = self._nearest(self.transform(values))
+
+        # Move every centroid towards its new members: c += (sum - n_new * c) / count
+        batch_counts = np.bincount(codes, minlength=len(self.clusters)).astype(np.float64)
+        batch_sums = np.zeros_like(self.centroids)
+        np.add.at(batch_sums, codes, values)
+        self.counts += batch_counts
+        updated = batch_counts > 0
+        self.centroids[updated] += (
+            batch_sums[updated] - batch_counts[updated, None] * self.centroids[updated]
+        ) / self.counts[updated, None]
+
+        self.history.append(self._drift_record(wave, previous, batch_counts, sq_distances))
+        return self.clusters[codes]
+
+    def _drift_record(self, wave, previous, batch_counts, sq_distances):
+        # Centroid movement measured in the previous standardized units
+        shift = np.linalg.norm((self.centroids - previous['centroids']) / previous['scale'], axis=1)
+        mean_shift = np.abs(self.mean - previous['mean']) / previous['scale']
+        record = {
+            'wave': wave if wave is not None else len(self.history) + 1,
+            'n_respondents': int(batch_counts.sum()),
+            'n_seen': self.n_seen,
+            'max_centroid_shift': float(shift.max()),
+            'max_feature_mean_shift': float(mean_shift.max()),
+            'drifted_feature': self.feature_names[int(mean_shift.argmax())],
+            'mean_sq_distance': float(sq_distances.mean())
+        }
+        for cluster, count, cluster_shift in zip(self.clusters, batch_counts, shift):
+            record[f"n_cluster_{cluster}"] = int(count)
+            record[f"shift_cluster_{cluster}"] = float(cluster_shift)
+        return record
+
+    def drift_report(self):
+        """Drift of every update relative to the centroids and scaler before it"""
+        return pd.DataFrame(self.history)
+
+    def to_dict(self):
+        """Return the state as a JSON-serializable dictionary"""
+        return {
+            'feature_names': self.feature_names,
+            'clusters': self.clusters.tolist(),
+            'centroids': self.centroids.tolist(),
+            'counts': self.counts.tolist(),
+            'n_seen': self.n_seen,
+            'mean': self.mean.tolist(),
+            'var': self.var.tolist(),
+            'history': self.history
+        }
+
+    @classmethod
+    def from_dict(cls, state):
+        """Rebuild a clusterer from to_dict() output"""
+        return cls(**state)
+
+    def save(self, path):
+        """Save the centroids and scaler statistics to a JSON file"""
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(self.to_dict(), f, indent=1)
+
+    @classmethod
+    def load(cls, path):
+        """Load a clusterer saved with save()"""
+        with open(path, 'r', encoding='utf-8') as f:
+            return cls.from_dict(json.load(f))
@@ -0,0 +1,182 @@
+# knn_graph.py
+
+import os
+
+import joblib
+import numpy as np
+from scipy import sparse
+
+from caching import cache_dir, hash_array, hash_bytes, hash_params
+
+# Neighbours per point; matches the UMAP n_neighbors used for the visualizations
+DEFAULT_N_NEIGHBORS = 15
+
+# Graphs already built in this session, keyed like the disk cache
+_GRAPHS = {}
+
+
+class KNNGraph:
+    """
+    k-nearest-neighbour graph over the rows of a data matrix
+
+    Column 0 of indices/distances is each point itself (distance 0), followed by
+    its neighbours in increasing distance, the layout UMAP expects.
+
+    Attributes:
+        key: Content hash of the data and graph parameters
+        indices, distances: Arrays of shape (n_samples, n_neighbors)
+        method: 'exact' or 'nndescent'
+        search_index: pynndescent index of an NN-descent graph (needed by
+            UMAP.transform), loaded from the disk cache on first use; None for
+            exact graphs
+    """
+
+    def __init__(self, key, indices, distances, method, search_index=None, index_path=None):
+        self.key = key
+        self.indices = indices
+        self.distances = distances
+        self.method = method
+        self._search_index = search_index
+        self._index_path = index_path
+
+    @property
+    def search_index(self):
+        if self._search_index is None and self._index_path is not None:
+            self._search_index = joblib.load(self._index_path)
+        return self._search_index
+
+    @property
+    def n_neighbors(self):
+        return self.indices.shape[1]
+
+    def kneighbors(self, n_neighbors):
+        """(indices, distances) restricted to the first n_neighbors columns"""
+        if n_neighbors > self.n_neighbors:
+            raise ValueError(f"Graph has {self.n_neighbors} neighbours, {n_neighbors} requested")
+        return self.indices[:, :n_neighbors], self.distances[:, :n_neighbors]
+
+    def umap_knn(self, n_neighbors):
+        """Tuple for umap.UMAP(precomputed_knn=...); only useful for NN-descent graphs"""
+        indices, distances = self.kneighbors(n_neighbors)
+        return indices, distances, self.search_index
+
+    def kth_neighbor_distances(self, k=1):
+        """Distance from every point to its k-th nearest other point"""
+        return self.distances[:, k]
+
+    def distance_graph(self, radius=None):
+        """
+        Sparse distance matrix of the graph, optionally keeping only edges within radius
+
+        Suitable for estimators that accept metric='precomputed' sparse input
+        (e.g. DBSCAN). Self edges are kept as explicit zeros.
+        """
+        n_samples = self.indices.shape[0]
+        rows = np.repeat(np.arange(n_samples), self.n_neighbors)
+        cols = self.indices.ravel()
+        data = self.distances.ravel()
+        if radius is not None:
+            keep = data <= radius
+            rows, cols, data = rows[keep], cols[keep], data[keep]
+        return sparse.csr_matrix((data, (rows, cols)), shape=(n_samples, n_samples))
+
+    def neighborhood_purity(self, labels, n_neighbors=None):
+        """Mean share of each point's neighbours (excluding itself) that share its label"""
+        labels = np.asarray(labels)
+        indices, _ = self.kneighbors(n_neighbors or self.n_neighbors)
+        return float((labels[indices[:, 1:]] == labels[:, None]).mean())
+
+
+def _build(X, n_neighbors, method, random_state):
+    if method == 'exact':
+        from sklearn.neighbors import NearestNeighbors
+        distances, indices = NearestNeighbors(n_neighbors=n_neighbors).fit(X).kneighbors(X)
+        return indices, distances, None
+    if method == 'nndescent':
+        from pynndescent import NNDescent
+        index = NNDescent(X, n_neighbors=n_neighbors, random_state=random_state)
+        indices, distances = index.neighbor_graph
+        return indices, distances, index
+    raise ValueError(f"Unknown kNN method: {method}")
+
+
+def build_knn_graph(X, n_neighbors=DEFAULT_N_NEIGHBORS, method='exact', random_state=42, use_cache=True):
+    """
+    Build (or reload) the kNN graph of a data matrix
+
+    NN-descent graphs are cached together with their search index, so a graph
+    reloaded in a later session can still be passed to UMAP.
+
+    Args:
+        X: Data matrix, e.g. data_scaled
+        n_neighbors: Neighbours per point, including the point itself
+        method: 'exact' (sklearn NearestNeighbors) or 'nndescent' (approximate, pynndescent)
+        random_state: Seed for NN-descent
+        use_cache: Reuse graphs from this session and from .cache/knn
+
+    Returns:
+        KNNGraph
+    """
+    X = np.ascontiguousarray(X, dtype=np.float64)
+    params = {'n_neighbors': n_neighbors, 'method': method, 'random_state': random_state}
+    key = hash_bytes(hash_array(X), hash_params(params))
+
+    if use_cache and key in _GRAPHS:
+        return _GRAPHS[key]
+
+    path = os.path.join(cache_dir('knn'), f"{key[:24]}.npz")
+    index_path = os.path.join(cache_dir('knn'), f"{key[:24]}.index.joblib") if method == 'nndescent' else None
+    if use_cache and os.path.exists(path) and (index_path is None or os.path.exists(index_path)):
+        cached = np.load(path, allow_pickle=False)
+        graph = KNNGraph(key, cached['indices'], cached['distances'], method, index_path=index_path)
+    else:
+        print(f"Building {method} kNN graph (k={n_neighbors}) for {X.shape[0]} points")
+        indices, distances, search_index = _build(X, n_neighbors, method, random_state)
+        graph = KNNGraph(key, np.asarray(indices), np.asarray(distances), method, search_index)
+        if use_cache:
+            # The index is written first; the graph file marks a complete entry
+            if index_path is not None:
+                joblib.dump(search_index, index_path + '.tmp')
+                os.replace(index_path + '.tmp', index_path)
+            tmp_path = path + '.tmp.npz'
+            np.savez_compressed(tmp_path, indices=graph.indices, distances=graph.distances)
+            os.replace(tmp_path, path)
+
+    if use_cache:
+        _GRAPHS[key] = graph
+    return graph
+
+
+def knee_eps(graph, k=1):
+    """
+    DBSCAN eps from the knee of the sorted k-th neighbour distance curve,
+    falling back to the median distance when no knee is found
+    """
+    from kneed import KneeLocator
+
+    distances = np.sort(graph.kth_neighbor_distances(k))
+    knee_locator = KneeLocator(
+        range(len(distances)),
+        distances,
+        S=1.0,
+        curve="convex",
+        direction="increasing"
+    )
+    return distances[knee_locator.knee] if knee_locator.knee else np.median(distances)
+
+
+def dbscan_from_graph(graph, eps, min_samples=5):
+    """
+    Run DBSCAN on the graph's sparse distance matrix instead of new radius queries
+
+    Exact as long as no point has more than graph.n_neighbors points within eps;
+    beyond that only the graph's nearest neighbours are considered. On an
+    NN-descent graph the neighbours themselves are approximate.
+    """
+    from sklearn.cluster import DBSCAN
+
+    if min_samples > graph.n_neighbors:
+        raise ValueError("min_samples cannot exceed the number of neighbours in the graph")
+    return DBSCAN(eps=eps, min_samples=min_samples, metric='precomputed').fit_predict(
+        graph.distance_graph(radius=eps)
+    )
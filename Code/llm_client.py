@@ -0,0 +1,299 @@
+# llm_client.py
+
+import os
+import asyncio
+import hashlib
+import logging
+import random
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MODEL = "gpt-3.5-turbo"
+OPENAI_BASE_URL = "https://api.openai.com/v1"
+SYSTEM_PROMPT = "You are a helpful data science assistant. Provide clear, concise explanations of code and analytical results."
+
+NOT_AVAILABLE = "ChatGPT integration not available (API key not found)."
+NOT_CACHED = "No stored response for this prompt (offline mode)."
+
+
+def is_error_response(text):
+    """True for the placeholder texts returned instead of a model response"""
+    return text in (NOT_AVAILABLE, NOT_CACHED) or str(text).startswith("Error querying ChatGPT")
+
+
+def _status_code(error):
+    return getattr(error, 'status_code', None) or getattr(getattr(error, 'response', None), 'status_code', None)
+
+
+def _retry_after(error):
+    """Seconds requested by the server (Retry-After header), if any"""
+    headers = getattr(getattr(error, 'response', None), 'headers', None) or {}
+    try:
+        return float(headers.get('retry-after'))
+    except (TypeError, ValueError):
+        return None
+
+
+def is_rate_limit(error):
+    """True for HTTP 429 / openai.RateLimitError"""
+    return _status_code(error) == 429 or type(error).__name__ == 'RateLimitError'
+
+
+def is_retryable(error):
+    """Rate limits, server errors, timeouts and connection failures are worth retrying"""
+    status = _status_code(error)
+    if status is not None:
+        return status == 429 or status >= 500
+    return True
+
+
+class ChatBackend:
+    """
+    Interface of a chat-completion backend used by LLMWorkerPool
+
+    complete() returns the response text and raises on failure; errors carrying
+    a status_code (directly or on .response) are classified for retries by
+    is_retryable / is_rate_limit.
+
+    cache_namespace separates cached responses of different endpoints, so stub
+    responses never answer prompts meant for the real API.
+    """
+
+    cache_namespace = ''
+
+    async def complete(self, model, messages, max_tokens):
+        raise NotImplementedError
+
+    async def aclose(self):
+        pass
+
+
+class OpenAIBackend(ChatBackend):
+    """Backend on the openai SDK's AsyncOpenAI client"""
+
+    def __init__(self, api_key, base_url=None):
+        import openai
+
+        self.client = openai.AsyncOpenAI(api_key=api_key, base_url=base_url, max_retries=0)
+        self.cache_namespace = base_url.rstrip('/') if base_url and base_url.rstrip('/') != OPENAI_BASE_URL else ''
+
+    async def complete(self, model, messages, max_tokens):
+        response = await self.client.chat.completions.create(model=model, messages=messages, max_tokens=max_tokens)
+        return response.choices[0].message.content
+
+    async def aclose(self):
+        await self.client.close()
+
+
+class HTTPBackend(ChatBackend):
+    """
+    Backend for any OpenAI-compatible /chat/completions endpoint over httpx
+
+    One AsyncClient is shared by all requests, so connections are pooled and
+    kept alive between prompts.
+
+    Args:
+        base_url: API root, e.g. https://api.openai.com/v1 or http://127.0.0.1:8765/v1
+        api_key: Bearer token (None for local servers)
+        max_connections: Connection pool size
+        timeout: Request timeout in seconds
+    """
+
+    def __init__(self, base_url=OPENAI_BASE_URL, api_key=None, max_connections=16, timeout=60.0):
+        import httpx
+
+        self.cache_namespace = base_url.rstrip('/') if base_url.rstrip('/') != OPENAI_BASE_URL else ''
+        headers = {"Authorization": f"Bearer {api_key}"} if api_key else {}
+        self.client = httpx.AsyncClient(
+            base_url=base_url.rstrip('/'),
+            headers=headers,
+            timeout=timeout,
+            limits=httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections)
+        )
+
+    async def complete(self, model, messages, max_tokens):
+        response = await self.client.post("/chat/completions", json={
+            "model": model,
+            "messages": messages,
+            "max_tokens": max_tokens
+        })
+        # HTTPStatusError keeps the response, so status and Retry-After are available
+        response.raise_for_status()
+        return response.json()["choices"][0]["message"]["content"]
+
+    async def aclose(self):
+        await self.client.aclose()
+
+
+def stub_response(messages):
+    """Deterministic placeholder text for a conversation (shared by StubBackend and the stub server)"""
+    prompt = messages[-1]["content"] if messages else ""
+    digest = hashlib.sha256(prompt.encode('utf-8')).hexdigest()[:12]
+    first_line = next((line.strip() for line in prompt.splitlines() if line.strip()), "")
+    return f"[stub {digest}] Summary of: {first_line[:120]}"
+
+
+class StubBackend(ChatBackend):
+    """
+    In-process backend with deterministic responses, for offline runs and benchmarks
+
+    Args:
+        latency: Simulated seconds per request
+    """
+
+    cache_namespace = 'stub'
+
+    def __init__(self, latency=0.0):
+        self.latency = latency
+        self.requests = 0
+
+    async def complete(self, model, messages, max_tokens):
+        self.requests += 1
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        return stub_response(messages)
+
+
+def create_backend(kind=None, api_key=None, base_url=None):
+    """
+    Backend from a name: 'http' (default), 'openai' or 'stub'
+
+    The defaults come from the LLM_BACKEND and LLM_BASE_URL environment
+    variables. Returns None for a remote backend without an API key or base URL.
+    """
+    kind = kind or os.getenv('LLM_BACKEND', 'http')
+    base_url = base_url or os.getenv('LLM_BASE_URL')
+    if kind == 'stub':
+        return StubBackend(latency=float(os.getenv('LLM_STUB_LATENCY', '0')))
+    if not api_key and not base_url:
+        return None
+    if kind == 'openai':
+        return OpenAIBackend(api_key, base_url=base_url)
+    if kind == 'http':
+        return HTTPBackend(base_url or OPENAI_BASE_URL, api_key=api_key)
+    raise ValueError(f"Unknown LLM backend '{kind}'; expected 'http', 'openai' or 'stub'")
+
+
+class LLMWorkerPool:
+    """
+    Sends chat prompts concurrently with bounded concurrency and backoff
+
+    At most max_concurrency requests are in flight. Failed requests are retried
+    with jittered exponential backoff. A rate-limit response pauses every worker
+    until the server's Retry-After (or the backoff delay) has passed, rather than
+    letting the other workers keep hitting the limit.
+
+    With a response cache, stored responses are served without a request and
+    successful responses are stored; in offline mode nothing is sent.
+
+    Args:
+        backend: ChatBackend (None disables queries)
+        model: Chat model name
+        system_prompt: System message sent with every prompt
+        max_tokens: Completion length limit
+        max_concurrency: Requests in flight at once
+        max_retries: Attempts per prompt
+        base_delay: First backoff delay in seconds (doubled on every retry)
+        max_delay: Upper bound of a backoff delay
+        cache: Optional response_cache.ResponseCache
+    """
+
+    def __init__(self, backend, model=DEFAULT_MODEL, system_prompt=SYSTEM_PROMPT, max_tokens=1000,
+                 max_concurrency=8, max_retries=5, base_delay=1.0, max_delay=60.0, cache=None):
+        self.backend = backend
+        self.cache = cache
+        # Cached responses are keyed by endpoint and model
+        namespace = getattr(backend, 'cache_namespace', '')
+        self.cache_model = f"{namespace}|{model}" if namespace else model
+        self.model = model
+        self.system_prompt = system_prompt
+        self.max_tokens = max_tokens
+        self.max_concurrency = max_concurrency
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self._resume_at = 0.0
+        # One loop for the pool's lifetime: the async client's connections are bound to it
+        self._loop = None
+
+    def _backoff(self, attempt):
+        delay = min(self.max_delay, self.base_delay * 2 ** attempt)
+        return delay * random.uniform(0.5, 1.0)
+
+    async def _wait_for_rate_limit(self):
+        loop = asyncio.get_running_loop()
+        while self._resume_at > loop.time():
+            await asyncio.sleep(self._resume_at - loop.time())
+
+    async def query(self, prompt, semaphore):
+        """Send one prompt, retrying as needed; returns the text or an error message"""
+        loop = asyncio.get_running_loop()
+        for attempt in range(self.max_retries):
+            async with semaphore:
+                await self._wait_for_rate_limit()
+                try:
+                    text = await self.backend.complete(self.model, [
+                        {"role": "system", "content": self.system_prompt},
+                        {"role": "user", "content": prompt}
+                    ], self.max_tokens)
+                    if self.cache is not None:
+                        self.cache.put(self.cache_model, self.system_prompt, prompt, text)
+                    return text
+                except Exception as e:
+                    error = e
+
+            logger.warning(f"ChatGPT query failed (attempt {attempt+1}/{self.max_retries}): {str(error)}")
+            if attempt == self.max_retries - 1 or not is_retryable(error):
+                break
+            delay = self._backoff(attempt)
+            if is_rate_limit(error):
+                # Pause every worker, not just this one
+                delay = max(delay, _retry_after(error) or 0.0)
+                self._resume_at = max(self._resume_at, loop.time() + delay)
+            await asyncio.sleep(delay)
+
+        logger.error("All ChatGPT query attempts failed")
+        return f"Error querying ChatGPT: {str(error)}"
+
+    async def query_all(self, prompts):
+        """Send all prompts concurrently; identical prompts are sent once"""
+        unique = list(dict.fromkeys(prompts))
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+        responses = await asyncio.gather(*[self.query(prompt, semaphore) for prompt in unique])
+        by_prompt = dict(zip(unique, responses))
+        return [by_prompt[prompt] for prompt in prompts]
+
+    def run(self, prompts):
+        """
+        Answer a list of prompts
+
+        Returns:
+            list of responses in the order of the prompts
+        """
+        unique = list(dict.fromkeys(prompts))
+        responses = {}
+        if self.cache is not None:
+            responses = self.cache.get_many(self.cache_model, self.system_prompt, unique)
+        missing = [prompt for prompt in unique if prompt not in responses]
+        if responses:
+            logger.info(f"{len(responses)} of {len(unique)} prompts answered from the response cache")
+
+        if missing:
+            if self.cache is not None and self.cache.mode == 'offline':
+                responses.update((prompt, NOT_CACHED) for prompt in missing)
+            elif self.backend is None:
+                responses.update((prompt, NOT_AVAILABLE) for prompt in missing)
+            else:
+                logger.info(f"Sending {len(missing)} prompts with up to {self.max_concurrency} concurrent requests")
+                if self._loop is None:
+                    self._loop = asyncio.new_event_loop()
+                responses.update(zip(missing, self._loop.run_until_complete(self.query_all(missing))))
+        return [responses[prompt] for prompt in prompts]
+
+    def close(self):
+        """Close the backend's connections and the pool's event loop"""
+        if self._loop is not None:
+            if self.backend is not None:
+                self._loop.run_until_complete(self.backend.aclose())
+            self._loop.close()
+            self._loop = None
@@ -0,0 +1,118 @@
+# llm_stub_server.py
+
+import json
+import time
+import argparse
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from llm_client import stub_response
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    """
+    OpenAI-compatible POST /v1/chat/completions with deterministic responses
+
+    Keep-alive is supported (HTTP/1.1), so clients exercise their connection pools.
+    """
+
+    protocol_version = "HTTP/1.1"
+
+    def _send_json(self, status, payload, headers=None):
+        body = json.dumps(payload).encode('utf-8')
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length", 0))
+        request = json.loads(self.rfile.read(length) or b"{}")
+        if not self.path.rstrip('/').endswith("/chat/completions"):
+            self._send_json(404, {"error": {"message": f"Unknown path {self.path}"}})
+            return
+
+        server = self.server
+        with server.lock:
+            server.requests += 1
+            count = server.requests
+        # Every rate_limit_every-th request is rejected, to exercise client backoff
+        if server.rate_limit_every and count % server.rate_limit_every == 0:
+            self._send_json(429, {"error": {"message": "Rate limit (stub)"}}, {"Retry-After": "1"})
+            return
+        if server.latency:
+            time.sleep(server.latency)
+
+        content = stub_response(request.get("messages", []))
+        self._send_json(200, {
+            "id": f"stub-{count}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": request.get("model", "stub"),
+            "choices": [{"index": 0, "message": {"role": "assistant", "content": content}, "finish_reason": "stop"}],
+            "usage": {"prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0}
+        })
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+
+def make_server(host="127.0.0.1", port=8765, latency=0.0, rate_limit_every=0, verbose=False):
+    """
+    Create a stub server (call serve_forever(), or use start_server for a background thread)
+
+    Args:
+        host, port: Address to bind (port 0 picks a free port)
+        latency: Simulated seconds per completion
+        rate_limit_every: Answer every n-th request with 429 (0 disables)
+        verbose: Log every request
+    """
+    server = ThreadingHTTPServer((host, port), StubHandler)
+    server.daemon_threads = True
+    server.latency = latency
+    server.rate_limit_every = rate_limit_every
+    server.verbose = verbose
+    server.requests = 0
+    server.lock = threading.Lock()
+    return server
+
+
+def start_server(**kwargs):
+    """
+    Run a stub server in a daemon thread
+
+    Returns:
+        (server, base_url); stop it with server.shutdown()
+    """
+    server = make_server(**kwargs)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    host, port = server.server_address[:2]
+    return server, f"http://{host}:{port}/v1"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Local OpenAI-compatible stub for offline report runs")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", type=float, default=0.0, help="Seconds per completion")
+    parser.add_argument("--rate-limit-every", type=int, default=0, help="Answer every n-th request with 429")
+    parser.add_argument("--verbose", action="store_true")
+    args = parser.parse_args()
+
+    server = make_server(args.host, args.port, args.latency, args.rate_limit_every, args.verbose)
+    print(f"Stub LLM server on http://{args.host}:{args.port}/v1 "
+          f"(run Resume.py with LLM_BASE_URL=http://{args.host}:{args.port}/v1)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,202 @@
+# method_comparison.py
+
+import os
+import sys
+import time
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from itertools import combinations
+
+import numpy as np
+import pandas as pd
+from sklearn.metrics import adjusted_rand_score
+
+from silhouette_scoring import get_silhouette_scorer
+
+
+# Estimator builders. Each takes the number of clusters, a seed and the shared
+# context (e.g. the DBSCAN eps) and returns an unfitted estimator.
+
+def build_kmeans(k, seed, context):
+    from sklearn.cluster import KMeans
+    return KMeans(n_clusters=k, n_init=10, random_state=seed)
+
+
+def build_agglomerative(k, seed, context):
+    from sklearn.cluster import AgglomerativeClustering
+    return AgglomerativeClustering(n_clusters=k)
+
+
+def build_gmm(k, seed, context):
+    from sklearn.mixture import GaussianMixture
+    return GaussianMixture(n_components=k, random_state=seed)
+
+
+def build_dbscan(k, seed, context):
+    from sklearn.cluster import DBSCAN
+    return DBSCAN(eps=context['eps'], min_samples=context.get('min_samples', 5), metric='precomputed')
+
+
+# Registered clustering methods, in reporting order. 'uses_k' methods are run for
+# every k, 'seeded' methods for every seed; 'input' selects the fitted matrix.
+METHOD_REGISTRY = [
+    {
+        'name': 'kmeans',
+        'description': 'K-Means',
+        'build': build_kmeans,
+        'uses_k': True,
+        'seeded': True,
+        'input': 'data'
+    },
+    {
+        'name': 'agglomerative',
+        'description': 'Hierarchical',
+        'build': build_agglomerative,
+        'uses_k': True,
+        'seeded': False,
+        'input': 'data'
+    },
+    {
+        'name': 'gmm',
+        'description': 'GMM',
+        'build': build_gmm,
+        'uses_k': True,
+        'seeded': True,
+        'input': 'data'
+    },
+    {
+        'name': 'dbscan',
+        'description': 'DBSCAN',
+        'build': build_dbscan,
+        'uses_k': False,
+        'seeded': False,
+        'input': 'distance_graph'
+    }
+]
+
+
+def _peak_rss_mb():
+    """Peak resident set size of the current process in MB (None where unsupported)"""
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS bytes
+    return peak / (1024 ** 2) if sys.platform == 'darwin' else peak / 1024
+
+
+def _run_method(spec, X, k, seed, context):
+    """Fit one method configuration (runs inside a worker process)"""
+    data = context['distance_graph'] if spec['input'] == 'distance_graph' else X
+    start_time = time.perf_counter()
+    labels = spec['build'](k, seed, context).fit_predict(data)
+    return spec['name'], k, seed, np.asarray(labels), time.perf_counter() - start_time, _peak_rss_mb()
+
+
+class MethodComparison:
+    """
+    Labels, timings and quality metrics of every method run, keyed by (name, k, seed)
+    """
+
+    def __init__(self, runs, table):
+        self.runs = runs
+        self.table = table
+
+    def __getitem__(self, key):
+        return self.runs[key]
+
+    def get(self, name, k=None, seed=None):
+        """First run of a method for k (ignored for methods without k) and seed"""
+        for (run_name, run_k, run_seed), run in self.runs.items():
+            if run_name == name and (run_k is None or k is None or run_k == k) \
+                    and (seed is None or run_seed is None or run_seed == seed):
+                return run
+        raise KeyError((name, k, seed))
+
+
+def compare_methods(X, program_types=None, registry=None, k_values=(2, 3), seeds=(42, 43, 44),
+                    knn_graph=None, n_jobs=None):
+    """
+    Run every registered clustering method over several k values and seeds in a
+    process pool and collect a benchmark table
+
+    Args:
+        X: Scaled data matrix
+        program_types: Optional program type per row, for the ARI against programs
+        registry: List of method specs (defaults to METHOD_REGISTRY)
+        k_values: Cluster counts for methods that take k
+        seeds: Seeds for stochastic methods; stability is the mean pairwise ARI
+            between the seeds' labelings
+        knn_graph: Shared knn_graph.KNNGraph, used for the DBSCAN eps and input
+        n_jobs: Worker processes (defaults to the core count)
+
+    Returns:
+        MethodComparison with a table of one row per method and k: wall time,
+        peak RSS, silhouette, ARI versus program type and seed stability
+    """
+    registry = registry or METHOD_REGISTRY
+    X = np.ascontiguousarray(X, dtype=np.float64)
+
+    context = {}
+    if any(spec['input'] == 'distance_graph' for spec in registry):
+        from knn_graph import build_knn_graph, knee_eps
+        knn_graph = knn_graph or build_knn_graph(X)
+        context['eps'] = knee_eps(knn_graph, k=1)
+        context['distance_graph'] = knn_graph.distance_graph(radius=context['eps'])
+
+    tasks = []
+    for spec in registry:
+        for k in (k_values if spec['uses_k'] else [None]):
+            for seed in (seeds if spec['seeded'] else [None]):
+                tasks.append((spec, k, seed))
+
+    n_jobs = max(1, min(len(tasks), n_jobs or os.cpu_count() or 1))
+    print(f"Running {len(tasks)} clustering configurations with {n_jobs} processes")
+
+    # A fresh process per task keeps the peak RSS specific to one fit
+    pool_kwargs = {'max_tasks_per_child': 1} if sys.version_info >= (3, 11) else {}
+    runs = OrderedDict()
+    with ProcessPoolExecutor(max_workers=n_jobs, **pool_kwargs) as executor:
+        futures = [executor.submit(_run_method, spec, X, k, seed, context) for spec, k, seed in tasks]
+        for future in futures:
+            name, k, seed, labels, wall_time, peak_rss = future.result()
+            runs[(name, k, seed)] = {
+                'labels': labels, 'wall_time': wall_time, 'peak_rss_mb': peak_rss,
+                'n_clusters': len(np.unique(labels))
+            }
+
+    # Silhouettes for all runs in one pass over the shared distance structure
+    scorable = {key: run['labels'] for key, run in runs.items()
+                if 1 < run['n_clusters'] < X.shape[0]}
+    silhouettes = get_silhouette_scorer(X).score_many(scorable)
+
+    if program_types is not None:
+        program_types = pd.Series(np.asarray(program_types))
+        has_program = program_types.notna().to_numpy()
+
+    rows = []
+    descriptions = {spec['name']: spec['description'] for spec in registry}
+    for spec, k in OrderedDict(((spec['name'], k), (spec, k)) for spec, k, _ in tasks).values():
+        group = [(key, run) for key, run in runs.items() if key[0] == spec['name'] and key[1] == k]
+        labelings = [run['labels'] for _, run in group]
+        ari = [adjusted_rand_score(program_types[has_program], labels[has_program])
+               for labels in labelings] if program_types is not None else []
+        stability = [adjusted_rand_score(a, b) for a, b in combinations(labelings, 2)]
+        sil = [silhouettes[key]['score'] for key, _ in group if key in silhouettes]
+        rss = [run['peak_rss_mb'] for _, run in group if run['peak_rss_mb'] is not None]
+        rows.append({
+            'method': descriptions[spec['name']],
+            'name': spec['name'],
+            'k': k,
+            'n_runs': len(group),
+            'n_clusters_found': int(np.median([run['n_clusters'] for _, run in group])),
+            'wall_time_mean': float(np.mean([run['wall_time'] for _, run in group])),
+            'wall_time_max': float(np.max([run['wall_time'] for _, run in group])),
+            'peak_rss_mb': float(np.max(rss)) if rss else np.nan,
+            'silhouette': float(np.mean(sil)) if sil else np.nan,
+            'ari_program': float(np.mean(ari)) if ari else np.nan,
+            'stability': float(np.mean(stability)) if stability else np.nan
+        })
+
+    return MethodComparison(runs, pd.DataFrame(rows))
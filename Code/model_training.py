@@ -0,0 +1,301 @@
+# model_training.py
+
+import os
+import time
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+import xgboost as xgb
+from sklearn.model_selection import train_test_split
+from sklearn.preprocessing import LabelEncoder
+
+from variable_definitions import program_variables, outcomes_to_exclude
+
+# Hyperparameters shared by all feature importance models
+DEFAULT_XGB_PARAMS = {
+    'max_depth': 3,
+    'learning_rate': 0.005,
+    'n_estimators': 1000,
+    'min_child_weight': 7,
+    'gamma': 0.15,
+    'subsample': 0.65,
+    'colsample_bytree': 0.7,
+    'reg_lambda': 8,
+    'reg_alpha': 2,
+    'scale_pos_weight': 1.45,
+    'random_state': 42,
+    'eval_metric': ['auc', 'logloss'],
+    # Histogram-based split finding; max_bin trades split resolution for speed
+    'tree_method': 'hist',
+    'max_bin': 256,
+    # Stop once the validation metric has not improved for this many rounds
+    'early_stopping_rounds': 100
+}
+
+# Validation metric monitored for early stopping ('auc' or 'logloss')
+EARLY_STOPPING_METRIC = 'logloss'
+
+# Dummy columns derived from the target itself
+TARGET_COLUMNS = ['program_Reskilling', 'program_Upskilling', 'program_General']
+
+
+def create_target(data):
+    """Create binary target variable from program type (Reskilling = 1, Upskilling = 0)"""
+    return np.where(data['program'] == 'Reskilling', 1, 0)
+
+
+# Feature subset builders. Each takes the raw data and the fitted preprocessor
+# and returns the feature matrix for one model.
+
+def features_all_data(data, preprocessor):
+    """All variables (including outcomes), using dummies"""
+    return preprocessor.transform(data).drop(TARGET_COLUMNS, axis=1, errors='ignore')
+
+
+def features_program_chars(data, preprocessor):
+    """Program characteristics only (without outcomes), using dummies (not imputed)"""
+    data_dummies = preprocessor.transform(data, impute=False)
+    program_columns = [col for col in data_dummies.columns if col.startswith(tuple(program_variables))]
+    excluded = set(outcomes_to_exclude)
+    program_columns = [col for col in program_columns if col not in excluded]
+    return data_dummies[program_columns]
+
+
+def features_program_categorical(data, preprocessor):
+    """Program characteristics with label-encoded categorical variables (no dummies)"""
+    prefixes = tuple(p.split('_')[0] for p in program_variables)
+    excluded = set(outcomes_to_exclude)
+    program_cols = [col for col in data.columns
+                    if col.startswith(prefixes)
+                    and col not in excluded
+                    and col != 'program'
+                    and 'program type' not in col.lower()]
+    program_data = data[program_cols]
+
+    # Reuse the fitted medians and modes instead of recomputing them column by column
+    fill_values = {col: preprocessor.medians_[col] for col in program_cols if col in preprocessor.medians_}
+    fill_values.update({col: preprocessor.modes_[col] for col in program_cols
+                        if preprocessor.modes_.get(col) is not None})
+    program_data = program_data.fillna(fill_values)
+
+    encoded_data = program_data.copy()
+    for col in program_data.select_dtypes(include=['object', 'category']).columns:
+        encoded_data[col] = LabelEncoder().fit_transform(program_data[col].astype(str))
+    return encoded_data
+
+
+def features_all_no_outcomes(data, preprocessor):
+    """All program and firm variables without outcomes, using dummies"""
+    X = features_all_data(data, preprocessor)
+
+    # Remove outcome variables and any challenge-related variables
+    outcome_columns = [col for col in X.columns if any(out in col for out in outcomes_to_exclude)]
+    challenge_columns = [col for col in X.columns if 'challenge' in col.lower() or 'cha_' in col.lower()]
+    X = X.drop(outcome_columns + challenge_columns, axis=1, errors='ignore')
+
+    # Keep only program variables and firm characteristics
+    prefixes = tuple(p.split('_')[0] for p in program_variables)
+    program_cols = [col for col in X.columns if col.startswith(prefixes)]
+    firm_cols = [col for col in X.columns if col.startswith(('f_', 'sk_n_f_', 'tr_sk_n_f_'))]
+    return X[program_cols + firm_cols]
+
+
+# Declarative registry of the feature importance models, in reporting order
+MODEL_REGISTRY = [
+    {
+        'name': 'all_data',
+        'description': 'All variables (with outcomes)',
+        'data_label': 'Data: All Variables (Including Outcomes), using dummies',
+        'features': features_all_data,
+        'params': {}
+    },
+    {
+        'name': 'program_chars',
+        'description': 'Program features (with dummies)',
+        'data_label': 'Data: Program Characteristics (Without Outcomes), using dummies',
+        'features': features_program_chars,
+        'params': {}
+    },
+    {
+        'name': 'program_categorical',
+        'description': 'Program features (with categorical encoding)',
+        'data_label': 'Data: Program Characteristics (With Categorical Encoding, No Dummies)',
+        'features': features_program_categorical,
+        'params': {}
+    },
+    {
+        'name': 'all_no_outcomes',
+        'description': 'All variables without outcomes',
+        'data_label': 'Data: All Variables (Without Outcomes), using dummies',
+        'features': features_all_no_outcomes,
+        'params': {}
+    }
+]
+
+
+def split_core_budget(n_models, n_cores=None):
+    """
+    Split a core budget between concurrent model fits and XGBoost threads
+
+    Returns:
+        (n_processes, threads_per_model)
+    """
+    n_cores = n_cores or os.cpu_count() or 1
+    n_processes = max(1, min(n_models, n_cores))
+    threads_per_model = max(1, n_cores // n_processes)
+    return n_processes, threads_per_model
+
+
+def _order_eval_metrics(params, early_stopping_metric):
+    """XGBoost early-stops on the last eval metric, so move the monitored one to the end"""
+    metrics = params.get('eval_metric') or []
+    if isinstance(metrics, str):
+        metrics = [metrics]
+    metrics = [m for m in metrics if m != early_stopping_metric] + [early_stopping_metric]
+    return {**params, 'eval_metric': metrics}
+
+
+def _trim_to_best_iteration(model):
+    """
+    Drop the trees grown after the best iteration so that predictions, importances
+    and SHAP values all use the early-stopped model
+
+    Returns:
+        (best_iteration, n_trees) of the trimmed model
+    """
+    booster = model.get_booster()
+    n_rounds = booster.num_boosted_rounds()
+    try:
+        best_iteration = int(model.best_iteration)
+    except AttributeError:
+        # Early stopping disabled
+        return n_rounds - 1, n_rounds
+
+    if best_iteration + 1 < n_rounds:
+        evals_result = model.evals_result()
+        model.load_model(bytearray(booster[:best_iteration + 1].save_raw()))
+        model.evals_result_ = evals_result
+    return best_iteration, best_iteration + 1
+
+
+def _fit_model(name, X_train, y_train, X_val, y_val, params):
+    """Fit a single XGBoost model (runs inside a worker process)"""
+    start_time = time.time()
+    model = xgb.XGBClassifier(**params)
+    model.fit(X_train, y_train, eval_set=[(X_val, y_val)], verbose=False)
+    best_iteration, n_trees = _trim_to_best_iteration(model)
+    return name, model, time.time() - start_time, best_iteration, n_trees
+
+
+class TrainingResults:
+    """
+    Fitted models and their train/validation data, keyed by registry name
+    """
+
+    def __init__(self):
+        self.runs = OrderedDict()
+
+    def __getitem__(self, name):
+        return self.runs[name]
+
+    def __iter__(self):
+        return iter(self.runs.values())
+
+    def __len__(self):
+        return len(self.runs)
+
+    @property
+    def models(self):
+        return [run['model'] for run in self.runs.values()]
+
+    @property
+    def model_names(self):
+        return [run['description'] for run in self.runs.values()]
+
+    @property
+    def val_sets(self):
+        return [(run['X_val'], run['y_val']) for run in self.runs.values()]
+
+    @property
+    def best_iterations(self):
+        return [run['best_iteration'] for run in self.runs.values()]
+
+    def importance(self, name, importance_type='weight'):
+        """Feature importances keyed by raw column name, sorted in descending order"""
+        scores = self.runs[name]['model'].get_booster().get_score(importance_type=importance_type)
+        return sorted(scores.items(), key=lambda x: x[1], reverse=True)
+
+    def timings(self):
+        return pd.DataFrame(
+            [{'model': run['name'], 'n_features': run['X_train'].shape[1],
+              'best_iteration': run['best_iteration'], 'n_trees': run['n_trees'],
+              'fit_seconds': run['fit_time']}
+             for run in self.runs.values()]
+        )
+
+
+def train_models(data, preprocessor, registry=None, n_cores=None, test_size=0.2, random_state=42,
+                 param_overrides=None, early_stopping_metric=EARLY_STOPPING_METRIC):
+    """
+    Train every model in the registry concurrently in a process pool
+
+    Args:
+        data: Raw survey data including the 'program' column
+        preprocessor: Fitted SurveyPreprocessor shared by all models
+        registry: List of model specs (defaults to MODEL_REGISTRY)
+        n_cores: Total core budget split between processes and XGBoost threads
+        test_size: Validation share for the stratified split
+        random_state: Seed for the split
+        param_overrides: Hyperparameters applied to every model (e.g. max_bin,
+            early_stopping_rounds=None to train the full n_estimators)
+        early_stopping_metric: Validation metric monitored for early stopping
+
+    Returns:
+        TrainingResults with one entry per model, in registry order
+    """
+    registry = registry or MODEL_REGISTRY
+    y = create_target(data)
+
+    # Build the feature matrices and splits in the parent; they are cheap compared to fitting
+    runs = OrderedDict()
+    for spec in registry:
+        X = spec['features'](data, preprocessor)
+        X_train, X_val, y_train, y_val = train_test_split(
+            X, y, test_size=test_size, random_state=random_state, stratify=y
+        )
+        runs[spec['name']] = {
+            'name': spec['name'],
+            'description': spec['description'],
+            'data_label': spec.get('data_label', spec['description']),
+            'params': _order_eval_metrics(
+                {**DEFAULT_XGB_PARAMS, **spec.get('params', {}), **(param_overrides or {})},
+                early_stopping_metric
+            ),
+            'X_train': X_train, 'X_val': X_val,
+            'y_train': y_train, 'y_val': y_val
+        }
+
+    n_processes, threads_per_model = split_core_budget(len(runs), n_cores)
+    print(f"Training {len(runs)} models with {n_processes} processes x {threads_per_model} threads")
+
+    with ProcessPoolExecutor(max_workers=n_processes) as executor:
+        futures = [
+            executor.submit(
+                _fit_model, run['name'], run['X_train'], run['y_train'], run['X_val'], run['y_val'],
+                {**run['params'], 'n_jobs': threads_per_model}
+            )
+            for run in runs.values()
+        ]
+        for future in futures:
+            name, model, fit_time, best_iteration, n_trees = future.result()
+            runs[name]['model'] = model
+            runs[name]['fit_time'] = fit_time
+            runs[name]['best_iteration'] = best_iteration
+            runs[name]['n_trees'] = n_trees
+            print(f"- {name}: {fit_time:.1f}s, best iteration {best_iteration}")
+
+    results = TrainingResults()
+    results.runs = runs
+    return results
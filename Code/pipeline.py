@@ -0,0 +1,216 @@
+# pipeline.py
+
+import os
+import json
+import inspect
+import hashlib
+from collections import OrderedDict
+
+import joblib
+
+from caching import atomic_write_bytes, cache_dir, hash_bytes, hash_params
+
+
+def file_hash(path):
+    """
+    SHA-256 of a file, or of every file below a directory (with relative paths);
+    None if the path does not exist
+    """
+    if os.path.isfile(path):
+        digest = hashlib.sha256()
+        with open(path, 'rb') as f:
+            for block in iter(lambda: f.read(1 << 20), b''):
+                digest.update(block)
+        return digest.hexdigest()
+    if os.path.isdir(path):
+        parts = []
+        for root, dirs, files in os.walk(path):
+            dirs.sort()
+            for name in sorted(files):
+                full_path = os.path.join(root, name)
+                parts.append(os.path.relpath(full_path, path))
+                parts.append(file_hash(full_path))
+        return hash_bytes(*parts)
+    return None
+
+
+def code_hash(func):
+    """Hash of a function's source (its bytecode when the source is unavailable)"""
+    try:
+        return hash_bytes(inspect.getsource(func))
+    except (OSError, TypeError):
+        return hash_bytes(func.__code__.co_code, repr(func.__code__.co_consts))
+
+
+class Stage:
+    """
+    One step of a pipeline
+
+    Attributes:
+        name: Stage name
+        func: Called with the values of deps, in order; its return value is the
+            stage value passed downstream. Dependents are keyed on its hash, so a
+            stage that writes files should return something derived from their
+            contents (not None) for dependents to re-run when they change
+        deps: Names of upstream stages
+        inputs: Files or directories the stage reads (data files, modules, label
+            definitions); a content change makes the stage stale
+        outputs: Files or directories the stage writes; a missing or modified
+            output makes the stage stale
+        params: JSON-serializable settings that affect the result (e.g. the label
+            mapping a figure uses)
+        code: Helper functions the stage calls; their source is part of the key
+    """
+
+    def __init__(self, name, func, deps=(), inputs=(), outputs=(), params=None, code=()):
+        self.name = name
+        self.func = func
+        self.deps = list(deps)
+        self.inputs = list(inputs)
+        self.outputs = list(outputs)
+        self.params = params or {}
+        self.code = list(code)
+
+
+class Pipeline:
+    """
+    A small DAG of analysis stages that only re-executes stale stages
+
+    A stage's key combines its code, parameters, input file hashes and the content
+    hashes of its upstream values. A stage is up to date when its key matches the
+    last run and its declared outputs are unchanged. Stage values are stored with
+    joblib under .cache/pipeline/<name> and only loaded when a stale downstream
+    stage needs them. Because upstream values are compared by content, a stage
+    that re-runs but produces the same value does not invalidate its dependents.
+
+    Example:
+        pipeline = Pipeline('cluster_analysis')
+
+        @pipeline.stage('load', inputs=['../Data/survey.dta'])
+        def load():
+            ...
+
+        pipeline.run(['load'])
+    """
+
+    def __init__(self, name, directory=None):
+        self.name = name
+        self.directory = directory or cache_dir(os.path.join('pipeline', name))
+        os.makedirs(self.directory, exist_ok=True)
+        self.state_path = os.path.join(self.directory, 'state.json')
+        self.stages = OrderedDict()
+        self._values = {}
+        if os.path.exists(self.state_path):
+            with open(self.state_path, 'r') as f:
+                self.state = json.load(f)
+        else:
+            self.state = {}
+
+    def stage(self, name, deps=(), inputs=(), outputs=(), params=None, code=()):
+        """Decorator registering a function as a stage (re-registering replaces it)"""
+        def register(func):
+            unknown = [dep for dep in deps if dep not in self.stages]
+            if unknown:
+                raise ValueError(f"Stage '{name}' depends on unknown stages: {unknown}")
+            self.stages[name] = Stage(name, func, deps, inputs, outputs, params, code)
+            return func
+        return register
+
+    def _order(self, targets):
+        """Stages needed for the targets, upstream first"""
+        order = []
+
+        def visit(name):
+            if name in order:
+                return
+            for dep in self.stages[name].deps:
+                visit(dep)
+            order.append(name)
+
+        for target in targets:
+            visit(target)
+        return order
+
+    def _key(self, stage):
+        return hash_bytes(
+            *[code_hash(func) for func in [stage.func] + stage.code],
+            hash_params(stage.params),
+            *[f"{path}={file_hash(path)}" for path in stage.inputs],
+            *[f"{dep}={self.state[dep]['value_hash']}" for dep in stage.deps]
+        )
+
+    def _stale_reason(self, stage, key, force):
+        record = self.state.get(stage.name)
+        if stage.name in force:
+            return "forced"
+        if record is None:
+            return "never run"
+        if record['key'] != key:
+            return "code, parameters, inputs or upstream values changed"
+        for path, recorded in record['outputs'].items():
+            if file_hash(path) != recorded:
+                return f"output changed or missing: {path}"
+        if not os.path.exists(self._value_path(stage.name)):
+            return "stored value missing"
+        return None
+
+    def _value_path(self, name):
+        return os.path.join(self.directory, f"{name}.joblib")
+
+    def value(self, name):
+        """Value of a stage from this session or the store"""
+        if name not in self._values:
+            self._values[name] = joblib.load(self._value_path(name))
+        return self._values[name]
+
+    def _save_state(self):
+        atomic_write_bytes(self.state_path, json.dumps(self.state, indent=1).encode('utf-8'))
+
+    def status(self, targets=None):
+        """dict of stage name -> reason it would run, or None when up to date"""
+        status = {}
+        for name in self._order(targets or list(self.stages)):
+            stage = self.stages[name]
+            upstream_stale = any(status[dep] is not None for dep in stage.deps)
+            if upstream_stale or any(dep not in self.state for dep in stage.deps):
+                status[name] = "upstream stage will run"
+            else:
+                status[name] = self._stale_reason(stage, self._key(stage), ())
+        return status
+
+    def run(self, targets=None, force=()):
+        """
+        Run the stages needed for the targets, skipping those that are up to date
+
+        Args:
+            targets: Stage names (defaults to all stages)
+            force: Stage names to re-run regardless of their state
+
+        Returns:
+            dict of target name -> value
+        """
+        targets = targets or list(self.stages)
+        for name in self._order(targets):
+            stage = self.stages[name]
+            key = self._key(stage)
+            reason = self._stale_reason(stage, key, set(force))
+            if reason is None:
+                print(f"[{self.name}] {name}: up to date")
+                continue
+
+            print(f"[{self.name}] {name}: running ({reason})")
+            value = stage.func(*[self.value(dep) for dep in stage.deps])
+
+            # Store the value first; its content hash is what dependents see
+            path = self._value_path(name)
+            joblib.dump(value, path + '.tmp')
+            os.replace(path + '.tmp', path)
+            self._values[name] = value
+            self.state[name] = {
+                'key': key,
+                'value_hash': file_hash(path),
+                'outputs': {output: file_hash(output) for output in stage.outputs}
+            }
+            self._save_state()
+
+        return {name: self.value(name) for name in targets}
@@ -0,0 +1,235 @@
+# preprocessing.py
+
+import json
+
+import numpy as np
+import pandas as pd
+from sklearn.base import BaseEstimator, TransformerMixin
+
+# Characters that are not safe in model feature names and their replacements
+NAME_REPLACEMENTS = {'>': 'greater', '<': 'less', ',': '_'}
+
+
+def clean_feature_name(name, replace_spaces=True):
+    """
+    Make a dummy column name safe for XGBoost and file exports
+    """
+    replacements = dict(NAME_REPLACEMENTS)
+    if replace_spaces:
+        replacements[' '] = '_'
+    return str(name).translate(str.maketrans(replacements))
+
+
+def _to_python(values):
+    """Convert an array-like of numpy scalars to plain Python values for JSON"""
+    return pd.Index(values).tolist()
+
+
+class SurveyPreprocessor(BaseEstimator, TransformerMixin):
+    """
+    Fitted imputation and one-hot encoding shared by the feature importance models,
+    the cluster analysis and any later scoring job.
+
+    Numeric columns of median_dtypes are filled with their training medians and
+    categorical columns are expanded into uint8 dummies with a fixed column order,
+    matching the layout of pd.get_dummies (numeric columns first, then one block
+    per categorical). Medians are learned for every numeric column, so callers
+    filling other columns (the label-encoded model) use the same values.
+
+    Args:
+        impute_categorical: Fill missing categories with the training mode before
+            encoding. When False, missing categories become all-zero dummy rows.
+        replace_spaces: Replace spaces in dummy column names with underscores
+        median_dtypes: Numeric dtypes filled with the median (None for all numeric
+            columns). The default matches the notebooks' original float64/int64 scope.
+        mode_other_numeric: Fill the remaining numeric columns with their mode
+            (0 if they have none) instead of leaving them missing
+    """
+
+    def __init__(self, impute_categorical=True, replace_spaces=True, median_dtypes=('float64', 'int64'),
+                 mode_other_numeric=False):
+        self.impute_categorical = impute_categorical
+        self.replace_spaces = replace_spaces
+        self.median_dtypes = median_dtypes
+        self.mode_other_numeric = mode_other_numeric
+
+    def fit(self, X, y=None):
+        df = pd.DataFrame(X)
+
+        categorical = df.select_dtypes(include=['object', 'category']).columns
+        numeric = df.select_dtypes(include=['number']).columns
+
+        self.input_columns_ = df.columns.tolist()
+        self.numeric_columns_ = numeric.tolist()
+        self.passthrough_columns_ = [col for col in df.columns if col not in set(categorical)]
+        self.categorical_columns_ = categorical.tolist()
+
+        # Column-wise statistics computed in one pass each
+        self.medians_ = df[numeric].median().to_dict()
+        if self.median_dtypes is None:
+            self.median_columns_ = numeric.tolist()
+        else:
+            self.median_columns_ = df[numeric].select_dtypes(include=list(self.median_dtypes)).columns.tolist()
+        self.numeric_modes_ = {}
+        if self.mode_other_numeric:
+            others = [col for col in numeric if col not in set(self.median_columns_)]
+            numeric_modes = df[others].mode(dropna=True)
+            self.numeric_modes_ = {
+                col: (numeric_modes[col].iloc[0]
+                      if not numeric_modes.empty and pd.notna(numeric_modes[col].iloc[0]) else 0)
+                for col in others
+            }
+        modes = df[categorical].mode(dropna=True)
+        self.modes_ = {
+            col: (modes[col].iloc[0] if not modes.empty and pd.notna(modes[col].iloc[0]) else None)
+            for col in categorical
+        }
+
+        # Category order follows pd.get_dummies: declared order for categoricals,
+        # sorted unique values for object columns
+        self.categories_ = {}
+        for col in categorical:
+            series = df[col]
+            if isinstance(series.dtype, pd.CategoricalDtype):
+                categories = series.cat.categories
+            else:
+                categories = pd.Index(series.dropna().unique()).sort_values()
+            self.categories_[col] = _to_python(categories)
+
+        self.feature_names_ = [
+            clean_feature_name(col, self.replace_spaces) for col in self.passthrough_columns_
+        ]
+        for col in categorical:
+            self.feature_names_.extend(
+                clean_feature_name(f"{col}_{cat}", self.replace_spaces)
+                for cat in self.categories_[col]
+            )
+        return self
+
+    def fill_values(self):
+        """Values filled into the missing numeric entries, by column"""
+        values = {col: self.medians_[col] for col in self.median_columns_}
+        values.update(self.numeric_modes_)
+        return values
+
+    def _encode(self, df, impute=True):
+        """Return the dummy block as a uint8 array with one column per fitted category"""
+        n_rows = len(df)
+        n_dummies = sum(len(cats) for cats in self.categories_.values())
+        dummies = np.zeros((n_rows, n_dummies), dtype=np.uint8)
+        rows = np.arange(n_rows)
+
+        offset = 0
+        for col in self.categorical_columns_:
+            categories = self.categories_[col]
+            values = df[col]
+            if impute and self.impute_categorical and self.modes_[col] is not None:
+                values = values.astype(object).where(values.notna(), self.modes_[col])
+
+            # Unknown and missing values get code -1 and stay all-zero
+            codes = pd.Categorical(values, categories=categories).codes
+            known = codes >= 0
+            dummies[rows[known], offset + codes[known]] = 1
+            offset += len(categories)
+        return dummies
+
+    def transform(self, X, sparse=False, impute=True):
+        """
+        Apply the fitted imputation and encoding
+
+        Args:
+            X: DataFrame with the columns seen during fit
+            sparse: Return a scipy.sparse CSR matrix instead of a DataFrame
+            impute: Fill missing values; when False the encoding matches plain
+                pd.get_dummies (missing numbers stay NaN, missing categories all-zero)
+
+        Returns:
+            DataFrame with columns feature_names_, or a CSR matrix in the same order
+        """
+        df = pd.DataFrame(X)
+        missing = [col for col in self.input_columns_ if col not in df.columns]
+        if missing:
+            raise KeyError(f"Columns missing from input: {missing}")
+
+        passthrough = df[self.passthrough_columns_]
+        if impute:
+            passthrough = passthrough.fillna(self.fill_values())
+        else:
+            passthrough = passthrough.copy()
+        # Booleans are stored as 0/1 like the dummy columns
+        bool_cols = passthrough.select_dtypes(include=['bool']).columns
+        if len(bool_cols):
+            passthrough[bool_cols] = passthrough[bool_cols].astype(np.uint8)
+        dummies = self._encode(df, impute=impute)
+
+        if sparse:
+            from scipy import sparse as sp
+            return sp.hstack([
+                sp.csr_matrix(passthrough.to_numpy(dtype=np.float64)),
+                sp.csr_matrix(dummies)
+            ], format='csr')
+
+        passthrough.columns = self.feature_names_[:len(self.passthrough_columns_)]
+        dummy_frame = pd.DataFrame(
+            dummies,
+            columns=self.feature_names_[len(self.passthrough_columns_):],
+            index=df.index
+        )
+        return pd.concat([passthrough, dummy_frame], axis=1)
+
+    def get_feature_names_out(self, input_features=None):
+        return np.asarray(self.feature_names_, dtype=object)
+
+    def dummy_sources(self):
+        """Map each dummy column name to its (source column, category) pair"""
+        sources = {}
+        names = iter(self.feature_names_[len(self.passthrough_columns_):])
+        for col in self.categorical_columns_:
+            for cat in self.categories_[col]:
+                sources[next(names)] = (col, cat)
+        return sources
+
+    def to_dict(self):
+        """Return the fitted state as a JSON-serializable dictionary"""
+        return {
+            'params': self.get_params(),
+            'input_columns': self.input_columns_,
+            'numeric_columns': self.numeric_columns_,
+            'passthrough_columns': self.passthrough_columns_,
+            'categorical_columns': self.categorical_columns_,
+            'medians': {col: float(val) for col, val in self.medians_.items()},
+            'median_columns': self.median_columns_,
+            'numeric_modes': {col: float(val) for col, val in self.numeric_modes_.items()},
+            'modes': {col: _to_python([val])[0] if val is not None else None
+                      for col, val in self.modes_.items()},
+            'categories': self.categories_,
+            'feature_names': self.feature_names_
+        }
+
+    @classmethod
+    def from_dict(cls, state):
+        """Rebuild a fitted preprocessor from to_dict() output"""
+        preprocessor = cls(**state['params'])
+        preprocessor.input_columns_ = state['input_columns']
+        preprocessor.numeric_columns_ = state['numeric_columns']
+        preprocessor.passthrough_columns_ = state['passthrough_columns']
+        preprocessor.categorical_columns_ = state['categorical_columns']
+        preprocessor.medians_ = state['medians']
+        # Files saved before median_columns was stored imputed every numeric column
+        preprocessor.median_columns_ = state.get('median_columns', state['numeric_columns'])
+        preprocessor.numeric_modes_ = state.get('numeric_modes', {})
+        preprocessor.modes_ = state['modes']
+        preprocessor.categories_ = state['categories']
+        preprocessor.feature_names_ = state['feature_names']
+        return preprocessor
+
+    def save(self, path):
+        """Save the fitted state to a JSON file"""
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(self.to_dict(), f, indent=1)
+
+    @classmethod
+    def load(cls, path):
+        """Load a preprocessor saved with save()"""
+        with open(path, 'r', encoding='utf-8') as f:
+            return cls.from_dict(json.load(f))
@@ -0,0 +1,146 @@
+# program_alignment.py
+
+import numpy as np
+import pandas as pd
+from scipy.optimize import linear_sum_assignment
+
+from cluster_stability import ari_from_table, contingency_table
+
+
+def encode_labels(values, categories=None):
+    """
+    Integer codes (0..n-1) of a label vector
+
+    Returns:
+        (codes, categories); missing values and values outside the given
+        categories get code -1
+    """
+    if categories is None:
+        codes, categories = pd.factorize(np.asarray(values), sort=True)
+        return codes, np.asarray(categories)
+    categorical = pd.Categorical(np.asarray(values), categories=categories)
+    return np.asarray(categorical.codes, dtype=np.int64), np.asarray(categorical.categories)
+
+
+def _entropy(counts):
+    p = counts[counts > 0] / counts.sum()
+    return float(-(p * np.log(p)).sum())
+
+
+def nmi_from_table(table):
+    """Normalized mutual information (arithmetic normalization) from a contingency table"""
+    n = table.sum()
+    h_rows = _entropy(table.sum(axis=1))
+    h_cols = _entropy(table.sum(axis=0))
+    if h_rows == 0 and h_cols == 0:
+        return 1.0
+    nonzero = table > 0
+    outer = np.outer(table.sum(axis=1), table.sum(axis=0))[nonzero]
+    mi = (table[nonzero] / n * np.log(table[nonzero] * n / outer)).sum()
+    return float(mi / ((h_rows + h_cols) / 2))
+
+
+def match_clusters(table):
+    """
+    Optimal one-to-one cluster-to-program assignment (Hungarian algorithm)
+
+    Args:
+        table: Contingency table of clusters (rows) x programs (columns)
+
+    Returns:
+        Array mapping each cluster to a program code; clusters left over when
+        k exceeds the number of programs map to -1
+    """
+    rows, cols = linear_sum_assignment(table, maximize=True)
+    mapping = np.full(table.shape[0], -1, dtype=np.int64)
+    mapping[rows] = cols
+    return mapping
+
+
+def align_clusters(cluster_labels, program_labels, program_categories=None):
+    """
+    Evaluate a clustering against program types for any number of clusters
+
+    The cluster x program table is built in a single bincount; the optimal
+    mapping, accuracy, ARI, NMI and confusion matrix are all derived from it.
+
+    Args:
+        cluster_labels: Cluster label per respondent
+        program_labels: Program type per respondent (rows outside program_categories
+            are ignored)
+        program_categories: Programs to evaluate against (defaults to all present)
+
+    Returns:
+        dict with accuracy (one-to-one mapping), purity (each cluster mapped to its
+        majority program), ari, nmi, mapping (cluster -> program or None),
+        mapped_labels (program per respondent, None where unmatched), table and
+        confusion (actual x predicted DataFrames)
+    """
+    program_codes, programs = encode_labels(program_labels, program_categories)
+    return _align_codes(cluster_labels, program_codes, programs)
+
+
+def _align_codes(cluster_labels, program_codes, programs):
+    cluster_codes, clusters = encode_labels(cluster_labels)
+    keep = (program_codes >= 0) & (cluster_codes >= 0)
+    table = contingency_table(cluster_codes[keep], program_codes[keep], len(clusters), len(programs))
+    n = table.sum()
+
+    mapping = match_clusters(table)
+    matched = mapping >= 0
+
+    # Confusion matrix from the table: sum the columns of clusters mapped to each program
+    assignment = np.zeros((len(clusters), len(programs) + 1), dtype=np.int64)
+    assignment[np.arange(len(clusters)), np.where(matched, mapping, len(programs))] = 1
+    confusion = table.T @ assignment
+    predicted = list(programs) + (['Unassigned'] if not matched.all() else [])
+
+    # Mapped labels through a lookup table instead of a per-respondent loop
+    lookup = np.append(programs.astype(object), None)
+    mapped_labels = lookup[np.where(matched, mapping, len(programs))[cluster_codes]]
+    mapped_labels[~keep] = None
+
+    return {
+        'n_clusters': len(clusters),
+        'n': int(n),
+        'accuracy': float(table[matched, mapping[matched]].sum() / n) if n else np.nan,
+        'purity': float(table.max(axis=1).sum() / n) if n else np.nan,
+        'ari': ari_from_table(table),
+        'nmi': nmi_from_table(table),
+        'mapping': {cluster: (programs[code] if code >= 0 else None)
+                    for cluster, code in zip(clusters, mapping)},
+        'mapped_labels': mapped_labels,
+        'table': pd.DataFrame(table, index=pd.Index(clusters, name='cluster'),
+                              columns=pd.Index(programs, name='program')),
+        'confusion': pd.DataFrame(confusion[:, :len(predicted)],
+                                  index=[f"Actual {p}" for p in programs],
+                                  columns=[f"Cluster {p}" for p in predicted])
+    }
+
+
+def align_many(labelings, program_labels, program_categories=None):
+    """
+    Align many labelings (e.g. k=2..8 over several seeds) with the same program types
+
+    Args:
+        labelings: dict of name -> cluster labels
+        program_labels: Program type per respondent
+        program_categories: Programs to evaluate against
+
+    Returns:
+        DataFrame with one row of accuracy, purity, ARI and NMI per labeling
+    """
+    # Encode the program types once for all labelings
+    program_codes, programs = encode_labels(program_labels, program_categories)
+    rows = []
+    for name, labels in labelings.items():
+        result = _align_codes(labels, program_codes, programs)
+        rows.append({
+            'labeling': name,
+            'n_clusters': result['n_clusters'],
+            'accuracy': result['accuracy'],
+            'purity': result['purity'],
+            'ari': result['ari'],
+            'nmi': result['nmi']
+        })
+    return pd.DataFrame(rows)
@@ -0,0 +1,150 @@
+# project_index.py
+
+import os
+import fnmatch
+import hashlib
+
+
+class FileEntry:
+    """
+    One file or directory of the project catalog
+
+    Attributes:
+        path: Path as joined from the index root (os.path.join style)
+        name: Base name
+        ext: Lower-case extension ('' for directories)
+        is_dir: True for directories
+        size: Size in bytes (0 for directories)
+        mtime: Modification time (st_mtime)
+    """
+
+    __slots__ = ('path', 'name', 'ext', 'is_dir', 'size', 'mtime', '_hash', '_text')
+
+    def __init__(self, path, name, is_dir, size, mtime):
+        self.path = path
+        self.name = name
+        self.ext = '' if is_dir else os.path.splitext(name)[1].lower()
+        self.is_dir = is_dir
+        self.size = size
+        self.mtime = mtime
+        self._hash = None
+        self._text = None
+
+    @property
+    def content_hash(self):
+        """SHA-256 of the file contents, computed on first use"""
+        if self._hash is None and not self.is_dir:
+            digest = hashlib.sha256()
+            with open(self.path, 'rb') as f:
+                for block in iter(lambda: f.read(1 << 20), b''):
+                    digest.update(block)
+            self._hash = digest.hexdigest()
+        return self._hash
+
+    def read_text(self):
+        """File contents as text, read once and kept"""
+        if self._text is None:
+            with open(self.path, 'r', encoding='utf-8', errors='ignore') as f:
+                self._text = f.read()
+        return self._text
+
+
+class ProjectIndex:
+    """
+    In-memory catalog of a project tree, built with one os.scandir pass
+
+    The size and mtime come from the scandir entries, so building the catalog
+    needs no extra stat calls on most platforms. Content hashes and file text
+    are computed lazily and memoized. Hidden entries and __pycache__ are skipped.
+
+    Args:
+        root: Directory to index
+        skip_dirs: Directory names to leave out
+    """
+
+    def __init__(self, root, skip_dirs=('__pycache__',)):
+        self.root = root
+        self.skip_dirs = set(skip_dirs)
+        self.entries = {}
+        self._children = {}
+        self.build()
+
+    def _skip(self, entry):
+        return entry.name.startswith('.') or (entry.name in self.skip_dirs and entry.is_dir())
+
+    def build(self):
+        """(Re)scan the tree"""
+        self.entries = {}
+        self._children = {}
+        stack = [self.root]
+        while stack:
+            directory = stack.pop()
+            children = []
+            try:
+                with os.scandir(directory) as it:
+                    for entry in it:
+                        if self._skip(entry):
+                            continue
+                        try:
+                            is_dir = entry.is_dir()
+                            stat = entry.stat()
+                        except OSError:
+                            continue
+                        item = FileEntry(entry.path, entry.name, is_dir, 0 if is_dir else stat.st_size, stat.st_mtime)
+                        self.entries[item.path] = item
+                        children.append(item)
+                        if is_dir:
+                            stack.append(entry.path)
+            except OSError:
+                pass
+            self._children[directory] = sorted(children, key=lambda item: item.name)
+        return self
+
+    def __contains__(self, path):
+        return path in self.entries
+
+    def get(self, path):
+        """Entry for a path, or None"""
+        return self.entries.get(path)
+
+    def files(self, extensions=None, under=None):
+        """
+        Files sorted by path, optionally filtered by extension and containing directory
+
+        Args:
+            extensions: Iterable of lower-case extensions, e.g. ['.csv', '.xlsx']
+            under: Only files below this directory
+        """
+        prefix = os.path.join(under, '') if under is not None else None
+        extensions = set(extensions) if extensions is not None else None
+        return sorted(
+            (entry for entry in self.entries.values()
+             if not entry.is_dir
+             and (extensions is None or entry.ext in extensions)
+             and (prefix is None or entry.path.startswith(prefix))),
+            key=lambda entry: entry.path
+        )
+
+    def find(self, pattern, under=None):
+        """Files anywhere in the tree (or below under) whose name matches a glob pattern"""
+        return [entry for entry in self.files(under=under) if fnmatch.fnmatch(entry.name, pattern)]
+
+    def listdir(self, directory):
+        """
+        Direct children of a directory, sorted by name
+
+        Returns:
+            (files, dirs) lists of FileEntry
+        """
+        if directory not in self._children:
+            raise FileNotFoundError(f"Not in the project index: {directory}")
+        children = self._children[directory]
+        return [entry for entry in children if not entry.is_dir], [entry for entry in children if entry.is_dir]
+
+    def read_text(self, path):
+        """Text of an indexed file (memoized), or of any other file"""
+        entry = self.entries.get(path)
+        if entry is None:
+            with open(path, 'r', encoding='utf-8', errors='ignore') as f:
+                return f.read()
+        return entry.read_text()
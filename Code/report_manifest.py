@@ -0,0 +1,128 @@
+# report_manifest.py
+
+import os
+import json
+
+from caching import atomic_write_bytes, cache_dir
+
+
+class SectionRecord:
+    """
+    Element-building calls made while processing one file
+
+    ops is a list of [method name, args] pairs replayed on the report generator.
+    ChatGPT responses are not known while the file is processed, so their place is
+    reserved with a ['query', [slot]] op and filled once the response is rendered.
+    complete is cleared when processing or a response fails.
+
+    Args:
+        key: Section key (processing method and relative path)
+        entry: project_index.FileEntry of the file (None if not indexed)
+    """
+
+    def __init__(self, key=None, entry=None):
+        self.key = key
+        self.entry = entry
+        self.ops = []
+        self.queries = {}
+        self.complete = True
+
+    def add(self, op, args):
+        self.ops.append([op, list(args)])
+
+    def reserve_query(self):
+        """Placeholder for a deferred ChatGPT response; returns its slot"""
+        slot = len(self.queries)
+        self.queries[slot] = None
+        self.ops.append(['query', [slot]])
+        return slot
+
+    def fill_query(self, slot, ops, ok=True):
+        """Ops rendered from a response; a failed response makes the section not reusable"""
+        self.queries[slot] = ops
+        self.complete = self.complete and ok
+
+    def resolved_ops(self):
+        """ops with every query placeholder replaced by its rendered ops"""
+        resolved = []
+        for op, args in self.ops:
+            if op == 'query':
+                filled = self.queries.get(args[0])
+                if filled is None:
+                    return None
+                resolved.extend(filled)
+            else:
+                resolved.append([op, args])
+        return resolved
+
+
+class ReportManifest:
+    """
+    Per-file record of the report sections produced in earlier runs
+
+    A section is reused when its file is unchanged: same size and mtime, or
+    failing that the same content hash. Sections from a different version
+    (generator or client code, model, prompt settings) are ignored. Sections
+    that hit an error are not stored. Only sections looked up or stored during
+    a run are written back, so deleted files drop out.
+
+    Args:
+        path: JSON file (defaults to .cache/report/manifest.json)
+        version: Identifier of everything besides the file that shapes a section
+    """
+
+    def __init__(self, path=None, version=''):
+        if path is None:
+            path = os.path.join(cache_dir('report'), 'manifest.json')
+        self.path = path
+        self.version = version
+        self.sections = {}
+        self.used = {}
+        if os.path.exists(path):
+            try:
+                with open(path, 'r') as f:
+                    stored = json.load(f)
+                if stored.get('version') == version:
+                    self.sections = stored.get('sections', {})
+            except (OSError, ValueError):
+                self.sections = {}
+
+    def lookup(self, key, entry):
+        """
+        Stored ops of an unchanged file, or None
+
+        Args:
+            key: Section key
+            entry: project_index.FileEntry of the file
+        """
+        stored = self.sections.get(key)
+        if stored is None or entry is None:
+            return None
+        if stored['size'] != entry.size:
+            return None
+        if stored['mtime'] != entry.mtime:
+            # Touched but possibly unchanged: compare contents
+            if stored['hash'] != entry.content_hash:
+                return None
+            stored['mtime'] = entry.mtime
+        self.used[key] = stored
+        return stored['ops']
+
+    def store(self, record):
+        """Keep a fully rendered section for the next run"""
+        if record.entry is None or not record.complete:
+            return False
+        ops = record.resolved_ops()
+        if ops is None:
+            return False
+        self.used[record.key] = {
+            'size': record.entry.size,
+            'mtime': record.entry.mtime,
+            'hash': record.entry.content_hash,
+            'ops': ops
+        }
+        return True
+
+    def save(self):
+        payload = json.dumps({'version': self.version, 'sections': self.used})
+        atomic_write_bytes(self.path, payload.encode('utf-8'))
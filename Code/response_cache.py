@@ -0,0 +1,142 @@
+# response_cache.py
+
+import os
+import time
+import sqlite3
+
+from caching import cache_dir, hash_bytes
+
+# Cache modes
+#   read_write: serve hits, store new responses (default)
+#   read_only:  serve hits, never write
+#   refresh:    ignore stored responses, store the new ones
+#   offline:    serve hits only; prompts that miss are not sent
+CACHE_MODES = ('read_write', 'read_only', 'refresh', 'offline')
+
+
+def response_key(model, system_prompt, prompt):
+    """Content address of a response: model, system prompt and prompt text"""
+    return hash_bytes(model, system_prompt, prompt)
+
+
+class ResponseCache:
+    """
+    SQLite store of LLM responses keyed by model, system prompt and prompt hash
+
+    Entries older than ttl are treated as missing. When the stored responses
+    exceed max_bytes, the least recently used entries are evicted.
+
+    Args:
+        path: SQLite file (defaults to .cache/llm/responses.sqlite)
+        mode: One of CACHE_MODES
+        ttl: Maximum age in seconds (None keeps entries indefinitely)
+        max_bytes: Size bound of the stored responses (None for unbounded)
+    """
+
+    def __init__(self, path=None, mode='read_write', ttl=None, max_bytes=256 * 1024 ** 2):
+        if mode not in CACHE_MODES:
+            raise ValueError(f"Unknown cache mode '{mode}'; expected one of {CACHE_MODES}")
+        if path is None:
+            path = os.path.join(cache_dir('llm'), 'responses.sqlite')
+        self.path = path
+        self.mode = mode
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.connection = sqlite3.connect(path)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute("""
+            CREATE TABLE IF NOT EXISTS responses (
+                key TEXT PRIMARY KEY,
+                model TEXT NOT NULL,
+                response TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                created REAL NOT NULL,
+                accessed REAL NOT NULL
+            )
+        """)
+        self.connection.execute("CREATE INDEX IF NOT EXISTS responses_accessed ON responses (accessed)")
+        self.connection.commit()
+
+    @property
+    def readable(self):
+        return self.mode != 'refresh'
+
+    @property
+    def writable(self):
+        return self.mode in ('read_write', 'refresh')
+
+    def get_many(self, model, system_prompt, prompts):
+        """
+        Stored responses for the prompts that hit
+
+        Returns:
+            dict of prompt -> response
+        """
+        if not self.readable or not prompts:
+            return {}
+        keys = {response_key(model, system_prompt, prompt): prompt for prompt in prompts}
+        now = time.time()
+        oldest = now - self.ttl if self.ttl is not None else float('-inf')
+
+        found = {}
+        key_list = list(keys)
+        # Stay below SQLite's bound-parameter limit
+        for start in range(0, len(key_list), 500):
+            chunk = key_list[start:start + 500]
+            rows = self.connection.execute(
+                f"SELECT key, response FROM responses WHERE created >= ? AND key IN ({','.join('?' * len(chunk))})",
+                [oldest] + chunk
+            ).fetchall()
+            found.update(rows)
+
+        if found and self.mode != 'read_only':
+            self.connection.executemany("UPDATE responses SET accessed = ? WHERE key = ?",
+                                        [(now, key) for key in found])
+            self.connection.commit()
+        self.hits += len(found)
+        self.misses += len(keys) - len(found)
+        return {keys[key]: response for key, response in found.items()}
+
+    def get(self, model, system_prompt, prompt):
+        """Stored response or None"""
+        return self.get_many(model, system_prompt, [prompt]).get(prompt)
+
+    def put(self, model, system_prompt, prompt, response):
+        """Store a response (no-op unless the mode writes)"""
+        if not self.writable:
+            return
+        now = time.time()
+        self.connection.execute(
+            "INSERT OR REPLACE INTO responses (key, model, response, size, created, accessed) VALUES (?, ?, ?, ?, ?, ?)",
+            (response_key(model, system_prompt, prompt), model, response, len(response.encode('utf-8')), now, now)
+        )
+        self.connection.commit()
+        self.evict()
+
+    def evict(self):
+        """Drop expired entries, then least recently used ones until under max_bytes"""
+        if self.ttl is not None:
+            self.connection.execute("DELETE FROM responses WHERE created < ?", (time.time() - self.ttl,))
+        if self.max_bytes is not None:
+            total = self.connection.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+            if total > self.max_bytes:
+                stale = []
+                for key, size in self.connection.execute("SELECT key, size FROM responses ORDER BY accessed"):
+                    if total <= self.max_bytes:
+                        break
+                    stale.append((key,))
+                    total -= size
+                self.connection.executemany("DELETE FROM responses WHERE key = ?", stale)
+        self.connection.commit()
+
+    def clear(self):
+        """Remove every stored response"""
+        self.connection.execute("DELETE FROM responses")
+        self.connection.commit()
+
+    def close(self):
+        self.connection.close()
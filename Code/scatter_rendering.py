@@ -0,0 +1,142 @@
+# scatter_rendering.py
+
+import numpy as np
+import pandas as pd
+
+# Above this many points markers are drawn without edges, whose strokes
+# dominate the drawing time of dense scatters
+EDGELESS_THRESHOLD = 5000
+
+# Above this many points the scatter is replaced by a density image
+DENSITY_THRESHOLD = 200000
+
+# Bins along the longer axis of the density image
+DENSITY_BINS = 400
+
+
+def lookup_colors(values, palette, default='#cccccc'):
+    """
+    RGBA color per point from a category -> color mapping, via one lookup array
+
+    Args:
+        values: Category per point
+        palette: dict of category -> matplotlib color
+        default: Color of categories missing from the palette
+
+    Returns:
+        (n, 4) array of RGBA colors
+    """
+    from matplotlib.colors import to_rgba_array
+
+    categories = list(palette)
+    codes = pd.Categorical(np.asarray(values), categories=categories).codes
+    table = to_rgba_array([palette[category] for category in categories] + [default])
+    # Code -1 (unknown category) selects the default color in the last row
+    return table[codes]
+
+
+def _density_image(ax, points, rgba, bins, alpha):
+    """
+    Aggregate points into a pixel grid: each cell gets the mean color of its points
+    and an opacity that grows with the log of its count
+    """
+    x, y = points[:, 0], points[:, 1]
+    x_range = (x.min(), x.max())
+    y_range = (y.min(), y.max())
+    span = max(x_range[1] - x_range[0], y_range[1] - y_range[0]) or 1.0
+    nx = max(1, int(bins * (x_range[1] - x_range[0]) / span))
+    ny = max(1, int(bins * (y_range[1] - y_range[0]) / span))
+
+    # Cell index of every point, then per-cell counts and color sums in bincounts
+    ix = np.clip(((x - x_range[0]) / ((x_range[1] - x_range[0]) or 1.0) * nx).astype(np.int64), 0, nx - 1)
+    iy = np.clip(((y - y_range[0]) / ((y_range[1] - y_range[0]) or 1.0) * ny).astype(np.int64), 0, ny - 1)
+    cell = iy * nx + ix
+    counts = np.bincount(cell, minlength=nx * ny)
+    image = np.zeros((nx * ny, 4))
+    for channel in range(3):
+        image[:, channel] = np.bincount(cell, weights=rgba[:, channel], minlength=nx * ny)
+    occupied = counts > 0
+    image[occupied, :3] /= counts[occupied, None]
+    image[occupied, 3] = alpha * (0.25 + 0.75 * np.log1p(counts[occupied]) / np.log1p(counts.max()))
+
+    return ax.imshow(
+        image.reshape(ny, nx, 4), origin='lower', interpolation='nearest', aspect='auto',
+        extent=(x_range[0], x_range[1], y_range[0], y_range[1])
+    )
+
+
+def scatter_points(ax, points, rgba, s=40, alpha=0.7, edgeless_threshold=EDGELESS_THRESHOLD,
+                   density_threshold=DENSITY_THRESHOLD, density_bins=DENSITY_BINS, **kwargs):
+    """
+    Draw points with precomputed colors as one collection, without marker edges
+    or aggregated to a density image as the point count grows
+
+    Args:
+        ax: Matplotlib axes
+        points: (n, 2) coordinates
+        rgba: (n, 4) colors (see lookup_colors)
+        s, alpha: Marker size and opacity
+        edgeless_threshold: Drop marker edges above this many points
+        density_threshold: Draw a density image above this many points
+        density_bins: Resolution of the density image
+        **kwargs: Passed to ax.scatter (e.g. marker, edgecolors)
+
+    Returns:
+        The matplotlib artist
+    """
+    points = np.asarray(points, dtype=np.float64)
+    if len(points) > density_threshold:
+        return _density_image(ax, points, rgba, density_bins, alpha)
+    if len(points) > edgeless_threshold:
+        kwargs = {key: value for key, value in kwargs.items() if key not in ('linewidth', 'linewidths')}
+        kwargs.update(edgecolors='none', linewidths=0)
+    return ax.scatter(points[:, 0], points[:, 1], c=rgba, s=s, alpha=alpha, **kwargs)
+
+
+def scatter_categories(ax, points, values, palette, labels=None, **kwargs):
+    """
+    Scatter colored by category in a single draw call, with one legend entry per
+    category present. Points whose category is not in the palette are not drawn.
+
+    Args:
+        ax: Matplotlib axes
+        points: (n, 2) coordinates
+        values: Category per point
+        palette: dict of category -> color, in legend order
+        labels: Optional dict of category -> legend label
+        **kwargs: See scatter_points
+
+    Returns:
+        The matplotlib artist
+    """
+    values = np.asarray(values)
+    known = pd.Series(values).isin(list(palette)).to_numpy()
+    present = set(pd.unique(values[known]))
+    artist = scatter_points(ax, np.asarray(points)[known], lookup_colors(values[known], palette), **kwargs)
+
+    # Empty proxy artists carry the legend entries
+    marker = kwargs.get('marker', 'o')
+    for category, color in palette.items():
+        if category in present:
+            ax.scatter([], [], color=color, marker=marker, alpha=kwargs.get('alpha', 0.7),
+                       label=(labels or {}).get(category, category))
+    return artist
+
+
+def scatter_values(ax, points, values, cmap='viridis', vmin=None, vmax=None, **kwargs):
+    """
+    Scatter colored through a colormap in a single draw call
+
+    Returns:
+        A ScalarMappable suitable for plt.colorbar
+    """
+    import matplotlib.pyplot as plt
+    from matplotlib.cm import ScalarMappable
+    from matplotlib.colors import Normalize
+
+    values = np.asarray(values, dtype=np.float64)
+    norm = Normalize(vmin=np.nanmin(values) if vmin is None else vmin,
+                     vmax=np.nanmax(values) if vmax is None else vmax)
+    mappable = ScalarMappable(norm=norm, cmap=plt.get_cmap(cmap))
+    scatter_points(ax, points, mappable.to_rgba(values), **kwargs)
+    return mappable
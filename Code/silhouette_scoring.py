@@ -0,0 +1,191 @@
+# silhouette_scoring.py
+
+from collections import OrderedDict
+
+import numpy as np
+from scipy import stats
+from sklearn.metrics import pairwise_distances, pairwise_distances_chunked
+
+from caching import hash_array, hash_bytes, hash_params
+
+# Largest sample scored exactly with a full distance matrix when mode='auto'
+MAX_EXACT_SAMPLES = 5000
+
+# Rows drawn for the sampled estimate
+DEFAULT_SAMPLE_SIZE = 2000
+
+# Scorers already built for a given data matrix, so every caller shares one
+# distance structure. Only the most recently used are kept, since each one holds
+# a distance matrix.
+MAX_CACHED_SCORERS = 2
+_SCORERS = OrderedDict()
+
+
+class SilhouetteScorer:
+    """
+    Silhouette scores for many label sets on the same data matrix
+
+    The distance structure is built once and reused for every label set:
+
+        'exact': full pairwise distance matrix, O(n^2) memory
+        'chunked': exact scores from row blocks of the distance matrix, so memory
+            stays O(block x n); label sets passed together to score_many share
+            each block
+        'sampled': distances from a fixed random sample of rows to all rows; the
+            mean of the sampled silhouettes is an unbiased estimate of the full
+            score and comes with a normal-approximation confidence interval.
+            Every label set is scored on the same sample, so scores stay comparable.
+        'auto': 'exact' up to MAX_EXACT_SAMPLES rows, 'sampled' above
+
+    Args:
+        X: Data matrix (n_samples, n_features)
+        mode: 'auto', 'exact', 'chunked' or 'sampled'
+        sample_size: Rows scored in sampled mode
+        confidence: Confidence level for the sampled interval
+        metric: Distance metric passed to sklearn.metrics.pairwise_distances
+        working_memory: Block size budget in MiB for chunked mode
+        random_state: Seed for the sample
+    """
+
+    def __init__(self, X, mode='auto', sample_size=DEFAULT_SAMPLE_SIZE, confidence=0.95,
+                 metric='euclidean', working_memory=None, random_state=42):
+        self.X = np.ascontiguousarray(X, dtype=np.float64)
+        n_samples = self.X.shape[0]
+        if mode == 'auto':
+            mode = 'exact' if n_samples <= MAX_EXACT_SAMPLES else 'sampled'
+        if mode not in ('exact', 'chunked', 'sampled'):
+            raise ValueError(f"Unknown silhouette mode: {mode}")
+
+        self.mode = mode
+        self.sample_size = min(sample_size, n_samples)
+        self.confidence = confidence
+        self.metric = metric
+        self.working_memory = working_memory
+        self.random_state = random_state
+
+        self._distances = None
+        self._sample_index = None
+
+    def _row_blocks(self):
+        """Yield (row indices, distances from those rows to all rows)"""
+        if self.mode == 'exact':
+            if self._distances is None:
+                self._distances = pairwise_distances(self.X, metric=self.metric)
+            yield np.arange(self.X.shape[0]), self._distances
+
+        elif self.mode == 'sampled':
+            if self._distances is None:
+                rng = np.random.default_rng(self.random_state)
+                self._sample_index = np.sort(rng.choice(self.X.shape[0], self.sample_size, replace=False))
+                self._distances = pairwise_distances(
+                    self.X[self._sample_index], self.X, metric=self.metric
+                ).astype(np.float32)
+            yield self._sample_index, self._distances
+
+        else:
+            start = 0
+            for block in pairwise_distances_chunked(self.X, metric=self.metric,
+                                                    working_memory=self.working_memory):
+                yield np.arange(start, start + len(block)), block
+                start += len(block)
+
+    def _encode(self, labels):
+        labels = np.asarray(labels)
+        if labels.shape[0] != self.X.shape[0]:
+            raise ValueError("Labels must have one entry per row of the data matrix")
+        _, codes = np.unique(labels, return_inverse=True)
+        n_labels = codes.max() + 1
+        if not 2 <= n_labels <= self.X.shape[0] - 1:
+            raise ValueError(f"Number of labels is {n_labels}. Valid values are 2 to n_samples - 1")
+        onehot = np.zeros((len(codes), n_labels))
+        onehot[np.arange(len(codes)), codes] = 1.0
+        return codes, onehot
+
+    def sample_values(self, label_sets):
+        """
+        Per-row silhouette values for each label set, on the rows scored by this mode
+
+        Args:
+            label_sets: List of label arrays
+
+        Returns:
+            List of arrays, one per label set
+        """
+        encoded = [self._encode(labels) for labels in label_sets]
+        counts = [onehot.sum(axis=0) for _, onehot in encoded]
+        values = [[] for _ in encoded]
+
+        for rows, distances in self._row_blocks():
+            row_range = np.arange(len(rows))
+            for j, (codes, onehot) in enumerate(encoded):
+                # Sum of distances from each row to every cluster in one product
+                sums = distances @ onehot
+                own = codes[rows]
+                own_counts = counts[j][own]
+
+                # The row's distance to itself is zero, so divide by (size - 1)
+                a = sums[row_range, own] / np.maximum(own_counts - 1, 1)
+                mean_other = sums / counts[j]
+                mean_other[row_range, own] = np.inf
+                b = mean_other.min(axis=1)
+
+                with np.errstate(invalid='ignore', divide='ignore'):
+                    s = (b - a) / np.maximum(a, b)
+                # Singleton clusters score 0, as in sklearn
+                s = np.where(own_counts > 1, np.nan_to_num(s), 0.0)
+                values[j].append(s)
+
+        return [np.concatenate(parts) for parts in values]
+
+    def _summarize(self, values):
+        score = float(values.mean())
+        if self.mode != 'sampled':
+            return {'score': score, 'ci_low': score, 'ci_high': score, 'n_scored': len(values)}
+
+        # Normal approximation with a finite population correction
+        n_samples = self.X.shape[0]
+        fpc = np.sqrt(1 - len(values) / n_samples) if n_samples > 1 else 0.0
+        half_width = (stats.norm.ppf(0.5 + self.confidence / 2)
+                      * values.std(ddof=1) / np.sqrt(len(values)) * fpc)
+        return {'score': score, 'ci_low': score - half_width, 'ci_high': score + half_width,
+                'n_scored': len(values)}
+
+    def score_with_ci(self, labels):
+        """Silhouette score with its confidence interval (degenerate for exact modes)"""
+        return self._summarize(self.sample_values([labels])[0])
+
+    def score(self, labels):
+        """Mean silhouette score for one label set"""
+        return self.score_with_ci(labels)['score']
+
+    def score_many(self, label_sets):
+        """
+        Score several label sets in one pass over the distance structure
+
+        Args:
+            label_sets: Dictionary of name -> label array
+
+        Returns:
+            Dictionary of name -> score_with_ci() result
+        """
+        names = list(label_sets)
+        values = self.sample_values([label_sets[name] for name in names])
+        return {name: self._summarize(vals) for name, vals in zip(names, values)}
+
+
+def get_silhouette_scorer(X, **kwargs):
+    """
+    Return the shared SilhouetteScorer for a data matrix, building it on first use
+
+    Keyword arguments are passed to SilhouetteScorer and are part of the lookup key.
+    The MAX_CACHED_SCORERS most recently used scorers are kept.
+    """
+    key = hash_bytes(hash_array(np.asarray(X, dtype=np.float64)), hash_params(kwargs))
+    if key in _SCORERS:
+        _SCORERS.move_to_end(key)
+        return _SCORERS[key]
+    scorer = SilhouetteScorer(X, **kwargs)
+    _SCORERS[key] = scorer
+    while len(_SCORERS) > MAX_CACHED_SCORERS:
+        _SCORERS.popitem(last=False)
+    return scorer
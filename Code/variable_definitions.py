@@ -513,4 +513,41 @@ def add_unique_keys(label_mapping, variable_labels):
     for key in variable_labels:
         if key not in new_mapping and variable_labels[key] is not None and variable_labels[key].strip() != '':
             new_mapping[key] = variable_labels[key]
-    return new_mapping
\ No newline at end of file
+    return new_mapping
+
+
+class LabelIndex:
+    """
+    Bidirectional lookup between column names and their readable labels
+
+    Labels come from label_mapping. Dummy columns without their own entry are
+    labelled from their source variable as "<variable label>: <category>".
+    Both directions are precomputed, so lookups are exact dictionary hits.
+
+    Args:
+        label_mapping: Dictionary of column name -> label
+        dummy_sources: Optional dictionary of dummy column -> (source column, category),
+            e.g. SurveyPreprocessor.dummy_sources()
+    """
+
+    def __init__(self, label_mapping, dummy_sources=None):
+        self.column_to_label = dict(label_mapping)
+        for dummy, (column, category) in (dummy_sources or {}).items():
+            if dummy not in self.column_to_label and column in self.column_to_label:
+                self.column_to_label[dummy] = f"{self.column_to_label[column]}: {category}"
+
+        # The first column claiming a label wins, so the reverse lookup is stable
+        self.label_to_column = {}
+        for column, label in self.column_to_label.items():
+            self.label_to_column.setdefault(label, column)
+
+    def label(self, column):
+        """Readable label for a column, falling back to the column name"""
+        return self.column_to_label.get(column, column)
+
+    def labels(self, columns):
+        return [self.label(column) for column in columns]
+
+    def column(self, label):
+        """Column name for a label, falling back to the label itself"""
+        return self.label_to_column.get(label, label)